@@ -0,0 +1,217 @@
+"""
+Controle de admissão: limite de requisições simultâneas por classe de rota.
+
+Os handlers síncronos dividem o threadpool do anyio; sem limite, algumas
+exportações ou logins (bcrypt) ocupam todas as threads e até o /health fica
+na fila. Cada classe (auth, leitura, escrita, pesada) tem um compartimento
+com N vagas e uma fila de espera limitada. Fila cheia ou espera longa
+demais: 503 com Retry-After na hora, em vez de a requisição ficar parada.
+
+Opcionalmente, um balde de tokens por cliente (token ou IP) devolve 429
+para quem passa da taxa configurada.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+
+import anyio.to_thread
+from dotenv import load_dotenv
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from database_mysql import identidade
+from metricas import admissao_espera, admissao_recusas
+
+load_dotenv()
+
+CLASSES = ("auth", "leitura", "escrita", "pesada")
+
+# (vagas, fila) padrão por classe; ADMISSAO_<CLASSE>_LIMITE / _FILA sobrescrevem
+_PADRAO = {"auth": (4, 32), "leitura": (24, 128), "escrita": (12, 64), "pesada": (2, 8)}
+
+# Tempo máximo na fila antes do 503 (ADMISSAO_<CLASSE>_ESPERA sobrescreve por classe)
+ESPERA_SEGUNDOS = float(os.getenv("ADMISSAO_ESPERA", "2"))
+RETRY_AFTER = int(os.getenv("ADMISSAO_RETRY_AFTER", "1"))
+
+# Balde de tokens por cliente: requisições/segundo (0 = desligado) e rajada
+TAXA = float(os.getenv("ADMISSAO_TAXA", "0"))
+RAJADA = float(os.getenv("ADMISSAO_RAJADA", str(max(TAXA * 2, 20))))
+
+# Rotas fora do controle: sondas, métricas e streams de longa duração
+_ISENTAS = ("/health/", "/metrics")
+_PESADAS = ("/export", "/batch", "/import")
+# Prefixos pesados por inteiro: análises em numpy e consultas ao MongoDB
+_PREFIXOS_PESADOS = ("/analytics", "/logs")
+
+
+def classificar(metodo: str, caminho: str) -> str | None:
+    """
+    Classe da rota, ou None se ela não passa pelo controle.
+
+    Returns:
+        str | None: "auth", "leitura", "escrita", "pesada" ou None.
+    """
+    if metodo == "OPTIONS" or caminho.startswith(_ISENTAS) or caminho.endswith("/changes/stream"):
+        return None
+    if caminho == "/login" or (metodo == "POST" and caminho == "/usuarios"):
+        return "auth"
+    # a alteração de usuário pode trocar a senha (bcrypt); o corpo não é lido aqui
+    if metodo == "PUT" and caminho.startswith("/usuarios/") and caminho.count("/") == 2:
+        return "auth"
+    # /relatorios/colheitas lê o agregado mensal e os jobs só enfileiram e
+    # consultam (o peso fica no pool de processos): ficam na leitura/escrita
+    if caminho.endswith(_PESADAS) or caminho.startswith(_PREFIXOS_PESADOS):
+        return "pesada"
+    if metodo in ("GET", "HEAD"):
+        return "leitura"
+    return "escrita"
+
+
+class Compartimento:
+    """Vagas de uma classe, com fila de espera limitada."""
+
+    def __init__(self, nome: str, limite: int, fila: int, espera: float):
+        self.nome, self.limite, self.fila, self.espera = nome, limite, fila, espera
+        self.em_uso = 0
+        self.aguardando = 0
+        self._vagas = asyncio.Semaphore(limite)
+
+    async def entrar(self) -> str | None:
+        """
+        Ocupa uma vaga, esperando até `espera` segundos.
+
+        Returns:
+            str | None: None se entrou; senão o motivo da recusa ("fila_cheia" ou "espera").
+        """
+        if self.aguardando >= self.fila and self._vagas.locked():
+            return "fila_cheia"
+        inicio = time.perf_counter()
+        self.aguardando += 1
+        try:
+            await asyncio.wait_for(self._vagas.acquire(), self.espera)
+        except asyncio.TimeoutError:
+            return "espera"
+        finally:
+            self.aguardando -= 1
+        self.em_uso += 1
+        admissao_espera.observar(time.perf_counter() - inicio, self.nome)
+        return None
+
+    def sair(self):
+        self.em_uso -= 1
+        self._vagas.release()
+
+
+def _compartimentos() -> dict:
+    resultado = {}
+    for classe in CLASSES:
+        limite, fila = _PADRAO[classe]
+        prefixo = f"ADMISSAO_{classe.upper()}"
+        resultado[classe] = Compartimento(
+            classe,
+            int(os.getenv(f"{prefixo}_LIMITE", str(limite))),
+            int(os.getenv(f"{prefixo}_FILA", str(fila))),
+            float(os.getenv(f"{prefixo}_ESPERA", str(ESPERA_SEGUNDOS))),
+        )
+    return resultado
+
+
+compartimentos = _compartimentos()
+
+
+def total_vagas() -> int:
+    """Soma das vagas de todas as classes (para dimensionar o threadpool)."""
+    return sum(c.limite for c in compartimentos.values())
+
+
+# Threads para os handlers síncronos: todas as vagas ocupadas ao mesmo tempo
+# mais uma folga para as rotas isentas (o padrão do anyio é 40)
+THREADPOOL = int(os.getenv("ADMISSAO_THREADPOOL", str(total_vagas() + 8)))
+
+
+def dimensionar_threadpool():
+    """Ajusta o threadpool do anyio; chamar dentro do event loop (no lifespan)."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL
+
+
+def estado() -> dict:
+    return {nome: {"em_uso": c.em_uso, "aguardando": c.aguardando, "limite": c.limite, "fila": c.fila}
+            for nome, c in compartimentos.items()}
+
+
+# -----------------------
+# BALDE DE TOKENS
+# -----------------------
+_lock_baldes = threading.Lock()
+# cliente -> [tokens, time.monotonic() da última atualização]
+_baldes = {}
+
+
+def consumir(cliente: str) -> float:
+    """
+    Tira um token do balde do cliente.
+
+    Returns:
+        float: 0 se havia token; senão os segundos até o próximo.
+    """
+    agora = time.monotonic()
+    with _lock_baldes:
+        if len(_baldes) > 10000:
+            # baldes já cheios de novo equivalem a não ter balde
+            for chave in [k for k, (t, em) in _baldes.items() if t + (agora - em) * TAXA >= RAJADA]:
+                del _baldes[chave]
+        tokens, em = _baldes.get(cliente, (RAJADA, agora))
+        tokens = min(RAJADA, tokens + (agora - em) * TAXA)
+        if tokens < 1:
+            _baldes[cliente] = [tokens, agora]
+            return (1 - tokens) / TAXA
+        _baldes[cliente] = [tokens - 1, agora]
+        return 0.0
+
+
+# -----------------------
+# MIDDLEWARE
+# -----------------------
+class ControleAdmissao:
+    """
+    Middleware ASGI. A vaga fica ocupada até o fim da resposta, inclusive o
+    corpo das exportações em streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        classe = classificar(scope["method"], scope["path"])
+        if classe is None:
+            return await self.app(scope, receive, send)
+
+        if TAXA > 0:
+            espera = consumir(identidade(Request(scope)))
+            if espera:
+                admissao_recusas.inc(1, classe, "taxa")
+                resposta = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Muitas requisições, tente novamente em instantes"},
+                    headers={"Retry-After": str(math.ceil(espera))},
+                )
+                return await resposta(scope, receive, send)
+
+        compartimento = compartimentos[classe]
+        motivo = await compartimento.entrar()
+        if motivo:
+            admissao_recusas.inc(1, classe, motivo)
+            resposta = JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor ocupado, tente novamente em instantes"},
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+            return await resposta(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            compartimento.sair()
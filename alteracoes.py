@@ -0,0 +1,328 @@
+"""
+Sincronização incremental: registro de alterações por recurso.
+
+Os handlers de escrita chamam registrar()/registrar_objetos() na mesma
+transação do INSERT/UPDATE/DELETE, sempre depois de versoes.incrementar():
+o lock da linha de versão do recurso fica com a transação até o commit,
+então as entradas de um mesmo recurso ficam visíveis na ordem do id e um
+cursor nunca pula uma entrada que ainda não tinha sido commitada.
+
+O cliente guarda uma cópia local e aplica só o que mudou:
+
+    1. GET /{recurso}/changes            -> cursor inicial
+    2. GET /{recurso} (lista completa)
+    3. GET /{recurso}/changes?since=N    -> upserts e deletes depois de N
+       (ou /{recurso}/changes/stream, Server-Sent Events)
+
+O registro guarda só a chave e a operação; os dados vêm da tabela no
+momento da leitura. Entradas antigas são compactadas por:
+
+    python alteracoes.py compactar
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Date, delete, exists, func, insert, inspect, select, tuple_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from database_mysql import sessao_leitura
+from models import (
+    Alteracao, Colheita, Cultivo, Evento, GruposUsuarios, Hortas, Parcela, ParticipacaoEvento, Produto,
+    Usuarios, VersaoTabela
+)
+from schemas import (
+    ColheitaOut, CultivoOut, EventoOut, GrupoOut, HortaOut, ParcelaOut, ParticipacaoOut, ProdutoOut, UsuarioOut
+)
+
+load_dotenv()
+
+# Entradas mais velhas que isso são apagadas; cursores anteriores precisam recarregar tudo
+RETENCAO_DIAS = int(os.getenv("ALTERACOES_RETENCAO_DIAS", "7"))
+# Alterações por resposta de /changes (o cliente pede de novo enquanto "mais" for true)
+LIMITE = int(os.getenv("ALTERACOES_LIMITE", "500"))
+# Intervalo entre consultas do stream SSE e entre comentários de keep-alive
+SSE_INTERVALO = float(os.getenv("ALTERACOES_SSE_INTERVALO", "1"))
+SSE_KEEPALIVE = float(os.getenv("ALTERACOES_SSE_KEEPALIVE", "15"))
+
+# Linha de versoes_tabela com o maior id já apagado pela compactação
+CORTE = "alteracoes_corte"
+LOTE_COMPACTACAO = 5000
+
+# recurso (como nas rotas) -> modelo e schema de saída (só os campos dele são enviados)
+RECURSOS = {
+    "usuarios": (Usuarios, UsuarioOut),
+    "grupos": (GruposUsuarios, GrupoOut),
+    "hortas": (Hortas, HortaOut),
+    "produtos": (Produto, ProdutoOut),
+    "parcelas": (Parcela, ParcelaOut),
+    "eventos": (Evento, EventoOut),
+    "participacoes": (ParticipacaoEvento, ParticipacaoOut),
+    "cultivos": (Cultivo, CultivoOut),
+    "colheitas": (Colheita, ColheitaOut),
+}
+
+
+class ResyncNecessario(Exception):
+    """O cursor é anterior à última compactação."""
+
+
+def _colunas_chave(modelo) -> list:
+    return list(inspect(modelo).primary_key)
+
+
+def _codificar(chave) -> str:
+    return json.dumps(list(chave), default=str, separators=(",", ":"))
+
+
+def _decodificar(modelo, chave: str) -> tuple:
+    valores = json.loads(chave)
+    return tuple(
+        date.fromisoformat(v) if isinstance(c.type, Date) else v
+        for c, v in zip(_colunas_chave(modelo), valores)
+    )
+
+
+# -----------------------
+# ESCRITA
+# -----------------------
+def registrar(db: Session, recurso: str, chaves, operacao: str = "upsert"):
+    """
+    Registra as chaves alteradas (tuplas na ordem da PK) com um único INSERT.
+
+    Args:
+        recurso (str): Nome do recurso, uma das chaves de RECURSOS.
+        chaves: Chaves primárias dos registros gravados ou apagados.
+        operacao (str): "upsert" ou "delete" (tombstone).
+    """
+    agora = datetime.utcnow()
+    linhas = [
+        {"recurso": recurso, "chave": _codificar(c), "operacao": operacao, "criado_em": agora}
+        for c in dict.fromkeys(tuple(c) for c in chaves)
+    ]
+    if linhas:
+        db.execute(insert(Alteracao), linhas)
+
+
+def registrar_objetos(db: Session, recurso: str, *objetos):
+    """Como registrar(), para objetos do ORM (faz o flush para ter os ids gerados)."""
+    db.flush()
+    registrar(db, recurso, [inspect(o).identity for o in objetos])
+
+
+def registrar_consulta(db: Session, recurso: str, *condicoes):
+    """Registra os registros do recurso que atendem às condições (ex: UPDATEs em massa)."""
+    colunas = _colunas_chave(RECURSOS[recurso][0])
+    registrar(db, recurso, db.execute(select(*colunas).where(*condicoes)).all())
+
+
+async def registrar_async(db: AsyncSession, recurso: str, chaves, operacao: str = "upsert"):
+    await db.run_sync(registrar, recurso, chaves, operacao)
+
+
+async def registrar_objetos_async(db: AsyncSession, recurso: str, *objetos):
+    await db.run_sync(registrar_objetos, recurso, *objetos)
+
+
+async def registrar_consulta_async(db: AsyncSession, recurso: str, *condicoes):
+    await db.run_sync(registrar_consulta, recurso, *condicoes)
+
+
+# -----------------------
+# LEITURA
+# -----------------------
+def corte(db: Session) -> int:
+    return db.execute(select(VersaoTabela.versao).where(VersaoTabela.tabela == CORTE)).scalar() or 0
+
+
+def cursor_atual(db: Session, recurso: str) -> int:
+    """
+    Cursor para começar a sincronizar: o da última entrada do recurso (ou o
+    corte, se a compactação já apagou todas elas).
+    """
+    ultimo = db.execute(select(func.max(Alteracao.id)).where(Alteracao.recurso == recurso)).scalar() or 0
+    return max(ultimo, corte(db))
+
+
+def _buscar(db: Session, modelo, chaves: list[tuple]) -> dict:
+    if not chaves:
+        return {}
+    colunas = _colunas_chave(modelo)
+    if len(colunas) == 1:
+        filtro = colunas[0].in_([c[0] for c in chaves])
+    else:
+        filtro = tuple_(*colunas).in_(chaves)
+    return {inspect(o).identity: o for o in db.scalars(select(modelo).where(filtro))}
+
+
+def ler(db: Session, recurso: str, desde: int, limite: int = LIMITE) -> dict:
+    """
+    Alterações do recurso depois do cursor, uma por registro (a última vence).
+
+    Returns:
+        dict: cursor (para a próxima chamada), mais (há outra página) e
+        alteracoes, cada uma {"operacao": "upsert", "chave", "dados"} ou
+        {"operacao": "delete", "chave"}.
+
+    Raises:
+        ResyncNecessario: O cursor é anterior à última compactação.
+    """
+    if desde < corte(db):
+        raise ResyncNecessario()
+    modelo, esquema = RECURSOS[recurso]
+    linhas = db.execute(
+        select(Alteracao.id, Alteracao.chave, Alteracao.operacao)
+        .where(Alteracao.recurso == recurso, Alteracao.id > desde)
+        .order_by(Alteracao.id)
+        .limit(limite + 1)
+    ).all()
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    ultimas = {}
+    for linha in linhas:
+        # reinsere para a chave ficar na posição da última alteração
+        ultimas.pop(linha.chave, None)
+        ultimas[linha.chave] = linha.operacao
+    chaves = {c: _decodificar(modelo, c) for c in ultimas}
+    atuais = _buscar(db, modelo, [chaves[c] for c, op in ultimas.items() if op == "upsert"])
+
+    nomes = [c.key for c in _colunas_chave(modelo)]
+    alteracoes = []
+    for c, operacao in ultimas.items():
+        chave = dict(zip(nomes, json.loads(c)))
+        # apagado depois do upsert: o delete vem numa entrada posterior, mas já vale aqui
+        obj = atuais.get(chaves[c]) if operacao == "upsert" else None
+        if obj is None:
+            alteracoes.append({"operacao": "delete", "chave": chave})
+        else:
+            dados = jsonable_encoder({campo: getattr(obj, campo) for campo in esquema.model_fields})
+            alteracoes.append({"operacao": "upsert", "chave": chave, "dados": dados})
+    return {"cursor": linhas[-1].id if linhas else desde, "mais": mais, "alteracoes": alteracoes}
+
+
+def erro_resync() -> HTTPException:
+    return HTTPException(410, "Cursor expirado: recarregue a lista completa e pegue um cursor novo")
+
+
+def _ler_sessao(request: Request, recurso: str, desde: int) -> dict:
+    db = sessao_leitura(request)
+    try:
+        return ler(db, recurso, desde)
+    finally:
+        db.close()
+
+
+def _evento(nome: str, dados: dict, id_evento: int | None = None) -> str:
+    prefixo = f"id: {id_evento}\n" if id_evento is not None else ""
+    return f"{prefixo}event: {nome}\ndata: {json.dumps(dados, separators=(',', ':'))}\n\n"
+
+
+async def transmitir(request: Request, recurso: str, desde: int):
+    """
+    Gerador do stream SSE: consulta o registro a cada SSE_INTERVALO e envia
+    um evento "alteracoes" por página (o id do evento é o cursor, então o
+    EventSource retoma do ponto certo ao reconectar). Cursor expirado gera um
+    evento "resync" e encerra o stream.
+    """
+    ultimo_envio = time.monotonic()
+    while not await request.is_disconnected():
+        try:
+            pagina = await run_in_threadpool(_ler_sessao, request, recurso, desde)
+        except ResyncNecessario:
+            yield _evento("resync", {"detail": erro_resync().detail})
+            return
+        desde = pagina["cursor"]
+        if pagina["alteracoes"]:
+            yield _evento("alteracoes", pagina, desde)
+            ultimo_envio = time.monotonic()
+            if pagina["mais"]:
+                continue
+        elif time.monotonic() - ultimo_envio >= SSE_KEEPALIVE:
+            # comentário: mantém a conexão aberta em proxies com timeout de inatividade
+            yield ": keep-alive\n\n"
+            ultimo_envio = time.monotonic()
+        await asyncio.sleep(SSE_INTERVALO)
+
+
+# -----------------------
+# COMPACTAÇÃO
+# -----------------------
+def _gravar_corte(db: Session, valor: int):
+    valores = {"tabela": CORTE, "versao": valor}
+    if db.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(VersaoTabela).values(valores).on_duplicate_key_update(versao=valor)
+    else:
+        stmt = sqlite.insert(VersaoTabela).values(valores)
+        stmt = stmt.on_conflict_do_update(index_elements=["tabela"], set_={"versao": valor})
+    db.execute(stmt)
+
+
+def compactar(db: Session, dias: int = RETENCAO_DIAS) -> dict:
+    """
+    Apaga, em lotes de LOTE_COMPACTACAO, as entradas substituídas por uma
+    mais nova da mesma chave (nenhum cursor perde nada com isso) e as com
+    mais de `dias` dias. Cursores anteriores às apagadas pela idade passam
+    a receber o sinal de resync.
+
+    Returns:
+        dict: Entradas apagadas por motivo e o corte atual.
+    """
+    mais_nova = aliased(Alteracao)
+    substituida = exists().where(
+        mais_nova.recurso == Alteracao.recurso, mais_nova.chave == Alteracao.chave, mais_nova.id > Alteracao.id
+    )
+    substituidas = 0
+    ultimo = 0
+    while True:
+        ids = db.scalars(
+            select(Alteracao.id).where(Alteracao.id > ultimo, substituida).order_by(Alteracao.id).limit(LOTE_COMPACTACAO)
+        ).all()
+        if not ids:
+            break
+        db.execute(delete(Alteracao).where(Alteracao.id.in_(ids)))
+        db.commit()
+        substituidas += len(ids)
+        ultimo = ids[-1]
+
+    limite = db.execute(
+        select(func.max(Alteracao.id)).where(Alteracao.criado_em < datetime.utcnow() - timedelta(days=dias))
+    ).scalar()
+    expiradas = 0
+    if limite:
+        # o corte é gravado antes: um cliente nunca lê um cursor já sem entradas sem saber
+        _gravar_corte(db, max(limite, corte(db)))
+        db.commit()
+        while True:
+            ids = db.scalars(select(Alteracao.id).where(Alteracao.id <= limite).order_by(Alteracao.id).limit(LOTE_COMPACTACAO)).all()
+            if not ids:
+                break
+            db.execute(delete(Alteracao).where(Alteracao.id.in_(ids)))
+            db.commit()
+            expiradas += len(ids)
+    return {"substituidas": substituidas, "expiradas": expiradas, "corte": corte(db)}
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_mysql import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manutenção do registro de alterações")
+    parser.add_argument("comando", choices=["compactar"])
+    parser.add_argument("--dias", type=int, default=RETENCAO_DIAS, help="retenção das entradas")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        r = compactar(db, args.dias)
+        print(f"✅ {r['substituidas']} entrada(s) substituída(s) e {r['expiradas']} expirada(s) apagadas; corte = {r['corte']}")
+    finally:
+        db.close()
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from jose import jwt
-from passlib.context import CryptContext
+import multiprocessing
 import os
+import threading
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 
@@ -10,20 +12,139 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 
+# Processos dedicados ao bcrypt (0 = calcula na própria thread)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+# Quantos pedidos de hash podem esperar por um processo livre, e por quanto tempo
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", str(max(HASH_WORKERS, 1) * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "5"))
+# Senhas por tarefa de hash_em_lote: um login espera no máximo um bloco desses
+HASH_LOTE = int(os.getenv("HASH_LOTE", "8"))
+
+# Grupo com acesso às rotas administrativas (ex: /logs)
+GRUPO_ADMIN = int(os.getenv("GRUPO_ADMIN", "1"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_senha(senha: str):
+
+class SenhasOcupadasError(Exception):
+    """Fila do pool de hash cheia por mais de HASH_QUEUE_TIMEOUT segundos."""
+
+
+_pool = None
+_lock_pool = threading.Lock()
+_vagas = threading.BoundedSemaphore(HASH_QUEUE_MAX)
+
+
+def _obter_pool():
+    global _pool
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                # spawn: o processo da API tem threads, fork não é seguro aqui
+                _pool = ProcessPoolExecutor(
+                    max_workers=HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def encerrar_pool():
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _executar(funcao, *args):
+    """Roda funcao(*args) no pool de processos, respeitando a fila limitada."""
+    if HASH_WORKERS <= 0:
+        return funcao(*args)
+    if not _vagas.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        raise SenhasOcupadasError()
+    try:
+        return _obter_pool().submit(funcao, *args).result()
+    finally:
+        _vagas.release()
+
+
+# Funções de módulo (e não métodos) para poderem ser enviadas aos processos
+def _hash(senha: str) -> str:
     return pwd_context.hash(senha)
 
-def verificar_senha(senha_plana: str, senha_hash: str):
+def _verificar(senha_plana: str, senha_hash: str) -> bool:
     return pwd_context.verify(senha_plana, senha_hash)
 
-def criar_token(dados: dict):
+def _verificar_e_atualizar(senha_plana: str, senha_hash: str):
+    return pwd_context.verify_and_update(senha_plana, senha_hash)
+
+def _hash_lote(senhas: list[str]) -> list[str]:
+    return [pwd_context.hash(s) for s in senhas]
+
+
+def hash_senha(senha: str):
+    return _executar(_hash, senha)
+
+def verificar_senha(senha_plana: str, senha_hash: str):
+    return _executar(_verificar, senha_plana, senha_hash)
+
+def verificar_e_atualizar(senha_plana: str, senha_hash: str):
+    """
+    Verifica a senha e, se o hash guardado estiver desatualizado para o
+    pwd_context (ex: custo do bcrypt aumentado), devolve também o novo hash.
+
+    Returns:
+        (bool, str | None): senha correta, novo hash ou None.
+    """
+    return _executar(_verificar_e_atualizar, senha_plana, senha_hash)
+
+def _liberar_vaga(_futuro):
+    _vagas.release()
+
+def hash_em_lote(senhas: list[str]) -> list[str]:
+    """
+    Calcula vários hashes distribuindo os blocos entre todos os processos.
+
+    Cada bloco ocupa uma vaga da mesma fila limitada do login e do cadastro,
+    e no máximo HASH_WORKERS blocos ficam no pool ao mesmo tempo: uma
+    importação grande não enche a fila nem prende os processos.
+    """
+    if HASH_WORKERS <= 0 or len(senhas) <= 1:
+        return [hash_senha(s) for s in senhas]
+    tamanho = min(max(len(senhas) // (HASH_WORKERS * 4), 1), HASH_LOTE)
+    blocos = [senhas[i:i + tamanho] for i in range(0, len(senhas), tamanho)]
+    futuros, em_andamento = [], set()
+    try:
+        for bloco in blocos:
+            if len(em_andamento) >= HASH_WORKERS:
+                _, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+            if not _vagas.acquire(timeout=HASH_QUEUE_TIMEOUT):
+                raise SenhasOcupadasError()
+            try:
+                futuro = _obter_pool().submit(_hash_lote, bloco)
+            except BaseException:
+                _vagas.release()
+                raise
+            futuro.add_done_callback(_liberar_vaga)
+            futuros.append(futuro)
+            em_andamento.add(futuro)
+        return [h for futuro in futuros for h in futuro.result()]
+    except BaseException:
+        # os blocos que ainda não começaram saem do pool (e devolvem a vaga)
+        for futuro in futuros:
+            futuro.cancel()
+        raise
+
+# Se ligado, o token carrega o id_grupo ("grp") do usuário no momento do login
+TOKEN_INCLUIR_GRUPO = os.getenv("TOKEN_INCLUIR_GRUPO", "0") == "1"
+
+def criar_token(dados: dict, id_grupo: int | None = None):
     to_encode = dados.copy()
+    if TOKEN_INCLUIR_GRUPO and id_grupo is not None:
+        to_encode["grp"] = id_grupo
     expire = datetime.utcnow() + timedelta(minutes=60)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def gerar_hash(senha: str) -> str:
-    return pwd_context.hash(senha)
-
+    return hash_senha(senha)
@@ -0,0 +1,607 @@
+"""
+Benchmark da API pela interface ASGI (sem servidor HTTP na frente), sobre os
+dados de gerar_dados.py:
+
+    export DATABASE_URL=sqlite:///bench.db
+    python gerar_dados.py --escala 100k
+    python benchmark.py --saida resultado.json --baseline benchmark_baseline.json
+
+Cada cenário é um endpoint; para cada um são registrados vazão, latência
+p50/p95/p99, comandos SQL por requisição e o pico de RSS do processo até
+ali. Com --baseline, termina com erro se algum cenário ficou mais lento que
+a tolerância; termina com erro também se os pares de MESMAS_CONSULTAS não
+fizerem o mesmo número de comandos SQL. Requer httpx.
+
+Com --sobrecarga, mede uma rota barata sozinha e de novo enquanto rotas
+pesadas (exportações e análises) chegam além do limite do controle de
+admissão (admissao.py): o p99 da barata deve ficar parecido nos dois casos.
+
+Com --carga 50,200,1000, a mesma leitura (100 produtos) é servida pelas duas
+pilhas da API, def + Session no threadpool e async def + AsyncSession no
+event loop, com cada número de clientes simultâneos. A classe "leitura" do
+controle de admissão mantém as vagas e ganha fila para todos os clientes: o
+que se mede é a latência e a vazão das pilhas, não as recusas (503).
+
+Com --inicializacao, sobe a API em processos uvicorn novos e mede o tempo
+do início do processo até a primeira resposta de /health/live, de
+/health/ready e da primeira consulta ao banco (GET /produtos). Para ver
+que um MongoDB inacessível não atrasa a subida:
+
+    MONGO_URI=mongodb://10.255.255.1:27017 python benchmark.py --inicializacao
+"""
+import os
+
+# antes de importar a API: logs de auditoria em memória e segredo de teste
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+os.environ.setdefault("MONGO_URI", "memoria://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import asyncio
+import json
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+import httpx
+import sqlalchemy
+
+import metricas
+
+from database_mysql import DATABASE_URL, SessionLocal
+from models import Colheita, Cultivo, Evento, Hortas, Parcela, Produto, Usuarios
+
+# Diferença aceita em relação ao baseline antes de contar como regressão
+TOLERANCIA = 0.20
+
+# Clientes simultâneos só de rotas pesadas no modo --sobrecarga
+PESADAS_CONCORRENCIA = 32
+
+# Processos iniciados no modo --inicializacao, e a espera máxima por cada um
+INICIALIZACAO_RODADAS = 5
+INICIALIZACAO_LIMITE_S = 60
+
+# Clientes simultâneos do modo --carga
+CARGA_NIVEIS = "50,200,1000"
+
+# Cenários que precisam fazer o mesmo número de comandos SQL por requisição
+# (ex: contagem de participantes para uma página pequena e para todos os eventos)
+MESMAS_CONSULTAS = [("GET /eventos?contagens&limit=10", "GET /eventos?contagens")]
+
+
+@dataclass
+class Cenario:
+    nome: str
+    montar: Callable[[int], dict]         # índice -> argumentos de httpx.request
+    depois: Callable | None = None        # recebe (índice, resposta)
+    requisicoes: int | None = None        # limite próprio (ex: bcrypt)
+    esperado: tuple = (200, 201, 204, 207, 304)
+
+
+def _rss_pico_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _referencias(rng: random.Random) -> dict:
+    """Ids existentes no banco, para montar as requisições."""
+    db = SessionLocal()
+    try:
+        ref = {
+            "produtos": [p for (p,) in db.query(Produto.id_produto)],
+            "parcelas": [p for (p,) in db.query(Parcela.id_parcela).limit(5000)],
+            "eventos": [e for (e,) in db.query(Evento.id_evento).limit(5000)],
+            "usuarios": [u for (u,) in db.query(Usuarios.id_usuario).limit(5000)],
+            "hortas": [h for (h,) in db.query(Hortas.id_horta).limit(1000)],
+            "cultivos": [tuple(c) for c in db.query(Cultivo.id_produto, Cultivo.id_parcela, Cultivo.data_plantio).limit(1000)],
+            "max_colheita": db.query(sqlalchemy.func.max(Colheita.id_colheita)).scalar() or 0,
+        }
+    finally:
+        db.close()
+    if not ref["produtos"] or not ref["parcelas"] or not ref["usuarios"]:
+        raise SystemExit("Banco sem dados: rode gerar_dados.py antes")
+    rng.shuffle(ref["usuarios"])
+    return ref
+
+
+def cenarios(ref: dict, rng: random.Random, token: str) -> list[Cenario]:
+    """Todos os endpoints, em ordem: criações antes das alterações e remoções que usam os ids criados."""
+    rodada = uuid.uuid4().hex[:8]
+    criados = {"hortas": [], "produtos": [], "parcelas": [], "eventos": [], "grupos": [],
+               "usuarios": [], "colheitas": [], "cultivos": [], "participacoes": []}
+    hoje = date.today()
+
+    def produto():
+        return rng.choice(ref["produtos"])
+
+    def parcela():
+        return rng.choice(ref["parcelas"])
+
+    def guardar(tipo, campo=None):
+        def depois(i, r):
+            if r.status_code == 201:
+                corpo = r.json()
+                criados[tipo].append(corpo[campo] if campo else corpo)
+        return depois
+
+    def criado(tipo, i):
+        return criados[tipo][i % len(criados[tipo])] if criados[tipo] else None
+
+    def participacao(i, deslocamento=0):
+        # pares distintos: usuários existentes x eventos criados nesta rodada
+        usuarios, eventos = ref["usuarios"], criados["eventos"]
+        n = i + deslocamento
+        return {"id_usuario": usuarios[n % len(usuarios)], "id_evento": eventos[(n // len(usuarios)) % len(eventos)],
+                "papel": "Participante"}
+
+    def colheita_item():
+        return {"id_produto": produto(), "id_parcela": parcela(),
+                "data_colheita": str(hoje - timedelta(days=rng.randrange(365))),
+                "quantidade_kg": round(rng.uniform(0.5, 20), 2)}
+
+    def remover_criado(tipo, url):
+        def montar(i):
+            # sem nada criado para remover, a requisição conta como erro
+            alvo = url(criados[tipo].pop()) if criados[tipo] else "/nada-para-remover"
+            return {"method": "DELETE", "url": alvo}
+        return montar
+
+    intervalo = f"data_inicio={hoje - timedelta(days=180)}&data_fim={hoje}"
+    produtos_etag = {}
+
+    def produtos_condicional(i):
+        return {"method": "GET", "url": "/produtos", "headers": {"If-None-Match": produtos_etag.get("etag", "")}}
+
+    return [
+        # --- leituras ---
+        Cenario("GET /health/live", lambda i: {"method": "GET", "url": "/health/live"}),
+        Cenario("GET /health/ready", lambda i: {"method": "GET", "url": "/health/ready"}),
+        Cenario("GET /metrics", lambda i: {"method": "GET", "url": "/metrics"}, requisicoes=50),
+        Cenario("GET /produtos", lambda i: {"method": "GET", "url": "/produtos"},
+                depois=lambda i, r: produtos_etag.setdefault("etag", r.headers.get("etag"))),
+        Cenario("GET /produtos (If-None-Match)", produtos_condicional, esperado=(304,)),
+        Cenario("GET /parcelas?limit=100", lambda i: {"method": "GET", "url": "/parcelas?limit=100"}),
+        Cenario("GET /hortas?limit=100", lambda i: {"method": "GET", "url": "/hortas?limit=100"}),
+        Cenario("GET /eventos?limit=100", lambda i: {"method": "GET", "url": "/eventos?limit=100"}),
+        Cenario("GET /eventos?contagens&limit=10", lambda i: {"method": "GET", "url": "/eventos?contagens=true&limit=10"}),
+        Cenario("GET /eventos?contagens", lambda i: {"method": "GET", "url": "/eventos?contagens=true"}, requisicoes=50),
+        Cenario("GET /eventos/proximos", lambda i: {"method": "GET", "url": f"/eventos/proximos?a_partir_de={hoje - timedelta(days=365)}"}),
+        Cenario("GET /eventos/{id}/participantes", lambda i: {
+            "method": "GET", "url": f"/eventos/{rng.choice(ref['eventos'])}/participantes?limit=100"}),
+        Cenario("GET /usuarios/{id}/eventos", lambda i: {
+            "method": "GET", "url": f"/usuarios/{rng.choice(ref['usuarios'])}/eventos?limit=100"}),
+        Cenario("GET /usuarios?limit=100", lambda i: {"method": "GET", "url": "/usuarios?limit=100"}),
+        Cenario("GET /usuarios/me", lambda i: {"method": "GET", "url": "/usuarios/me",
+                                               "headers": {"Authorization": f"Bearer {token}"}}),
+        Cenario("GET /cultivos?limit=100", lambda i: {"method": "GET", "url": "/cultivos?limit=100"}),
+        Cenario("GET /cultivos?id_parcela", lambda i: {"method": "GET", "url": f"/cultivos?id_parcela={parcela()}"}),
+        Cenario("GET /colheitas?limit=100", lambda i: {"method": "GET", "url": "/colheitas?limit=100"}),
+        Cenario("GET /colheitas?parcela,produto,datas", lambda i: {
+            "method": "GET", "url": f"/colheitas?id_parcela={parcela()}&id_produto={produto()}&{intervalo}"}),
+        Cenario("GET /colheitas/{id}", lambda i: {
+            "method": "GET", "url": f"/colheitas/{rng.randint(1, max(ref['max_colheita'], 1))}"}, esperado=(200, 404)),
+        Cenario("GET /relatorios/colheitas", lambda i: {"method": "GET", "url": "/relatorios/colheitas?agrupar_por=produto,mes"}),
+        Cenario("GET /cultivos/export", lambda i: {"method": "GET", "url": f"/cultivos/export?id_parcela={parcela()}"},
+                requisicoes=50),
+        Cenario("GET /colheitas/export", lambda i: {"method": "GET", "url": f"/colheitas/export?id_parcela={parcela()}"},
+                requisicoes=50),
+
+        # --- autenticação (bcrypt) ---
+        Cenario("POST /login", lambda i: {"method": "POST", "url": "/login",
+                                          "data": {"username": "admin@horta.com", "password": "123456"}}, requisicoes=20),
+        Cenario("POST /usuarios", lambda i: {"method": "POST", "url": "/usuarios", "json": {
+            "nome": f"Bench {i}", "email": f"bench-{rodada}-{i}@horta.com", "senha": "123456", "id_grupo": 2}},
+            depois=guardar("usuarios", "id_usuario"), requisicoes=20),
+        Cenario("POST /usuarios/import", lambda i: {
+            "method": "POST", "url": "/usuarios/import", "headers": {"Content-Type": "text/csv"},
+            "content": "nome,email,telefone,id_grupo,senha\n" + "".join(
+                f"Import {i}-{k},import-{rodada}-{i}-{k}@horta.com,,2,123456\n" for k in range(10))},
+            requisicoes=5),
+        Cenario("PUT /usuarios/{id}", lambda i: {"method": "PUT", "url": f"/usuarios/{criado('usuarios', i)}",
+                                                 "json": {"telefone": f"(11) 9{i:04d}-0000"}}),
+        Cenario("DELETE /usuarios/{id}", remover_criado("usuarios", lambda id: f"/usuarios/{id}"), requisicoes=20),
+
+        # --- cadastros simples ---
+        Cenario("POST /grupos", lambda i: {"method": "POST", "url": "/grupos", "json": {"nome_grupo": f"Grupo {i}"}},
+                depois=guardar("grupos", "id_grupo")),
+        Cenario("PUT /grupos/{id}", lambda i: {"method": "PUT", "url": f"/grupos/{criado('grupos', i)}",
+                                               "json": {"nome_grupo": f"Grupo {i}", "descricao": "alterado"}}),
+        Cenario("DELETE /grupos/{id}", remover_criado("grupos", lambda id: f"/grupos/{id}")),
+        Cenario("POST /hortas", lambda i: {"method": "POST", "url": "/hortas",
+                                           "json": {"nome": f"Horta {i}", "localizacao": "Bench"}},
+                depois=guardar("hortas", "id_horta")),
+        Cenario("PUT /hortas/{id}", lambda i: {"method": "PUT", "url": f"/hortas/{criado('hortas', i)}",
+                                               "json": {"localizacao": "Bench alterada"}}),
+        Cenario("DELETE /hortas/{id}", remover_criado("hortas", lambda id: f"/hortas/{id}")),
+        Cenario("POST /produtos", lambda i: {"method": "POST", "url": "/produtos",
+                                             "json": {"nome": f"Produto {i}", "tipo": "Legume"}},
+                depois=guardar("produtos", "id_produto")),
+        Cenario("PUT /produtos/{id}", lambda i: {"method": "PUT", "url": f"/produtos/{criado('produtos', i)}",
+                                                 "json": {"nome": f"Produto {i}", "tipo": "Fruta"}}),
+        Cenario("DELETE /produtos/{id}", remover_criado("produtos", lambda id: f"/produtos/{id}")),
+        Cenario("POST /parcelas", lambda i: {"method": "POST", "url": "/parcelas",
+                                             "json": {"tamanho": 10, "localizacao": f"Bench {i}"}},
+                depois=guardar("parcelas", "id_parcela")),
+        Cenario("PUT /parcelas/{id}", lambda i: {"method": "PUT", "url": f"/parcelas/{criado('parcelas', i)}",
+                                                 "json": {"status": "Em Repouso"}}),
+        Cenario("DELETE /parcelas/{id}", remover_criado("parcelas", lambda id: f"/parcelas/{id}")),
+        Cenario("POST /eventos", lambda i: {"method": "POST", "url": "/eventos",
+                                            "json": {"nome": f"Evento {i}", "data_evento": str(hoje + timedelta(days=30))}},
+                depois=guardar("eventos", "id_evento")),
+        Cenario("PUT /eventos/{id}", lambda i: {"method": "PUT", "url": f"/eventos/{criado('eventos', i)}",
+                                                "json": {"local_evento": "Bench"}}),
+
+        # --- participações (nos eventos criados acima) ---
+        Cenario("POST /participacoes", lambda i: {"method": "POST", "url": "/participacoes", "json": participacao(i)},
+                depois=guardar("participacoes")),
+        Cenario("POST /participacoes/batch", lambda i: {
+            "method": "POST", "url": "/participacoes/batch?modo=melhor_esforco",
+            "json": [participacao(i * 50 + k, deslocamento=100_000) for k in range(50)]}, requisicoes=20),
+        Cenario("DELETE /participacoes/{u}/{e}", remover_criado(
+            "participacoes", lambda p: f"/participacoes/{p['id_usuario']}/{p['id_evento']}")),
+
+        # --- cultivos e colheitas ---
+        Cenario("POST /cultivos", lambda i: {"method": "POST", "url": "/cultivos", "json": {
+            "id_produto": produto(), "id_parcela": parcela(),
+            "data_plantio": str(date(2030, 1, 1) + timedelta(days=i)), "status_cultivo": "Plantado"}},
+            depois=guardar("cultivos")),
+        Cenario("POST /cultivos/batch", lambda i: {"method": "POST", "url": "/cultivos/batch", "json": [
+            {"id_produto": produto(), "id_parcela": parcela(),
+             "data_plantio": str(date(2040, 1, 1) + timedelta(days=i * 100 + k)), "status_cultivo": "Plantado"}
+            for k in range(100)]}, requisicoes=20),
+        Cenario("PUT /cultivos/{chave}", lambda i: {"method": "PUT", "url": "/cultivos/{id_produto}/{id_parcela}/{data_plantio}".format(
+            **criado("cultivos", i)), "json": {"status_cultivo": "Crescendo"}}),
+        Cenario("DELETE /cultivos/{chave}", remover_criado(
+            "cultivos", lambda c: "/cultivos/{id_produto}/{id_parcela}/{data_plantio}".format(**c))),
+        Cenario("POST /colheitas", lambda i: {"method": "POST", "url": "/colheitas", "json": colheita_item()},
+                depois=guardar("colheitas", "id_colheita")),
+        Cenario("POST /colheitas/batch", lambda i: {"method": "POST", "url": "/colheitas/batch",
+                                                    "json": [colheita_item() for _ in range(100)]}, requisicoes=20),
+        Cenario("PUT /colheitas/{id}", lambda i: {"method": "PUT", "url": f"/colheitas/{criado('colheitas', i)}",
+                                                  "json": colheita_item()}),
+        Cenario("DELETE /colheitas/{id}", remover_criado("colheitas", lambda id: f"/colheitas/{id}")),
+        Cenario("DELETE /eventos/{id}", remover_criado("eventos", lambda id: f"/eventos/{id}"), esperado=(204, 400)),
+    ]
+
+
+def _percentil(ordenadas: list[float], p: float) -> float:
+    indice = min(int(round(p / 100 * (len(ordenadas) - 1))), len(ordenadas) - 1)
+    return ordenadas[indice]
+
+
+async def executar(cliente, cenario: Cenario, requisicoes: int, concorrencia: int) -> dict:
+    latencias = []
+    erros = 0
+    vagas = asyncio.Semaphore(concorrencia)
+    sql_antes, requisicoes_antes = metricas.http_sql.totais()
+
+    async def uma(i):
+        nonlocal erros
+        async with vagas:
+            argumentos = cenario.montar(i)
+            inicio = time.perf_counter()
+            resposta = await cliente.request(**argumentos)
+            await resposta.aread()
+            latencias.append(time.perf_counter() - inicio)
+        if resposta.status_code not in cenario.esperado:
+            erros += 1
+        if cenario.depois:
+            cenario.depois(i, resposta)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uma(i) for i in range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    ordenadas = sorted(latencias)
+    sql, medidas = metricas.http_sql.totais()
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "sql_por_req": round((sql - sql_antes) / max(medidas - requisicoes_antes, 1), 2),
+        "vazao_rps": round(requisicoes / duracao, 1),
+        "p50_ms": round(_percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(_percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(_percentil(ordenadas, 99) * 1000, 2),
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 2),
+        "rss_pico_mb": _rss_pico_mb(),
+    }
+
+
+def _linha(nome: str, r: dict):
+    print(f"{nome:<42} {r['vazao_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  "
+          f"p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  SQL/req {r['sql_por_req']:>5}  erros {r['erros']}")
+
+
+async def sobrecarga(cliente, ref: dict, rng: random.Random, requisicoes: int, concorrencia: int) -> dict:
+    """
+    A rota barata sozinha, depois junto com um fluxo de rotas pesadas
+    (PESADAS_CONCORRENCIA clientes, bem acima das vagas da classe "pesada").
+
+    Returns:
+        dict: Resultado por cenário; o das pesadas traz também as recusas (503).
+    """
+    barata = Cenario("GET /produtos?limit=10", lambda i: {"method": "GET", "url": "/produtos?limit=10"})
+    pesadas = [
+        lambda: {"method": "GET", "url": f"/colheitas/export?id_parcela={rng.choice(ref['parcelas'])}"},
+        lambda: {"method": "GET", "url": f"/cultivos/export?id_parcela={rng.choice(ref['parcelas'])}"},
+        lambda: {"method": "GET", "url": "/analytics/parcelas"},
+    ]
+    resultados = {"sobrecarga: barata sozinha": await executar(cliente, barata, requisicoes, concorrencia)}
+    _linha("sobrecarga: barata sozinha", resultados["sobrecarga: barata sozinha"])
+
+    parar = asyncio.Event()
+    latencias, status = [], {}
+
+    async def fluxo():
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            resposta = await cliente.request(**rng.choice(pesadas)())
+            await resposta.aread()
+            latencias.append(time.perf_counter() - inicio)
+            status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+            if resposta.status_code in (429, 503):
+                # cliente bem-comportado: espera o Retry-After
+                await asyncio.sleep(float(resposta.headers.get("retry-after", 1)))
+
+    inicio = time.perf_counter()
+    tarefas = [asyncio.create_task(fluxo()) for _ in range(PESADAS_CONCORRENCIA)]
+    # deixa as vagas pesadas lotarem antes de medir
+    await asyncio.sleep(0.5)
+    resultados["sobrecarga: barata com pesadas"] = await executar(cliente, barata, requisicoes, concorrencia)
+    parar.set()
+    await asyncio.gather(*tarefas)
+    duracao = time.perf_counter() - inicio
+    _linha("sobrecarga: barata com pesadas", resultados["sobrecarga: barata com pesadas"])
+
+    ordenadas = sorted(latencias)
+    aceitas = status.get(200, 0)
+    resultados["sobrecarga: pesadas"] = {
+        "requisicoes": len(latencias),
+        "erros": len(latencias) - aceitas - status.get(503, 0),
+        "recusadas_503": status.get(503, 0),
+        "vazao_rps": round(aceitas / duracao, 1),
+        "p50_ms": round(_percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(_percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(_percentil(ordenadas, 99) * 1000, 2),
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 2),
+        "rss_pico_mb": _rss_pico_mb(),
+    }
+    r = resultados["sobrecarga: pesadas"]
+    print(f"{'sobrecarga: pesadas':<42} {r['vazao_rps']:>9.1f} req/s aceitas  "
+          f"{r['recusadas_503']} recusadas (503)  erros {r['erros']}")
+    return resultados
+
+
+def _rotas_de_carga(app):
+    """A mesma listagem de produtos pelas duas pilhas, só para o modo --carga."""
+    from fastapi import Depends
+
+    from database_mysql import get_async_read_db, get_read_db
+    from paginacao import paginar
+    from schemas import ProdutoOut
+
+    chave = [Produto.id_produto]
+
+    @app.get("/_carga/sincrona", response_model=list[ProdutoOut])
+    def sincrona(limit: int = 100, db=Depends(get_read_db)):
+        return paginar(db.query(Produto), chave, limit, None)[0]
+
+    @app.get("/_carga/assincrona", response_model=list[ProdutoOut])
+    async def assincrona(limit: int = 100, db=Depends(get_async_read_db)):
+        return (await db.run_sync(lambda s: paginar(s.query(Produto), chave, limit, None)))[0]
+
+
+async def carga(cliente, niveis: list[int], requisicoes: int) -> dict:
+    """
+    Pilha síncrona x assíncrona em cada nível de clientes simultâneos, com
+    pelo menos duas requisições por cliente.
+
+    Returns:
+        dict: Resultado por pilha e nível ("carga: sincrona x200").
+    """
+    import admissao
+
+    leitura = admissao.compartimentos["leitura"]
+    resultados = {}
+    try:
+        for nivel in niveis:
+            # mais vagas que threads travaria a pilha síncrona: a sessão só é fechada
+            # (e a conexão devolvida ao pool) numa thread livre
+            admissao.compartimentos["leitura"] = admissao.Compartimento("leitura", leitura.limite, nivel, 60)
+            for pilha in ("sincrona", "assincrona"):
+                nome = f"carga: {pilha} x{nivel}"
+                cenario = Cenario(nome, lambda i, p=pilha: {"method": "GET", "url": f"/_carga/{p}?limit=100"})
+                resultados[nome] = await executar(cliente, cenario, max(requisicoes, 2 * nivel), nivel)
+                _linha(nome, resultados[nome])
+            s, a = resultados[f"carga: sincrona x{nivel}"], resultados[f"carga: assincrona x{nivel}"]
+            print(f"{f'carga: assíncrona/síncrona x{nivel}':<42} vazão {a['vazao_rps'] / s['vazao_rps']:.2f}x  "
+                  f"p99 {a['p99_ms'] / s['p99_ms']:.2f}x")
+    finally:
+        admissao.compartimentos["leitura"] = leitura
+    return resultados
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _subir(porta: int) -> dict:
+    """
+    Um processo uvicorn novo; devolve os segundos desde o Popen até a
+    primeira resposta de cada URL, na ordem (None se ela não respondeu).
+    """
+    urls = {"/health/live": (200,), "/health/ready": (200, 503), "/produtos?limit=1": (200,)}
+    tempos = dict.fromkeys(urls)
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{porta}", timeout=INICIALIZACAO_LIMITE_S) as cliente:
+            for url, aceitos in urls.items():
+                while processo.poll() is None and time.perf_counter() - inicio < INICIALIZACAO_LIMITE_S:
+                    try:
+                        if cliente.get(url).status_code in aceitos:
+                            tempos[url] = time.perf_counter() - inicio
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.005)
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+    return tempos
+
+
+def inicializacao(rodadas: int) -> dict:
+    """
+    Tempo até a primeira resposta de cada URL, em `rodadas` processos novos.
+
+    Returns:
+        dict: Resultado por URL ("inicializacao: /health/live"), com p50/máximo
+        em ms e as rodadas em que ela não respondeu como erros.
+    """
+    medidas = [_subir(_porta_livre()) for _ in range(rodadas)]
+    resultados = {}
+    for url in medidas[0]:
+        tempos = sorted(m[url] for m in medidas if m[url] is not None)
+        nome = f"inicializacao: {url}"
+        resultados[nome] = {
+            "requisicoes": rodadas,
+            "erros": rodadas - len(tempos),
+            "p50_ms": round(_percentil(tempos, 50) * 1000, 1) if tempos else None,
+            "p95_ms": round(_percentil(tempos, 95) * 1000, 1) if tempos else None,
+            "max_ms": round(tempos[-1] * 1000, 1) if tempos else None,
+        }
+        r = resultados[nome]
+        print(f"{nome:<42} p50 {r['p50_ms']} ms  máx {r['max_ms']} ms  sem resposta {r['erros']}/{rodadas}")
+    return resultados
+
+
+def _meta(requisicoes: int, concorrencia: int, semente: int) -> dict:
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "banco": DATABASE_URL.split("://")[0],
+        "requisicoes": requisicoes,
+        "concorrencia": concorrencia,
+        "semente": semente,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+async def rodar(requisicoes: int, concorrencia: int, semente: int, filtro: str | None,
+                modo_sobrecarga: bool = False, niveis_carga: list[int] | None = None) -> dict:
+    from main import app
+
+    if niveis_carga:
+        _rotas_de_carga(app)
+
+    rng = random.Random(semente)
+    ref = _referencias(rng)
+    transporte = httpx.ASGITransport(app=app)
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            login = await cliente.post("/login", data={"username": "admin@horta.com", "password": "123456"})
+            token = login.json().get("access_token", "")
+            if modo_sobrecarga:
+                resultados = await sobrecarga(cliente, ref, rng, requisicoes, concorrencia)
+            if niveis_carga:
+                resultados = await carga(cliente, niveis_carga, requisicoes)
+            for cenario in cenarios(ref, rng, token):
+                if modo_sobrecarga or niveis_carga or (filtro and filtro not in cenario.nome):
+                    continue
+                n = min(requisicoes, cenario.requisicoes or requisicoes)
+                resultados[cenario.nome] = await executar(cliente, cenario, n, concorrencia)
+                _linha(cenario.nome, resultados[cenario.nome])
+    return {
+        "meta": _meta(requisicoes, concorrencia, semente),
+        "rss_pico_mb": _rss_pico_mb(),
+        "cenarios": resultados,
+    }
+
+
+def conferir_consultas(atual: dict) -> list[str]:
+    """Pares de MESMAS_CONSULTAS com número diferente de comandos SQL por requisição."""
+    problemas = []
+    for a, b in MESMAS_CONSULTAS:
+        ra, rb = atual["cenarios"].get(a), atual["cenarios"].get(b)
+        if ra and rb and ra["sql_por_req"] != rb["sql_por_req"]:
+            problemas.append(f"{a}: {ra['sql_por_req']} SQL/req, {b}: {rb['sql_por_req']} SQL/req")
+    return problemas
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float = TOLERANCIA) -> list[str]:
+    """Cenários com p95 maior ou vazão menor que o baseline além da tolerância."""
+    regressoes = []
+    for nome, a in atual["cenarios"].items():
+        b = baseline.get("cenarios", {}).get(nome)
+        if not b:
+            continue
+        if a["p95_ms"] is not None and b["p95_ms"] is not None and a["p95_ms"] > b["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p95 {b['p95_ms']} -> {a['p95_ms']} ms")
+        if "vazao_rps" in a and a["vazao_rps"] < b["vazao_rps"] * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {b['vazao_rps']} -> {a['vazao_rps']} req/s")
+        if a["erros"] > b["erros"]:
+            regressoes.append(f"{nome}: erros {b['erros']} -> {a['erros']}")
+    return regressoes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark da API via ASGI")
+    parser.add_argument("--requisicoes", type=int, default=200, help="por cenário")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--cenario", help="roda só os cenários cujo nome contém este texto")
+    parser.add_argument("--saida", default="benchmark_resultado.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--sobrecarga", action="store_true",
+                        help="só a rota barata, sozinha e sob um fluxo de rotas pesadas")
+    parser.add_argument("--carga", nargs="?", const=CARGA_NIVEIS,
+                        help=f"pilha síncrona x assíncrona com N clientes simultâneos (padrão {CARGA_NIVEIS})")
+    parser.add_argument("--inicializacao", nargs="?", type=int, const=INICIALIZACAO_RODADAS,
+                        help=f"tempo até a primeira resposta de processos uvicorn novos (padrão {INICIALIZACAO_RODADAS} rodadas)")
+    args = parser.parse_args()
+
+    niveis = [int(n) for n in args.carga.split(",")] if args.carga else None
+    if args.inicializacao:
+        resultado = {
+            "meta": _meta(args.requisicoes, args.concorrencia, args.semente),
+            "cenarios": inicializacao(args.inicializacao),
+        }
+        resultado["rss_pico_mb"] = _rss_pico_mb()
+    else:
+        resultado = asyncio.run(rodar(args.requisicoes, args.concorrencia, args.semente, args.cenario, args.sobrecarga, niveis))
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultado em {args.saida} (pico de RSS {resultado['rss_pico_mb']} MB)")
+
+    regressoes = conferir_consultas(resultado)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressoes += comparar(resultado, json.load(f), args.tolerancia)
+    for r in regressoes:
+        print("❌", r)
+    if args.baseline:
+        print(f"{len(regressoes)} regressão(ões) em relação a {args.baseline}")
+    raise SystemExit(1 if regressoes else 0)
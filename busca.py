@@ -0,0 +1,284 @@
+"""
+Busca textual em produtos, hortas, eventos e usuários.
+
+A tabela busca guarda, por registro, o nome e um detalhe (época de
+plantio, localização, descrição ou email) sem acentos e em minúsculas. No
+MySQL ela tem um índice FULLTEXT; no SQLite, uma tabela FTS5 (busca_fts)
+mantida por triggers. Os handlers de escrita chamam indexar()/remover() na
+mesma transação do INSERT/UPDATE/DELETE. Cada termo da consulta vale como
+prefixo ("alf" acha "Alface") e todos precisam aparecer.
+
+    python busca.py reconstruir                 # reindexa tudo a partir das tabelas
+    python busca.py benchmark --linhas 1000000  # índice x LIKE sobre linhas sintéticas
+"""
+import random
+import re
+import statistics
+import time
+import unicodedata
+
+from sqlalchemy import bindparam, delete, func, insert, select, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Busca, Evento, Hortas, Produto, Usuarios
+
+# tipo -> (modelo, coluna da chave, campo do nome, campo do detalhe)
+FONTES = {
+    "produtos": (Produto, Produto.id_produto, "nome", "epoca_plantio"),
+    "hortas": (Hortas, Hortas.id_horta, "nome", "localizacao"),
+    "eventos": (Evento, Evento.id_evento, "nome", "descricao"),
+    "usuarios": (Usuarios, Usuarios.id_usuario, "nome", "email"),
+}
+
+# Máximo de resultados por consulta
+LIMITE = 100
+
+# Linhas por INSERT ao reconstruir
+LOTE = 5000
+
+# No SQLite o texto indexado fica numa tabela FTS5 de conteúdo externo, com
+# triggers copiando cada INSERT/UPDATE/DELETE da tabela busca
+_FTS5 = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busca_fts USING fts5("
+    "nome, detalhe, content='busca', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS busca_ai AFTER INSERT ON busca BEGIN "
+    "INSERT INTO busca_fts(rowid, nome, detalhe) VALUES (new.id, new.nome, new.detalhe); END",
+    "CREATE TRIGGER IF NOT EXISTS busca_ad AFTER DELETE ON busca BEGIN "
+    "INSERT INTO busca_fts(busca_fts, rowid, nome, detalhe) VALUES ('delete', old.id, old.nome, old.detalhe); END",
+    "CREATE TRIGGER IF NOT EXISTS busca_au AFTER UPDATE ON busca BEGIN "
+    "INSERT INTO busca_fts(busca_fts, rowid, nome, detalhe) VALUES ('delete', old.id, old.nome, old.detalhe); "
+    "INSERT INTO busca_fts(rowid, nome, detalhe) VALUES (new.id, new.nome, new.detalhe); END",
+]
+
+
+def normalizar(texto: str | None) -> str:
+    """Minúsculas e sem acentos ("Maracujá" -> "maracuja")."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def termos(consulta: str) -> list[str]:
+    return re.findall(r"[^\W_]+", normalizar(consulta))
+
+
+def criar(conn):
+    """Cria a tabela busca (e, no SQLite, a FTS5 com os triggers)."""
+    Busca.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        for ddl in _FTS5:
+            conn.exec_driver_sql(ddl)
+
+
+# -----------------------
+# ESCRITA
+# -----------------------
+def _linha(tipo: str, registro) -> dict:
+    _, coluna, campo_nome, campo_detalhe = FONTES[tipo]
+    nome = getattr(registro, campo_nome)
+    return {
+        "tipo": tipo,
+        "chave": str(getattr(registro, coluna.key)),
+        "titulo": nome,
+        "nome": normalizar(nome),
+        "detalhe": normalizar(getattr(registro, campo_detalhe)),
+    }
+
+
+def remover(db: Session, tipo: str, chaves):
+    """Tira os registros do índice (DELETE pelo índice único tipo/chave)."""
+    chaves = [str(c) for c in chaves]
+    if chaves:
+        db.execute(delete(Busca).where(Busca.tipo == tipo, Busca.chave.in_(chaves)))
+
+
+def indexar(db: Session, tipo: str, chaves):
+    """
+    Regrava o texto dos registros a partir da tabela de origem (um SELECT,
+    um DELETE e um INSERT); chave sem registro só sai do índice.
+    """
+    modelo, coluna, _, _ = FONTES[tipo]
+    chaves = list(dict.fromkeys(chaves))
+    if not chaves:
+        return
+    remover(db, tipo, chaves)
+    linhas = [_linha(tipo, r) for r in db.execute(select(modelo).where(coluna.in_(chaves))).scalars()]
+    if linhas:
+        db.execute(insert(Busca), linhas)
+
+
+def indexar_objetos(db: Session, tipo: str, *objetos):
+    """Como indexar(), para objetos do ORM (faz o flush para ter os ids gerados)."""
+    db.flush()
+    coluna = FONTES[tipo][1]
+    indexar(db, tipo, [getattr(o, coluna.key) for o in objetos])
+
+
+async def indexar_async(db: AsyncSession, tipo: str, chaves):
+    await db.run_sync(indexar, tipo, chaves)
+
+
+async def indexar_objetos_async(db: AsyncSession, tipo: str, *objetos):
+    await db.run_sync(indexar_objetos, tipo, *objetos)
+
+
+async def remover_async(db: AsyncSession, tipo: str, chaves):
+    await db.run_sync(remover, tipo, chaves)
+
+
+def reconstruir(db: Session) -> int:
+    """Apaga o índice e regrava todos os registros das FONTES; devolve quantos."""
+    db.execute(delete(Busca))
+    total = 0
+    for tipo, (modelo, _, _, _) in FONTES.items():
+        lote = []
+        for registro in db.execute(select(modelo)).scalars():
+            lote.append(_linha(tipo, registro))
+            if len(lote) >= LOTE:
+                db.execute(insert(Busca), lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            db.execute(insert(Busca), lote)
+            total += len(lote)
+    db.commit()
+    return total
+
+
+# -----------------------
+# CONSULTA
+# -----------------------
+def _consulta_mysql(db: Session, palavras, tipos, limite):
+    # modo booleano: +termo* = obrigatório e como prefixo
+    relevancia = match(Busca.nome, Busca.detalhe, against=" ".join(f"+{p}*" for p in palavras)).in_boolean_mode()
+    stmt = select(Busca.tipo, Busca.chave, Busca.titulo, relevancia.label("relevancia")).where(relevancia > 0)
+    if tipos:
+        stmt = stmt.where(Busca.tipo.in_(tipos))
+    return db.execute(stmt.order_by(relevancia.desc()).limit(limite)).all()
+
+
+def _consulta_sqlite(db: Session, palavras, tipos, limite):
+    # bm25 é menor para os melhores resultados; o nome pesa o dobro do detalhe
+    sql = (
+        "SELECT b.tipo, b.chave, b.titulo, -bm25(busca_fts, 2.0, 1.0) AS relevancia "
+        "FROM busca_fts JOIN busca b ON b.id = busca_fts.rowid WHERE busca_fts MATCH :expressao "
+        + ("AND b.tipo IN :tipos " if tipos else "")
+        + "ORDER BY bm25(busca_fts, 2.0, 1.0) LIMIT :limite"
+    )
+    stmt = text(sql)
+    parametros = {"expressao": " ".join(f'"{p}"*' for p in palavras), "limite": limite}
+    if tipos:
+        stmt = stmt.bindparams(bindparam("tipos", expanding=True))
+        parametros["tipos"] = list(tipos)
+    return db.execute(stmt, parametros).all()
+
+
+def _consulta_like(db: Session, palavras, tipos, limite):
+    """Varredura com LIKE (início de palavra), sem índice: referência do benchmark e fallback."""
+    stmt = select(Busca.tipo, Busca.chave, Busca.titulo, (-func.length(Busca.nome)).label("relevancia"))
+    for p in palavras:
+        stmt = stmt.where(
+            Busca.nome.like(f"{p}%") | Busca.nome.like(f"% {p}%")
+            | Busca.detalhe.like(f"{p}%") | Busca.detalhe.like(f"% {p}%")
+        )
+    if tipos:
+        stmt = stmt.where(Busca.tipo.in_(tipos))
+    return db.execute(stmt.order_by(func.length(Busca.nome), Busca.id).limit(limite)).all()
+
+
+def buscar(db: Session, consulta: str, tipos=None, limite: int = 20, usar_indice: bool = True) -> list[dict]:
+    """
+    Registros com todos os termos da consulta (como prefixo), dos mais para
+    os menos relevantes.
+
+    Returns:
+        list[dict]: tipo, id, titulo e relevancia (maior = melhor) de cada resultado.
+    """
+    palavras = termos(consulta)
+    if not palavras:
+        return []
+    limite = min(limite, LIMITE)
+    dialeto = db.get_bind().dialect.name
+    if usar_indice and dialeto == "mysql":
+        linhas = _consulta_mysql(db, palavras, tipos, limite)
+    elif usar_indice and dialeto == "sqlite":
+        linhas = _consulta_sqlite(db, palavras, tipos, limite)
+    else:
+        linhas = _consulta_like(db, palavras, tipos, limite)
+    return [
+        {"tipo": tipo, "id": chave, "titulo": titulo, "relevancia": round(float(relevancia), 4)}
+        for tipo, chave, titulo, relevancia in linhas
+    ]
+
+
+# -----------------------
+# BENCHMARK
+# -----------------------
+def benchmark(db: Session, linhas: int, consultas: int, semente: int = 42) -> dict:
+    """
+    Grava `linhas` registros sintéticos (tipo "benchmark"), mede o índice e o
+    LIKE nas mesmas consultas e apaga os registros no fim.
+
+    Returns:
+        dict: Latência média e p95 (ms) de cada modo.
+    """
+    from gerar_dados import BAIRROS, NOMES, PRODUTOS, SOBRENOMES
+
+    rng = random.Random(semente)
+    palavras = NOMES + SOBRENOMES + BAIRROS + [p for nomes in PRODUTOS.values() for p in nomes]
+    db.execute(delete(Busca).where(Busca.tipo == "benchmark"))
+    for inicio in range(0, linhas, LOTE):
+        db.execute(insert(Busca), [
+            {"tipo": "benchmark", "chave": str(n), "titulo": f"Registro {n}",
+             "nome": normalizar(f"{rng.choice(palavras)} {rng.choice(palavras)} {n}"),
+             "detalhe": normalizar(" ".join(rng.choice(palavras) for _ in range(6)))}
+            for n in range(inicio, min(inicio + LOTE, linhas))
+        ])
+    db.commit()
+    try:
+        # prefixos de 3 a 5 letras, com um ou dois termos (como num type-ahead)
+        amostras = [
+            " ".join(rng.choice(palavras)[:rng.randint(3, 5)] for _ in range(rng.randint(1, 2)))
+            for _ in range(consultas)
+        ]
+        resultado = {}
+        for modo, usar_indice in (("indice", True), ("like", False)):
+            tempos = []
+            for q in amostras:
+                inicio = time.perf_counter()
+                buscar(db, q, ["benchmark"], 20, usar_indice)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos.sort()
+            resultado[modo] = {
+                "media_ms": round(statistics.fmean(tempos), 2),
+                "p95_ms": round(tempos[int(0.95 * (len(tempos) - 1))], 2),
+            }
+        return resultado
+    finally:
+        db.rollback()
+        db.execute(delete(Busca).where(Busca.tipo == "benchmark"))
+        db.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database_mysql import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Índice de busca textual")
+    parser.add_argument("comando", choices=["reconstruir", "benchmark"])
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="registros sintéticos do benchmark")
+    parser.add_argument("--consultas", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.comando == "reconstruir":
+            print(f"✅ {reconstruir(db)} registros indexados")
+        else:
+            r = benchmark(db, args.linhas, args.consultas)
+            for modo, tempos in r.items():
+                print(f"{modo:>7}: média {tempos['media_ms']:>9.2f} ms  p95 {tempos['p95_ms']:>9.2f} ms")
+    finally:
+        db.close()
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import alteracoes
+from models import Alteracao
+
+load_dotenv()
+
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "1000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+# Intervalo mínimo entre leituras das alterações de usuarios feitas por outros workers (segundos)
+AUTH_CACHE_REVALIDAR = float(os.getenv("AUTH_CACHE_REVALIDAR", "2"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Dados do usuário logado guardados no cache (sem a senha)."""
+    id_usuario: str
+    id_grupo: int
+    email: str
+    nome: str | None = None
+    telefone: str | None = None
+
+    @classmethod
+    def de_usuario(cls, u):
+        return cls(id_usuario=u.id_usuario, id_grupo=u.id_grupo, email=u.email, nome=u.nome, telefone=u.telefone)
+
+
+class CacheUsuarios:
+    """
+    Cache LRU com TTL dos usuários autenticados, indexado pelo email do token.
+
+    Cada invalidação avança uma geração; guardar() recebe a geração lida
+    antes da consulta ao banco e descarta o resultado se houve invalidação
+    no meio, para não recolocar no cache um usuário já alterado.
+
+    As invalidações dos handlers só valem para este processo. As escritas
+    feitas por outros workers chegam por revalidar(): no máximo a cada
+    `intervalo` segundos, uma requisição lê as entradas novas de usuarios no
+    registro de alterações (alteracoes.py) e tira do cache só esses usuários.
+    Um acerto no cache não vai ao banco.
+    """
+
+    def __init__(self, maximo: int = AUTH_CACHE_MAX, ttl: float = AUTH_CACHE_TTL,
+                 intervalo: float = AUTH_CACHE_REVALIDAR):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self._revalidacao = threading.Lock()
+        self._cursor = None
+        self._revalidado_em = float("-inf")
+        self.hits = 0
+        self.misses = 0
+
+    def geracao(self) -> int:
+        return self._geracao
+
+    def obter(self, email: str) -> Principal | None:
+        with self._lock:
+            item = self._dados.get(email)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._dados[email]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(email)
+            self.hits += 1
+            return item[1]
+
+    def guardar(self, principal: Principal, geracao: int):
+        with self._lock:
+            if geracao != self._geracao or self.maximo <= 0:
+                return
+            self._dados[principal.email] = (time.monotonic() + self.ttl, principal)
+            self._dados.move_to_end(principal.email)
+            while len(self._dados) > self.maximo:
+                self._dados.popitem(last=False)
+
+    def _remover_onde(self, condicao):
+        with self._lock:
+            self._geracao += 1
+            for email in [e for e, (_, p) in self._dados.items() if condicao(p)]:
+                del self._dados[email]
+
+    def invalidar_usuario(self, id_usuario: str):
+        self._remover_onde(lambda p: p.id_usuario == id_usuario)
+
+    def invalidar_grupo(self, id_grupo: int):
+        self._remover_onde(lambda p: p.id_grupo == id_grupo)
+
+    def limpar(self):
+        self._remover_onde(lambda p: True)
+
+    def revalidar(self, db: Session):
+        """
+        Tira do cache os usuários alterados por qualquer worker desde a última
+        leitura, se ela foi há mais de `intervalo` segundos (senão não faz
+        nada). Parado por mais que o TTL, o cache inteiro já expirou: começa
+        do cursor atual em vez de ler as alterações acumuladas.
+        """
+        agora = time.monotonic()
+        if agora - self._revalidado_em < self.intervalo or not self._revalidacao.acquire(blocking=False):
+            return
+        try:
+            if self._cursor is None or agora - self._revalidado_em > self.ttl:
+                cursor = alteracoes.cursor_atual(db, "usuarios")
+                self.limpar()
+            else:
+                linhas = db.execute(
+                    select(Alteracao.id, Alteracao.chave)
+                    .where(Alteracao.recurso == "usuarios", Alteracao.id > self._cursor)
+                    .order_by(Alteracao.id)
+                ).all()
+                cursor = linhas[-1].id if linhas else self._cursor
+                if linhas:
+                    ids = {json.loads(chave)[0] for _, chave in linhas}
+                    self._remover_onde(lambda p: p.id_usuario in ids)
+            self._cursor, self._revalidado_em = cursor, agora
+        finally:
+            self._revalidacao.release()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "tamanho": len(self._dados)}
+
+
+cache_usuarios = CacheUsuarios()
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from fastapi import Request
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from metricas import instrumentar_engine, sessoes_leitura, QueuePoolMedido, AsyncQueuePoolMedido
 
 load_dotenv()
 
@@ -11,10 +17,103 @@ DB_HOST = os.getenv("MYSQL_HOST")
 DB_PORT = os.getenv("MYSQL_PORT")
 DB_NAME = os.getenv("MYSQL_DB")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Pode ser sobrescrita, ex: DATABASE_URL=sqlite:///horta.db para rodar sem MySQL
+DATABASE_URL = os.getenv("DATABASE_URL", f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+def url_assincrona(url: str) -> str:
+    """Mesma URL com o driver assíncrono (aiomysql / aiosqlite)."""
+    esquema, resto = url.split("://", 1)
+    base = esquema.split("+")[0]
+    driver = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}.get(base, esquema)
+    return f"{driver}://{resto}"
+
+
+# Mesmo banco pelo driver assíncrono; pode ser sobrescrito
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", url_assincrona(DATABASE_URL))
+
+# Réplica de leitura (opcional): os GETs leem dela, as escritas vão sempre
+# para o primário. Vazio = tudo no primário.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+ASYNC_REPLICA_DATABASE_URL = os.getenv(
+    "ASYNC_REPLICA_DATABASE_URL", url_assincrona(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else ""
+)
+# Depois de uma escrita, as leituras do mesmo cliente ficam no primário por
+# esses segundos (tempo para a réplica alcançar o primário)
+LEITURA_PRIMARIO_SEGUNDOS = float(os.getenv("LEITURA_PRIMARIO_SEGUNDOS", "5"))
+# Réplica que falhou fica fora por esses segundos antes de ser tentada de novo
+REPLICA_RETRY_SEGUNDOS = float(os.getenv("REPLICA_RETRY_SEGUNDOS", "10"))
+
+# Pool de conexões (valores padrão do SQLAlchemy, exceto recycle/pre-ping)
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("MYSQL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", "3600"))
+POOL_PRE_PING = os.getenv("MYSQL_POOL_PRE_PING", "1") == "1"
+# Tempo máximo para abrir uma conexão (o padrão do driver espera bem mais)
+CONNECT_TIMEOUT = int(os.getenv("MYSQL_CONNECT_TIMEOUT", "5"))
+
+
+def opcoes_pool(url: str, poolclass) -> dict:
+    """Parâmetros de pool para o MySQL; outros backends ficam com o padrão."""
+    if not url.startswith("mysql"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+        "connect_args": {"connect_timeout": CONNECT_TIMEOUT},
+    }
+
+
+def _configurar_sqlite(engine):
+    """
+    No SQLite as FKs só são conferidas com o pragma ligado em cada conexão
+    (a API depende disso, ver escrita.py); WAL deixa leituras andarem
+    durante uma escrita.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _ligar(conexao, registro):
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
+engine = create_engine(DATABASE_URL, echo=False, future=True, **opcoes_pool(DATABASE_URL, QueuePoolMedido))
+# expire_on_commit=False: devolver a entidade depois do commit não custa um SELECT de refresh
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **opcoes_pool(ASYNC_DATABASE_URL, AsyncQueuePoolMedido))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+_configurar_sqlite(engine)
+_configurar_sqlite(async_engine.sync_engine)
+instrumentar_engine(engine, "sync")
+instrumentar_engine(async_engine, "async")
+
+replica_engine = async_replica_engine = None
+ReplicaSessionLocal = AsyncReplicaSessionLocal = None
+if REPLICA_DATABASE_URL:
+    # pool próprio: um pico de leituras não toma as conexões das escritas
+    replica_engine = create_engine(
+        REPLICA_DATABASE_URL, echo=False, future=True, **opcoes_pool(REPLICA_DATABASE_URL, QueuePoolMedido)
+    )
+    ReplicaSessionLocal = sessionmaker(bind=replica_engine, autocommit=False, autoflush=False, expire_on_commit=False)
+    async_replica_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL, echo=False, **opcoes_pool(ASYNC_REPLICA_DATABASE_URL, AsyncQueuePoolMedido)
+    )
+    AsyncReplicaSessionLocal = async_sessionmaker(bind=async_replica_engine, autoflush=False, expire_on_commit=False)
+    _configurar_sqlite(replica_engine)
+    _configurar_sqlite(async_replica_engine.sync_engine)
+    instrumentar_engine(replica_engine, "sync_replica")
+    instrumentar_engine(async_replica_engine, "async_replica")
 
 Base = declarative_base()
 
@@ -24,3 +123,145 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# -----------------------
+# RÉPLICA DE LEITURA
+# -----------------------
+# Cookie com o instante (epoch) até o qual o cliente lê do primário; vale
+# entre workers. Clientes sem cookie caem no registro em memória abaixo.
+COOKIE_PRIMARIO = "horta_primario"
+
+_lock_replica = threading.Lock()
+_replica = {"saudavel": True, "erro": None, "falhou_em": 0.0}
+# identidade do cliente -> time.monotonic() até o qual lê do primário
+_escritas_recentes = {}
+
+
+def _replica_falhou(erro):
+    with _lock_replica:
+        _replica.update(saudavel=False, erro=str(erro), falhou_em=time.monotonic())
+    print("⚠️ Réplica de leitura indisponível, lendo do primário:", erro)
+
+
+def _replica_ok():
+    with _lock_replica:
+        _replica.update(saudavel=True, erro=None)
+
+
+def _replica_disponivel() -> bool:
+    """Configurada e saudável (ou já passou o intervalo para tentar de novo)."""
+    if ReplicaSessionLocal is None:
+        return False
+    with _lock_replica:
+        return _replica["saudavel"] or time.monotonic() - _replica["falhou_em"] >= REPLICA_RETRY_SEGUNDOS
+
+
+def estado_replica() -> dict:
+    with _lock_replica:
+        return {"configurada": ReplicaSessionLocal is not None, "saudavel": _replica["saudavel"], "erro": _replica["erro"]}
+
+
+def _conexao_perdida(contexto):
+    # queda no meio de uma consulta: as próximas leituras vão para o primário
+    if contexto.is_disconnect:
+        _replica_falhou(contexto.original_exception)
+
+
+if replica_engine is not None:
+    event.listen(replica_engine, "handle_error", _conexao_perdida)
+    event.listen(async_replica_engine.sync_engine, "handle_error", _conexao_perdida)
+
+
+def identidade(request: Request) -> str:
+    """Quem fez a requisição: o token, se houver, senão o IP."""
+    return request.headers.get("authorization") or (request.client.host if request.client else "")
+
+
+def registrar_escrita(request: Request):
+    """Marca o cliente para ler do primário pelos próximos LEITURA_PRIMARIO_SEGUNDOS."""
+    agora = time.monotonic()
+    with _lock_replica:
+        if len(_escritas_recentes) > 10000:
+            for chave in [k for k, ate in _escritas_recentes.items() if ate <= agora]:
+                del _escritas_recentes[chave]
+        _escritas_recentes[identidade(request)] = agora + LEITURA_PRIMARIO_SEGUNDOS
+
+
+def _escreveu_ha_pouco(request: Request) -> bool:
+    try:
+        if float(request.cookies.get(COOKIE_PRIMARIO, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    with _lock_replica:
+        return _escritas_recentes.get(identidade(request), 0) > time.monotonic()
+
+
+def _destino_leitura(request: Request) -> str:
+    if ReplicaSessionLocal is None:
+        return "primario"
+    if _escreveu_ha_pouco(request):
+        return "primario_escrita_recente"
+    if not _replica_disponivel():
+        return "primario_replica_indisponivel"
+    return "replica"
+
+
+def sessao_leitura(request: Request):
+    """
+    Sessão para uma leitura: da réplica, a não ser que o cliente tenha
+    escrito há pouco ou a réplica esteja fora. A conexão é aberta aqui para
+    que uma réplica fora do ar caia para o primário sem falhar a requisição.
+    """
+    destino = _destino_leitura(request)
+    if destino == "replica":
+        db = ReplicaSessionLocal()
+        try:
+            db.connection()
+            _replica_ok()
+            sessoes_leitura.inc(1, destino)
+            return db
+        except DBAPIError as e:
+            db.close()
+            _replica_falhou(e)
+            destino = "primario_replica_indisponivel"
+    sessoes_leitura.inc(1, destino)
+    return SessionLocal()
+
+
+async def _sessao_leitura_async(request: Request):
+    destino = _destino_leitura(request)
+    if destino == "replica":
+        db = AsyncReplicaSessionLocal()
+        try:
+            await db.connection()
+            _replica_ok()
+            sessoes_leitura.inc(1, destino)
+            return db
+        except DBAPIError as e:
+            await db.close()
+            _replica_falhou(e)
+            destino = "primario_replica_indisponivel"
+    sessoes_leitura.inc(1, destino)
+    return AsyncSessionLocal()
+
+
+def get_read_db(request: Request):
+    """Como get_db, para os GETs (ver sessao_leitura)."""
+    db = sessao_leitura(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    db = await _sessao_leitura_async(request)
+    try:
+        yield db
+    finally:
+        await db.close()
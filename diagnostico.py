@@ -0,0 +1,387 @@
+"""
+Diagnóstico sob demanda: perfil por requisição e log de consultas lentas.
+
+Perfil: uma requisição com o cabeçalho X-Perfil: 1 de um usuário do
+GRUPO_ADMIN, ou sorteada com probabilidade PERFIL_AMOSTRAGEM, é perfilada
+por amostragem de pilhas. Uma thread lê sys._current_frames() a cada
+PERFIL_INTERVALO_MS enquanto a requisição roda, ignorando threads paradas
+(esperando fila, lock ou socket ocioso), e o resultado vai para PERFIS_DIR
+em JSON com as funções mais frequentes e as pilhas no formato "folded"
+(flamegraph.pl, speedscope). A resposta traz o id no cabeçalho X-Perfil-Id.
+As amostras são do processo inteiro: com outras requisições em andamento
+elas se misturam, e o perfil registra quantas eram.
+
+Consultas lentas: todo comando SQL acima de LENTAS_LIMITE_MS entra num
+buffer em memória (por worker) com o texto, o formato dos parâmetros (tipos,
+nunca os valores), a duração e a rota de origem.
+
+Desligados, custam uma comparação por comando SQL e um ContextVar por requisição.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+import metricas
+
+load_dotenv()
+
+# Fração das requisições perfiladas sem pedido (0 = só com o cabeçalho)
+PERFIL_AMOSTRAGEM = float(os.getenv("PERFIL_AMOSTRAGEM", "0"))
+PERFIL_INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", "5"))
+# Perfis guardados em disco (os mais antigos são apagados)
+PERFIL_MAX = int(os.getenv("PERFIL_MAX", "100"))
+PERFIS_DIR = os.getenv("PERFIS_DIR", "perfis")
+CABECALHO_PERFIL = "X-Perfil"
+_CABECALHO = CABECALHO_PERFIL.lower().encode()
+
+# Comandos a partir desta duração entram no log (0 = desligado) e quantos ficam na memória
+LENTAS_LIMITE_MS = float(os.getenv("LENTAS_LIMITE_MS", "200"))
+LENTAS_MAX = int(os.getenv("LENTAS_MAX", "500"))
+
+# Profundidade máxima das pilhas e tamanho das listas do resumo
+PROFUNDIDADE = 96
+TOP_FUNCOES = 30
+
+# (arquivo, função) no topo da pilha de uma thread parada
+_OCIOSAS = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("connection.py", "wait"),
+}
+
+# Escopo ASGI da requisição atual: rota das consultas lentas e destino das amostras de SQL
+_escopo = ContextVar("diagnostico_escopo", default=None)
+_perfil = ContextVar("diagnostico_perfil", default=None)
+
+
+# -----------------------
+# CONSULTAS LENTAS
+# -----------------------
+_lentas = deque(maxlen=LENTAS_MAX)
+
+# (%s, %s, ...) e (?, ?, ...) dos IN expandidos viram (...) ao agrupar
+_LISTA_PARAMETROS = re.compile(r"\(\s*(?:%s|\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:%s|\?|%\(\w+\)s|:\w+))+\s*\)")
+
+
+def _formato(parametros, executemany: bool = False):
+    """Tipos dos parâmetros, sem os valores (que podem ter dados pessoais)."""
+    if executemany and isinstance(parametros, (list, tuple)):
+        return {"lote": len(parametros), "linha": _formato(parametros[0]) if parametros else None}
+    if isinstance(parametros, dict):
+        if len(parametros) > 20:
+            return {"quantidade": len(parametros), "tipos": dict(Counter(type(v).__name__ for v in parametros.values()))}
+        return {k: type(v).__name__ for k, v in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        if len(parametros) > 20:
+            return {"quantidade": len(parametros), "tipos": dict(Counter(type(v).__name__ for v in parametros))}
+        return [type(v).__name__ for v in parametros]
+    return type(parametros).__name__
+
+
+def _rota(escopo) -> str | None:
+    if escopo is None:
+        return None
+    rota = escopo.get("route")
+    return rota.path if rota is not None else escopo.get("path")
+
+
+@metricas.observar_sql
+def _observar(engine: str, statement: str, parameters, executemany: bool, duracao: float):
+    perfil = _perfil.get()
+    if perfil is not None:
+        perfil.sql(statement, duracao)
+    if LENTAS_LIMITE_MS <= 0 or duracao * 1000 < LENTAS_LIMITE_MS:
+        return
+    escopo = _escopo.get()
+    _lentas.append({
+        "momento": datetime.utcnow(),
+        "duracao_ms": round(duracao * 1000, 2),
+        "engine": engine,
+        "metodo": escopo.get("method") if escopo else None,
+        "rota": _rota(escopo),
+        "statement": statement[:4000],
+        "parametros": _formato(parameters, executemany),
+    })
+
+
+def consultas_lentas(limite: int = 100, rota: str | None = None, agrupar: bool = False) -> list[dict]:
+    """
+    Consultas lentas deste worker, das mais recentes para as mais antigas.
+    agrupar=True soma por (rota, statement), das de maior tempo total para as de menor.
+    """
+    itens = [c for c in reversed(_lentas) if rota is None or c["rota"] == rota]
+    if not agrupar:
+        return itens[:limite]
+    grupos = {}
+    for c in itens:
+        chave = (c["rota"], _LISTA_PARAMETROS.sub("(...)", c["statement"]))
+        g = grupos.get(chave)
+        if g is None:
+            g = grupos[chave] = {"rota": c["rota"], "statement": chave[1], "quantidade": 0,
+                                 "total_ms": 0.0, "max_ms": 0.0, "ultima": c["momento"]}
+        g["quantidade"] += 1
+        g["total_ms"] = round(g["total_ms"] + c["duracao_ms"], 2)
+        g["max_ms"] = max(g["max_ms"], c["duracao_ms"])
+    return sorted(grupos.values(), key=lambda g: g["total_ms"], reverse=True)[:limite]
+
+
+def limpar_consultas_lentas():
+    _lentas.clear()
+
+
+# -----------------------
+# PERFIL
+# -----------------------
+def _pilha(frame, thread: str) -> tuple:
+    quadros = []
+    while frame is not None and len(quadros) < PROFUNDIDADE:
+        codigo = frame.f_code
+        quadros.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+        frame = frame.f_back
+    quadros.append(thread)
+    return tuple(reversed(quadros))
+
+
+def _ociosa(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _OCIOSAS
+
+
+class Perfil:
+    """Amostras de uma requisição perfilada."""
+
+    def __init__(self, escopo: dict, motivo: str, concorrentes: int):
+        self.id = uuid.uuid4().hex
+        self.escopo = escopo
+        self.motivo = motivo
+        self.concorrentes = concorrentes
+        self.momento = datetime.utcnow()
+        self.inicio = time.perf_counter()
+        self.amostras = Counter()
+        self.total_amostras = 0
+        self.comandos_sql = 0
+        self.tempo_sql = 0.0
+        self.mais_lentos = []  # (duração, statement), os 5 maiores
+
+    def sql(self, statement: str, duracao: float):
+        self.comandos_sql += 1
+        self.tempo_sql += duracao
+        if len(self.mais_lentos) < 5 or duracao > self.mais_lentos[-1][0]:
+            self.mais_lentos = sorted(self.mais_lentos + [(duracao, statement[:500])], reverse=True)[:5]
+
+    def resumo(self, status: int, duracao: float) -> dict:
+        proprias, acumuladas = Counter(), Counter()
+        for pilha, n in self.amostras.items():
+            proprias[pilha[-1]] += n
+            for funcao in set(pilha[1:]):
+                acumuladas[funcao] += n
+        total = max(self.total_amostras, 1)
+
+        def top(contagem):
+            return [{"funcao": f, "amostras": n, "pct": round(100 * n / total, 1)}
+                    for f, n in contagem.most_common(TOP_FUNCOES)]
+
+        return {
+            "id": self.id,
+            "momento": self.momento.isoformat(),
+            "motivo": self.motivo,
+            "metodo": self.escopo.get("method"),
+            "caminho": self.escopo.get("path"),
+            "rota": _rota(self.escopo),
+            "status": status,
+            "duracao_ms": round(duracao * 1000, 2),
+            "amostras": self.total_amostras,
+            "intervalo_ms": PERFIL_INTERVALO_MS,
+            "outras_requisicoes": self.concorrentes,
+            "sql": {
+                "comandos": self.comandos_sql,
+                "tempo_ms": round(self.tempo_sql * 1000, 2),
+                "mais_lentos": [{"duracao_ms": round(d * 1000, 2), "statement": s} for d, s in self.mais_lentos],
+            },
+            "funcoes_proprias": top(proprias),
+            "funcoes_acumuladas": top(acumuladas),
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{';'.join(p)} {n}\n" for p, n in self.amostras.most_common())
+
+
+class _Amostrador:
+    """Uma thread para o processo todo; só amostra enquanto há perfis ativos."""
+
+    def __init__(self):
+        self._ativos = set()
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def registrar(self, perfil: Perfil):
+        with self._lock:
+            self._ativos.add(perfil)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._laco, name="amostrador-perfil", daemon=True)
+                self._thread.start()
+        self._acordar.set()
+
+    def remover(self, perfil: Perfil):
+        with self._lock:
+            self._ativos.discard(perfil)
+
+    def _laco(self):
+        proprio = threading.get_ident()
+        while True:
+            self._acordar.wait()
+            with self._lock:
+                ativos = list(self._ativos)
+                if not ativos:
+                    self._acordar.clear()
+                    continue
+            nomes = {t.ident: t.name for t in threading.enumerate()}
+            pilhas = [
+                _pilha(frame, nomes.get(ident, str(ident)))
+                for ident, frame in sys._current_frames().items()
+                if ident != proprio and not _ociosa(frame)
+            ]
+            # com o lock: depois de remover() o perfil não muda mais
+            with self._lock:
+                for perfil in self._ativos:
+                    perfil.total_amostras += 1
+                    perfil.amostras.update(pilhas)
+            time.sleep(PERFIL_INTERVALO_MS / 1000)
+
+
+amostrador = _Amostrador()
+
+
+def _caminho(id_perfil: str) -> str:
+    return os.path.join(PERFIS_DIR, f"{id_perfil}.json")
+
+
+def _salvar(perfil: Perfil, status: int, duracao: float):
+    os.makedirs(PERFIS_DIR, exist_ok=True)
+    dados = perfil.resumo(status, duracao)
+    dados["folded"] = perfil.folded()
+    temporario = _caminho(perfil.id) + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(temporario, _caminho(perfil.id))
+    arquivos = sorted(
+        (e for e in os.scandir(PERFIS_DIR) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime, reverse=True
+    )
+    for antigo in arquivos[PERFIL_MAX:]:
+        try:
+            os.remove(antigo.path)
+        except FileNotFoundError:
+            pass
+
+
+def listar_perfis(limite: int = 50) -> list[dict]:
+    """Resumo dos perfis salvos (de todos os workers), dos mais novos para os mais antigos."""
+    if not os.path.isdir(PERFIS_DIR):
+        return []
+    arquivos = sorted(
+        (e for e in os.scandir(PERFIS_DIR) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime, reverse=True
+    )
+    resultado = []
+    for e in arquivos[:limite]:
+        try:
+            with open(e.path, encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            continue
+        resultado.append({k: dados[k] for k in (
+            "id", "momento", "motivo", "metodo", "rota", "status", "duracao_ms", "amostras", "outras_requisicoes"
+        )})
+    return resultado
+
+
+def ler_perfil(id_perfil: str) -> dict | None:
+    if not re.fullmatch(r"[0-9a-f]{32}", id_perfil):
+        return None
+    try:
+        with open(_caminho(id_perfil), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# -----------------------
+# MIDDLEWARE
+# -----------------------
+class Perfilador:
+    """
+    Middleware ASGI: guarda o escopo da requisição para o log de consultas
+    lentas e perfila as requisições pedidas ou sorteadas. autorizar(cabecalho
+    Authorization) diz se quem pediu o perfil pode pedir; só é chamada
+    quando o cabeçalho X-Perfil vem na requisição.
+    """
+
+    def __init__(self, app, autorizar=lambda autorizacao: False):
+        self.app = app
+        self.autorizar = autorizar
+        self.em_andamento = 0
+
+    async def _motivo(self, scope) -> str | None:
+        pedido, autorizacao = False, ""
+        for nome, valor in scope["headers"]:
+            if nome == _CABECALHO:
+                pedido = valor in (b"1", b"true")
+            elif nome == b"authorization":
+                autorizacao = valor.decode("latin-1")
+        if pedido and await run_in_threadpool(self.autorizar, autorizacao):
+            return "cabecalho"
+        if PERFIL_AMOSTRAGEM > 0 and random.random() < PERFIL_AMOSTRAGEM:
+            return "amostragem"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        _escopo.set(scope)
+        motivo = await self._motivo(scope)
+        self.em_andamento += 1
+        try:
+            if motivo is None:
+                return await self.app(scope, receive, send)
+            await self._perfilar(scope, receive, send, motivo)
+        finally:
+            self.em_andamento -= 1
+
+    async def _perfilar(self, scope, receive, send, motivo: str):
+        perfil = Perfil(scope, motivo, self.em_andamento - 1)
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [(b"x-perfil-id", perfil.id.encode())]
+            await send(mensagem)
+
+        token = _perfil.set(perfil)
+        amostrador.registrar(perfil)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            amostrador.remover(perfil)
+            _perfil.reset(token)
+            perfil.concorrentes = max(perfil.concorrentes, self.em_andamento - 1)
+            try:
+                await run_in_threadpool(_salvar, perfil, status, time.perf_counter() - perfil.inicio)
+            except OSError as e:
+                print("⚠️ Perfil não salvo:", e)
@@ -0,0 +1,385 @@
+"""
+Parcelas livres num período, a partir de um índice em memória da ocupação.
+
+Um cultivo ocupa a parcela do plantio até a primeira colheita do mesmo
+produto na mesma parcela (inclusive); sem colheita, a ocupação continua em
+aberto. Fundidos os intervalos de cada parcela, o que sobra entre eles são
+as lacunas livres, disjuntas: a parcela está livre em [inicio, fim] se e só
+se uma lacuna dela começa até `inicio` e termina depois de `fim`, e nunca
+duas. O índice guarda as lacunas de todas as parcelas numa lista única
+ordenada pelo início, em blocos com o maior fim e o maior tamanho de cada
+um, e as lacunas sem fim (a parcela livre depois do último cultivo) numa
+lista à parte, em que as que começam até `inicio` são exatamente as que
+cobrem a consulta. A consulta percorre só os blocos que começam até
+`inicio`, pula sem olhar os que não têm lacuna chegando a `fim` ou parcela
+com tamanho_min, e nunca visita parcela por parcela: as ocupadas no período
+custam só os blocos delas que não dão para pular. O pior caso (lacunas
+longas, com fim, espalhadas por todos os blocos) ainda é linear nas lacunas.
+
+O índice é carregado na primeira consulta. Os handlers de parcelas,
+cultivos e colheitas chamam indice.atualizar() depois do commit, que relê
+só as parcelas afetadas. A versão das tabelas (versoes.py) denuncia
+escritas de outros workers: conferida no máximo a cada
+DISPONIBILIDADE_REVALIDAR segundos, se ela andou mais do que as escritas
+deste processo o índice é recarregado inteiro. Para conferir o índice
+contra uma varredura completa:
+
+    python disponibilidade.py verificar --consultas 1000
+"""
+import os
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+import versoes
+from database_mysql import SessionLocal
+from models import Colheita, Cultivo, Parcela
+
+load_dotenv()
+
+# Tabelas cujas escritas mudam a disponibilidade
+TABELAS = ("parcela", "cultivos", "colheitas")
+# Intervalo mínimo entre conferências da versão das TABELAS nas consultas (segundos)
+DISPONIBILIDADE_REVALIDAR = float(os.getenv("DISPONIBILIDADE_REVALIDAR", "2"))
+# Lacunas por bloco do índice (um bloco se divide ao passar do dobro)
+BLOCO = 64
+UM_DIA = timedelta(days=1)
+
+
+def ocupacao(db: Session, ids_parcelas=None) -> list:
+    """
+    Uma linha (id_parcela, início, fim) por cultivo; fim None = sem colheita ainda.
+    A primeira colheita sai do índice ix_colheitas_parcela_produto_data.
+    """
+    h = aliased(Colheita)
+    fim = select(func.min(h.data_colheita)).where(
+        h.id_parcela == Cultivo.id_parcela,
+        h.id_produto == Cultivo.id_produto,
+        h.data_colheita >= Cultivo.data_plantio,
+    ).scalar_subquery()
+    stmt = select(Cultivo.id_parcela, Cultivo.data_plantio, fim)
+    if ids_parcelas is not None:
+        stmt = stmt.where(Cultivo.id_parcela.in_(ids_parcelas))
+    return db.execute(stmt).all()
+
+
+def fundir(intervalos) -> tuple[list, list]:
+    """
+    Intervalos [início, fim] fundidos e ordenados.
+
+    Returns:
+        tuple[list, list]: Inícios e fins, ambos crescentes (fim None vira date.max).
+    """
+    inicios, fins = [], []
+    for ini, fim in sorted(intervalos, key=lambda i: i[0]):
+        fim = fim or date.max
+        if fins and ini <= fins[-1]:
+            fins[-1] = max(fins[-1], fim)
+        else:
+            inicios.append(ini)
+            fins.append(fim)
+    return inicios, fins
+
+
+def lacunas(inicios: list, fins: list) -> list[tuple]:
+    """Trechos livres (início, fim) entre os intervalos fundidos de uma parcela, de date.min a date.max."""
+    livres, comeco = [], date.min
+    for ini, fim in zip(inicios, fins):
+        if ini > comeco:
+            livres.append((comeco, ini - UM_DIA))
+        if fim == date.max:
+            return livres
+        comeco = fim + UM_DIA
+    livres.append((comeco, date.max))
+    return livres
+
+
+def _versoes(db: Session) -> tuple:
+    return tuple(int(v) for v in versoes.ler(db, TABELAS).split("."))
+
+
+def _parcela(p) -> dict:
+    return {"id_parcela": p.id_parcela, "tamanho": p.tamanho, "localizacao": p.localizacao, "status": p.status}
+
+
+class _Lacunas:
+    """
+    Lacunas (início, fim, tamanho, id_parcela) ordenadas pelo início, em
+    blocos de BLOCO a 2*BLOCO itens. Cada bloco tem ao lado o primeiro item
+    (para achar o bloco de uma inserção) e o maior fim e o maior tamanho
+    (para a busca pular o bloco inteiro). As lacunas sem fim (depois do
+    último cultivo de cada parcela) ficam numa lista à parte: cobrem a
+    consulta sempre que começam até `inicio`, então o prefixo dela já é a
+    resposta, e fora dos blocos elas não estragam o maior fim deles.
+    """
+
+    def __init__(self, itens=()):
+        itens = sorted(itens)
+        self._abertas = [i for i in itens if i[1] == date.max]
+        itens = [i for i in itens if i[1] != date.max]
+        self._blocos = [itens[i:i + BLOCO] for i in range(0, len(itens), BLOCO)]
+        self._primeiros = [b[0] for b in self._blocos]
+        self._resumos = [self._resumo(b) for b in self._blocos]
+
+    @staticmethod
+    def _resumo(bloco: list) -> tuple:
+        return max(i[1] for i in bloco), max(i[2] for i in bloco)
+
+    def __len__(self) -> int:
+        return len(self._abertas) + sum(len(b) for b in self._blocos)
+
+    def inserir(self, item: tuple):
+        if item[1] == date.max:
+            insort(self._abertas, item)
+            return
+        if not self._blocos:
+            self._blocos, self._primeiros, self._resumos = [[item]], [item], [self._resumo([item])]
+            return
+        i = max(bisect_right(self._primeiros, item) - 1, 0)
+        bloco = self._blocos[i]
+        insort(bloco, item)
+        if len(bloco) > 2 * BLOCO:
+            metade = bloco[BLOCO:]
+            del bloco[BLOCO:]
+            self._blocos.insert(i + 1, metade)
+            self._primeiros.insert(i + 1, metade[0])
+            self._resumos.insert(i + 1, self._resumo(metade))
+        self._primeiros[i] = bloco[0]
+        self._resumos[i] = self._resumo(bloco)
+
+    def remover(self, item: tuple):
+        if item[1] == date.max:
+            del self._abertas[bisect_left(self._abertas, item)]
+            return
+        i = bisect_right(self._primeiros, item) - 1
+        bloco = self._blocos[i]
+        del bloco[bisect_left(bloco, item)]
+        if bloco:
+            self._primeiros[i] = bloco[0]
+            self._resumos[i] = self._resumo(bloco)
+        else:
+            del self._blocos[i], self._primeiros[i], self._resumos[i]
+
+    def cobrindo(self, inicio: date, fim: date, tamanho_min: float):
+        """Lacunas com início <= `inicio`, fim >= `fim` e tamanho >= tamanho_min."""
+        for item in self._abertas[:bisect_right(self._abertas, (inicio, date.max, float("inf")))]:
+            if item[2] >= tamanho_min:
+                yield item
+        for primeiro, (maior_fim, maior_tamanho), bloco in zip(self._primeiros, self._resumos, self._blocos):
+            if primeiro[0] > inicio:
+                return
+            if maior_fim < fim or maior_tamanho < tamanho_min:
+                continue
+            for item in bloco:
+                if item[0] > inicio:
+                    return
+                if item[1] >= fim and item[2] >= tamanho_min:
+                    yield item
+
+
+class IndiceDisponibilidade:
+    """Ocupação das parcelas em memória; seguro para várias threads."""
+
+    def __init__(self, sessao=SessionLocal, intervalo: float = DISPONIBILIDADE_REVALIDAR):
+        self._sessao = sessao
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        # versões das TABELAS que o índice reflete; None = carregar na próxima consulta
+        self._versao = None
+        self._conferido_em = float("-inf")
+        self._parcelas = {}       # id_parcela -> dados da parcela
+        self._da_parcela = {}     # id_parcela -> itens dela em _lacunas
+        self._lacunas = _Lacunas()
+
+    # --- manutenção (chamar com o lock) ---
+    @staticmethod
+    def _itens(p: dict, intervalos: list) -> list[tuple]:
+        return [(ini, fim, p["tamanho"], p["id_parcela"]) for ini, fim in lacunas(*fundir(intervalos))]
+
+    def _tirar(self, id_parcela: int):
+        self._parcelas.pop(id_parcela, None)
+        for item in self._da_parcela.pop(id_parcela, []):
+            self._lacunas.remover(item)
+
+    def _por(self, p: dict, intervalos: list):
+        self._parcelas[p["id_parcela"]] = p
+        self._da_parcela[p["id_parcela"]] = itens = self._itens(p, intervalos)
+        for item in itens:
+            self._lacunas.inserir(item)
+
+    def _carregar(self, db: Session):
+        versao = _versoes(db)
+        por_parcela = {}
+        for id_parcela, ini, fim in ocupacao(db):
+            por_parcela.setdefault(id_parcela, []).append((ini, fim))
+        self._parcelas, self._da_parcela = {}, {}
+        for p in db.query(Parcela):
+            dados = self._parcelas[p.id_parcela] = _parcela(p)
+            self._da_parcela[p.id_parcela] = self._itens(dados, por_parcela.get(p.id_parcela, []))
+        self._lacunas = _Lacunas(item for itens in self._da_parcela.values() for item in itens)
+        self._versao = versao
+
+    def _recarregar(self, db: Session, ids_parcelas):
+        por_parcela = {}
+        for id_parcela, ini, fim in ocupacao(db, ids_parcelas):
+            por_parcela.setdefault(id_parcela, []).append((ini, fim))
+        atuais = {p.id_parcela: p for p in db.query(Parcela).filter(Parcela.id_parcela.in_(ids_parcelas))}
+        for id_parcela in ids_parcelas:
+            self._tirar(id_parcela)
+            if id_parcela in atuais:
+                self._por(_parcela(atuais[id_parcela]), por_parcela.get(id_parcela, []))
+
+    # --- API ---
+    def atualizar(self, ids_parcelas, tabelas: tuple):
+        """
+        Depois do commit de uma escrita que incrementou `tabelas`: relê as
+        parcelas afetadas. Se a versão andou mais do que essa escrita,
+        outro processo também escreveu e o índice fica para recarregar.
+        """
+        if self._versao is None:
+            return
+        ids_parcelas = sorted(set(ids_parcelas))
+        db = self._sessao()
+        try:
+            with self._lock:
+                if self._versao is None:
+                    return
+                atual = _versoes(db)
+                esperada = tuple(v + (t in tabelas) for t, v in zip(TABELAS, self._versao))
+                if atual != esperada:
+                    self._versao = None
+                    return
+                if ids_parcelas:
+                    self._recarregar(db, ids_parcelas)
+                self._versao = atual
+        except Exception as e:
+            # a escrita já foi gravada: só recarrega tudo na próxima consulta
+            self._versao = None
+            print("⚠️ Índice de disponibilidade desatualizado:", e)
+        finally:
+            db.close()
+
+    def _garantir(self):
+        """Carrega o índice, ou confere a versão das TABELAS se já faz `intervalo` segundos."""
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._conferido_em < self.intervalo:
+            return
+        db = self._sessao()
+        try:
+            if self._versao is not None and _versoes(db) == self._versao:
+                self._conferido_em = agora
+                return
+            db.rollback()
+            with self._lock:
+                if self._versao is None or _versoes(db) != self._versao:
+                    self._carregar(db)
+                self._conferido_em = agora
+        finally:
+            db.close()
+
+    def disponiveis(self, inicio: date, fim: date, tamanho_min: float | None = None) -> list[dict]:
+        """
+        Parcelas sem nenhum cultivo ocupando algum dia de [inicio, fim].
+
+        Returns:
+            list[dict]: Dados das parcelas, da menor para a maior.
+        """
+        self._garantir()
+        with self._lock:
+            achadas = sorted((t, id_parcela) for _, _, t, id_parcela in self._lacunas.cobrindo(
+                inicio, fim, float("-inf") if tamanho_min is None else tamanho_min
+            ))
+            return [self._parcelas[id_parcela] for _, id_parcela in achadas]
+
+
+indice = IndiceDisponibilidade()
+
+
+def varredura(db: Session, ids_parcelas=None) -> dict:
+    """
+    Referência de verificar(): os intervalos de cada cultivo calculados aqui
+    a partir das linhas cruas de cultivos e colheitas, sem a subconsulta de
+    ocupacao(), para um erro nela não passar despercebido.
+
+    Returns:
+        dict: id_parcela -> [(plantio, primeira colheita ou None)], uma por cultivo.
+    """
+    cultivos = select(Cultivo.id_parcela, Cultivo.id_produto, Cultivo.data_plantio)
+    colheitas = select(Colheita.id_parcela, Colheita.id_produto, Colheita.data_colheita)
+    if ids_parcelas is not None:
+        cultivos = cultivos.where(Cultivo.id_parcela.in_(ids_parcelas))
+        colheitas = colheitas.where(Colheita.id_parcela.in_(ids_parcelas))
+    datas = {}
+    for id_parcela, id_produto, dia in db.execute(colheitas):
+        datas.setdefault((id_parcela, id_produto), []).append(dia)
+    intervalos = {}
+    for id_parcela, id_produto, plantio in db.execute(cultivos):
+        fim = min((d for d in datas.get((id_parcela, id_produto), []) if d >= plantio), default=None)
+        intervalos.setdefault(id_parcela, []).append((plantio, fim))
+    return intervalos
+
+
+def verificar(consultas: int = 1000, semente: int = 42, alvo: IndiceDisponibilidade | None = None) -> list[str]:
+    """
+    Compara o índice com uma varredura de todos os cultivos e colheitas
+    (varredura()) em consultas aleatórias.
+
+    Args:
+        alvo (IndiceDisponibilidade | None): Índice conferido; sem ele, um
+            carregado do zero (o `indice` da API testa também as atualizações).
+
+    Returns:
+        list[str]: Uma entrada por consulta com resultado diferente (vazia se tudo confere).
+    """
+    rng = random.Random(semente)
+    teste = alvo or IndiceDisponibilidade()
+    db = SessionLocal()
+    try:
+        ocupados = varredura(db)
+        tamanhos = {p.id_parcela: p.tamanho for p in db.query(Parcela)}
+    finally:
+        db.close()
+    # todos os intervalos crus da parcela, sem fundir nem ordenar
+    crus = {id_parcela: ocupados.get(id_parcela, []) for id_parcela in tamanhos}
+    datas = [ini for intervalos in crus.values() for ini, _ in intervalos] or [date.today()]
+    menor, maior = min(datas) - timedelta(days=60), max(datas) + timedelta(days=60)
+    problemas = []
+    for _ in range(consultas):
+        inicio = menor + timedelta(days=rng.randrange((maior - menor).days + 1))
+        fim = inicio + timedelta(days=rng.randrange(180))
+        tamanho_min = rng.choice([None, rng.uniform(0, max(tamanhos.values(), default=1))])
+        esperado = {
+            id_parcela for id_parcela, tamanho in tamanhos.items()
+            if (tamanho_min is None or tamanho >= tamanho_min) and not any(
+                ini <= fim and (f is None or f >= inicio) for ini, f in crus[id_parcela]
+            )
+        }
+        obtido = {p["id_parcela"] for p in teste.disponiveis(inicio, fim, tamanho_min)}
+        if obtido != esperado:
+            problemas.append(
+                f"{inicio}..{fim} tamanho_min={tamanho_min}: "
+                f"sobrando {sorted(obtido - esperado)[:5]}, faltando {sorted(esperado - obtido)[:5]}"
+            )
+    return problemas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Índice de disponibilidade das parcelas")
+    parser.add_argument("comando", choices=["verificar"])
+    parser.add_argument("--consultas", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    problemas = verificar(args.consultas, args.semente)
+    for p in problemas:
+        print("❌", p)
+    print(f"{len(problemas)} consulta(s) divergente(s) em {args.consultas}")
+    raise SystemExit(1 if problemas else 0)
@@ -0,0 +1,96 @@
+"""
+Escritas em um único comando: UPDATE/DELETE direto pela chave, usando
+rowcount para o 404 e RETURNING quando o backend suporta, e constraints
+do banco (unique/FK) no lugar de SELECTs de verificação.
+"""
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+# Códigos de erro do MySQL
+_MYSQL_DUPLICADO = 1062
+_MYSQL_REFERENCIA = (1451, 1452)  # pai com filhos / filho sem pai
+
+
+def erro_integridade(
+    exc: IntegrityError,
+    duplicado: str = "Registro já existe",
+    referencia: str = "Registro relacionado não encontrado",
+    status_referencia: int = 404,
+) -> HTTPException:
+    """
+    Traduz a IntegrityError do banco para a resposta que a API já dava
+    quando essas verificações eram feitas com SELECT antes do INSERT.
+    """
+    orig = exc.orig
+    codigo = orig.args[0] if getattr(orig, "args", None) else None
+    mensagem = str(orig).upper()
+    if codigo == _MYSQL_DUPLICADO or "UNIQUE" in mensagem or "PRIMARY KEY" in mensagem:
+        return HTTPException(400, duplicado)
+    if codigo in _MYSQL_REFERENCIA or "FOREIGN KEY" in mensagem:
+        return HTTPException(status_referencia, referencia)
+    return HTTPException(400, "Violação de integridade")
+
+
+def _filtro(modelo, chave: dict):
+    return [getattr(modelo, k) == v for k, v in chave.items()]
+
+
+def _identidade(chave: dict):
+    valores = tuple(chave.values())
+    return valores[0] if len(valores) == 1 else valores
+
+
+def atualizar(db, modelo, chave: dict, valores: dict):
+    """
+    UPDATE pela chave. Devolve a entidade atualizada, ou None se não existe.
+    Com RETURNING é um comando só; sem ele (MySQL), UPDATE + um SELECT pela PK.
+    """
+    if not valores:
+        return db.get(modelo, _identidade(chave))
+    stmt = update(modelo).where(*_filtro(modelo, chave)).values(**valores)
+    if db.get_bind().dialect.update_returning:
+        return db.scalars(stmt.returning(modelo)).first()
+    if db.execute(stmt).rowcount == 0:
+        return None
+    return db.get(modelo, _identidade(chave), populate_existing=True)
+
+
+async def atualizar_async(db, modelo, chave: dict, valores: dict):
+    """Mesma coisa que atualizar(), para AsyncSession."""
+    if not valores:
+        return await db.get(modelo, _identidade(chave))
+    stmt = update(modelo).where(*_filtro(modelo, chave)).values(**valores)
+    if db.get_bind().dialect.update_returning:
+        return (await db.scalars(stmt.returning(modelo))).first()
+    if (await db.execute(stmt)).rowcount == 0:
+        return None
+    return await db.get(modelo, _identidade(chave), populate_existing=True)
+
+
+def remover(db, modelo, chave: dict) -> bool:
+    """DELETE pela chave; False se nada foi apagado."""
+    return db.execute(delete(modelo).where(*_filtro(modelo, chave))).rowcount > 0
+
+
+async def remover_async(db, modelo, chave: dict) -> bool:
+    return (await db.execute(delete(modelo).where(*_filtro(modelo, chave)))).rowcount > 0
+
+
+def remover_retornando(db, modelo, chave: dict, colunas: list):
+    """
+    DELETE que devolve os valores antigos das colunas (ou None). Usa
+    DELETE ... RETURNING quando existe; senão SELECT ... FOR UPDATE + DELETE.
+    """
+    stmt = delete(modelo).where(*_filtro(modelo, chave))
+    if db.get_bind().dialect.delete_returning:
+        return db.execute(stmt.returning(*colunas)).first()
+    antes = db.query(*colunas).filter(*_filtro(modelo, chave)).with_for_update().first()
+    if antes is not None:
+        db.execute(stmt)
+    return antes
+
+
+async def remover_retornando_async(db, modelo, chave: dict, colunas: list):
+    """Mesma coisa que remover_retornando(), para AsyncSession."""
+    return await db.run_sync(remover_retornando, modelo, chave, colunas)
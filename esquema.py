@@ -0,0 +1,120 @@
+"""
+Schema do banco, separado da subida da API (que não toca no schema):
+
+    python esquema.py criar      # banco novo: create_all + migrações
+    python esquema.py migrar     # banco existente: só as migrações pendentes
+    python esquema.py explicar   # EXPLAIN das consultas quentes; falha se alguma varre a tabela inteira
+"""
+from datetime import date
+
+from sqlalchemy import func, select
+
+from database_mysql import Base, engine
+from migracoes import migrar
+from models import (
+    Colheita, Cultivo, Evento, ParticipacaoEvento, ResumoColheita, Usuarios, VersaoTabela
+)
+
+
+def criar() -> list[str]:
+    """CREATE TABLE do que ainda não existe e aplica as migrações pendentes."""
+    Base.metadata.create_all(bind=engine)
+    return migrar(engine)
+
+
+def consultas_quentes() -> dict:
+    """Consultas dos caminhos mais usados da API, com valores de exemplo."""
+    inicio, fim = date(2024, 1, 1), date(2024, 2, 1)
+    return {
+        "login / usuário logado por email": select(Usuarios).where(Usuarios.email == "admin@horta.com"),
+        "status dos cultivos após colheita": select(Cultivo).where(Cultivo.id_parcela == 1, Cultivo.id_produto == 1),
+        "colheitas por parcela": select(Colheita).where(Colheita.id_parcela == 1),
+        "colheitas por parcela, produto e período": select(Colheita).where(
+            Colheita.id_parcela == 1, Colheita.id_produto == 1,
+            Colheita.data_colheita >= inicio, Colheita.data_colheita <= fim,
+        ),
+        "mínimo/máximo do mês (resumo)": select(func.min(Colheita.quantidade_kg), func.max(Colheita.quantidade_kg)).where(
+            Colheita.id_produto == 1, Colheita.id_parcela == 1,
+            Colheita.data_colheita >= inicio, Colheita.data_colheita < fim,
+        ),
+        "colheita por id": select(Colheita).where(Colheita.id_colheita == 1),
+        "eventos por período": select(Evento).where(Evento.data_evento >= inicio, Evento.data_evento <= fim),
+        "participação": select(ParticipacaoEvento).where(
+            ParticipacaoEvento.id_usuario == "x", ParticipacaoEvento.id_evento == 1
+        ),
+        "participantes do evento": select(ParticipacaoEvento.id_usuario, ParticipacaoEvento.papel).where(
+            ParticipacaoEvento.id_evento == 1
+        ).order_by(ParticipacaoEvento.id_usuario),
+        "participações por papel (página de eventos)": select(
+            ParticipacaoEvento.id_evento, ParticipacaoEvento.papel, func.count()
+        ).where(ParticipacaoEvento.id_evento.between(1, 100)).group_by(ParticipacaoEvento.id_evento, ParticipacaoEvento.papel),
+        "eventos do usuário": select(ParticipacaoEvento.id_evento).where(ParticipacaoEvento.id_usuario == "x"),
+        "próximos eventos": select(Evento).where(Evento.data_evento >= inicio).order_by(
+            Evento.data_evento, Evento.id_evento
+        ).limit(20),
+        "resumo do mês": select(ResumoColheita).where(
+            ResumoColheita.id_produto == 1, ResumoColheita.id_parcela == 1,
+            ResumoColheita.ano == 2024, ResumoColheita.mes == 1,
+        ),
+        "versão da tabela (ETag)": select(VersaoTabela.versao).where(VersaoTabela.tabela == "produto"),
+    }
+
+
+def _plano(conn, stmt) -> list:
+    compilado = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    parametros = compilado.params
+    if compilado.positional:
+        parametros = tuple(parametros[nome] for nome in compilado.positiontup)
+    prefixo = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    return conn.exec_driver_sql(prefixo + str(compilado), parametros).mappings().all()
+
+
+def _varredura(dialeto: str, linha) -> str | None:
+    """Descrição da varredura completa nesta linha do plano, ou None."""
+    if dialeto == "sqlite":
+        detalhe = linha["detail"]
+        return detalhe if detalhe.startswith("SCAN ") else None
+    # MySQL: type=ALL sem nenhum índice candidato
+    if linha["type"] == "ALL" and not linha["possible_keys"]:
+        return f"tabela {linha['table']} sem índice utilizável"
+    return None
+
+
+def explicar() -> list[str]:
+    """
+    Roda o EXPLAIN de cada consulta quente.
+
+    Returns:
+        list[str]: Uma entrada por consulta que varre uma tabela inteira (vazia se tudo usa índice).
+    """
+    problemas = []
+    with engine.connect() as conn:
+        dialeto = conn.dialect.name
+        if dialeto not in ("mysql", "sqlite"):
+            raise SystemExit(f"EXPLAIN não suportado para {dialeto}")
+        for nome, stmt in consultas_quentes().items():
+            for linha in _plano(conn, stmt):
+                varredura = _varredura(dialeto, linha)
+                if varredura:
+                    problemas.append(f"{nome}: {varredura}")
+    return problemas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Schema do banco da horta")
+    parser.add_argument("comando", choices=["criar", "migrar", "explicar"])
+    args = parser.parse_args()
+
+    if args.comando == "explicar":
+        problemas = explicar()
+        for p in problemas:
+            print("❌", p)
+        print(f"{len(problemas)} consulta(s) com varredura completa")
+        raise SystemExit(1 if problemas else 0)
+
+    aplicadas = criar() if args.comando == "criar" else migrar(engine)
+    for m in aplicadas:
+        print("✅ Migração aplicada:", m)
+    print("✅ Schema atualizado" if aplicadas or args.comando == "criar" else "Nenhuma migração pendente")
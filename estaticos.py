@@ -0,0 +1,202 @@
+"""
+Frontend servido pela própria API, em /app (mesma origem: sem preflight de CORS).
+
+O build copia frontend/Pages para frontend/dist com os .js e .css renomeados
+pelo hash do conteúdo (hortas.3f2a9c1b0e.js), reescreve as referências nos
+.html e grava ao lado de cada arquivo as versões .gz e .br já comprimidas.
+Na hora de servir, o Accept-Encoding escolhe a versão; os arquivos com hash
+vão com Cache-Control immutable por um ano e as páginas HTML com
+ESTATICOS_HTML_MAX_AGE segundos.
+
+    python estaticos.py construir
+
+Sem frontend/dist, /app serve frontend/Pages direto, sem compressão nem cache.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele o build grava só o .gz
+    brotli = None
+
+load_dotenv()
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+FONTE = os.path.join(RAIZ, "frontend", "Pages")
+DESTINO = os.path.join(RAIZ, "frontend", "dist")
+MANIFESTO = "manifest.json"
+
+# Cache das páginas HTML, que mudam sem trocar de nome
+ESTATICOS_HTML_MAX_AGE = int(os.getenv("ESTATICOS_HTML_MAX_AGE", "60"))
+
+COM_HASH = (".js", ".css")
+COMPRIMIR = (".js", ".css", ".html", ".svg", ".json", ".txt")
+# Arquivos menores que isso não compensam a versão comprimida
+MINIMO_COMPRESSAO = 256
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+_NOME_COM_HASH = re.compile(r"\.[0-9a-f]{10}\.(?:js|css)$")
+_REFERENCIA = re.compile(r"""(\b(?:src|href)\s*=\s*)(["'])([^"'#?]+)([^"']*)\2""")
+
+
+# -----------------------
+# BUILD
+# -----------------------
+def _com_hash(relativo: str, dados: bytes) -> str:
+    base, extensao = os.path.splitext(relativo)
+    return f"{base}.{hashlib.sha256(dados).hexdigest()[:10]}{extensao}"
+
+
+def _reescrever(html: str, pasta: str, manifesto: dict) -> str:
+    """Troca src/href que apontam para um .js/.css pelo nome com hash (caminhos relativos à página)."""
+    def trocar(m):
+        alvo = os.path.normpath(os.path.join(pasta, m.group(3))).replace(os.sep, "/")
+        if alvo not in manifesto:
+            return m.group(0)
+        novo = os.path.relpath(manifesto[alvo], pasta or ".").replace(os.sep, "/")
+        return f"{m.group(1)}{m.group(2)}{novo}{m.group(4)}{m.group(2)}"
+    return _REFERENCIA.sub(trocar, html)
+
+
+def _gravar(caminho: str, dados: bytes) -> list[str]:
+    """Grava o arquivo e, quando compensa, as versões .gz e .br; devolve os nomes gravados."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(dados)
+    gravados = [caminho]
+    if not caminho.endswith(COMPRIMIR) or len(dados) < MINIMO_COMPRESSAO:
+        return gravados
+    versoes = [(".gz", gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versoes.append((".br", brotli.compress(dados, quality=11)))
+    for extensao, comprimido in versoes:
+        if len(comprimido) < len(dados):
+            with open(caminho + extensao, "wb") as f:
+                f.write(comprimido)
+            gravados.append(caminho + extensao)
+    return gravados
+
+
+def construir(fonte: str = FONTE, destino: str = DESTINO) -> dict:
+    """
+    Gera o frontend/dist a partir do frontend/Pages (apagando o anterior).
+
+    Returns:
+        dict: Manifesto, nome original -> nome com hash.
+    """
+    arquivos = []
+    for pasta, _, nomes in os.walk(fonte):
+        for nome in nomes:
+            arquivos.append(os.path.relpath(os.path.join(pasta, nome), fonte).replace(os.sep, "/"))
+
+    manifesto, conteudo = {}, {}
+    for relativo in sorted(arquivos):
+        with open(os.path.join(fonte, relativo), "rb") as f:
+            conteudo[relativo] = f.read()
+        if relativo.endswith(COM_HASH):
+            manifesto[relativo] = _com_hash(relativo, conteudo[relativo])
+
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    for relativo, dados in conteudo.items():
+        if relativo.endswith(".html"):
+            dados = _reescrever(dados.decode("utf-8"), os.path.dirname(relativo), manifesto).encode("utf-8")
+        _gravar(os.path.join(temporario, manifesto.get(relativo, relativo)), dados)
+    with open(os.path.join(temporario, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    # troca o dist inteiro de uma vez: as páginas antigas não ficam apontando para nada
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+    return manifesto
+
+
+# -----------------------
+# SERVIR
+# -----------------------
+def _aceita(accept_encoding: str, codificacao: str) -> bool:
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.partition(";")
+        if nome.strip().lower() not in (codificacao, "*"):
+            continue
+        parametros = parametros.replace(" ", "")
+        if parametros.startswith("q="):
+            try:
+                return float(parametros[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class Estaticos(StaticFiles):
+    """StaticFiles que escolhe a versão .br/.gz pelo Accept-Encoding e define o Cache-Control."""
+
+    def __init__(self):
+        self.build = os.path.exists(os.path.join(DESTINO, MANIFESTO))
+        if not self.build:
+            print("⚠️ frontend/dist não encontrado: servindo frontend/Pages sem cache (python estaticos.py construir)")
+        super().__init__(directory=DESTINO if self.build else FONTE, html=True, check_dir=False)
+        # o dist não muda com a API no ar: as versões comprimidas são listadas uma vez
+        self._comprimidos = set()
+        if self.build:
+            for pasta, _, nomes in os.walk(DESTINO):
+                self._comprimidos.update(os.path.join(pasta, n) for n in nomes if n.endswith((".gz", ".br")))
+
+    def _cache(self, caminho: str) -> str:
+        if not self.build:
+            return "no-cache"
+        if _NOME_COM_HASH.search(caminho):
+            return CACHE_IMUTAVEL
+        if caminho.endswith(".html"):
+            return f"public, max-age={ESTATICOS_HTML_MAX_AGE}"
+        return "no-cache"
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        caminho = str(full_path)
+        cabecalhos = Headers(scope=scope)
+        aceitas = cabecalhos.get("accept-encoding", "")
+        tipo = mimetypes.guess_type(caminho)[0] or "application/octet-stream"
+        if tipo.startswith("text/") or tipo == "application/javascript":
+            tipo += "; charset=utf-8"
+
+        servido, codificacao = caminho, None
+        for nome, extensao in (("br", ".br"), ("gzip", ".gz")):
+            if caminho + extensao in self._comprimidos and _aceita(aceitas, nome):
+                servido, codificacao = caminho + extensao, nome
+                break
+        if servido != caminho:
+            stat_result = os.stat(servido)
+        resposta = FileResponse(servido, status_code=status_code, media_type=tipo, stat_result=stat_result)
+        if codificacao:
+            resposta.headers["Content-Encoding"] = codificacao
+        resposta.headers["Vary"] = "Accept-Encoding"
+        resposta.headers["Cache-Control"] = self._cache(caminho)
+        if self.is_not_modified(resposta.headers, cabecalhos):
+            return NotModifiedResponse(resposta.headers)
+        return resposta
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build do frontend servido em /app")
+    parser.add_argument("comando", choices=["construir"])
+    args = parser.parse_args()
+
+    manifesto = construir()
+    for original, novo in sorted(manifesto.items()):
+        print(f"{original} -> {novo}")
+    if brotli is None:
+        print("⚠️ Módulo brotli não instalado: só as versões .gz foram geradas")
+    print(f"✅ Frontend gerado em {DESTINO}")
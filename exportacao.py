@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import os
+import zlib
+
+from fastapi.responses import StreamingResponse
+
+from database_mysql import SessionLocal
+
+# Quantas linhas o cursor do servidor entrega por vez
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+
+TIPOS_CONTEUDO = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _partes(stmt, sessao):
+    """
+    Executa o SELECT com cursor do lado do servidor e entrega as linhas em
+    blocos de EXPORT_YIELD_PER. A sessão é própria do gerador, pois ele
+    continua rodando depois que o handler já retornou.
+    """
+    db = sessao()
+    try:
+        resultado = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_YIELD_PER))
+        for bloco in resultado.partitions():
+            yield bloco
+    finally:
+        db.close()
+
+
+def _csv(colunas: list[str], stmt, sessao):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(colunas)
+    for bloco in _partes(stmt, sessao):
+        writer.writerows(bloco)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson(colunas: list[str], stmt, sessao):
+    for bloco in _partes(stmt, sessao):
+        yield "".join(json.dumps(dict(zip(colunas, linha)), default=str) + "\n" for linha in bloco)
+
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(wbits=31)  # 31 = cabeçalho gzip
+    for bloco in blocos:
+        dados = compressor.compress(bloco.encode())
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def exportar(stmt, colunas: list[str], formato: str, nome: str, gzip: bool = False, sessao=SessionLocal) -> StreamingResponse:
+    """
+    Monta a StreamingResponse de exportação: as linhas são codificadas à
+    medida que chegam do banco, sem carregar a tabela inteira na memória.
+
+    Args:
+        stmt: SELECT das colunas exportadas, já com os filtros aplicados.
+        colunas (list[str]): Nomes das colunas, na ordem do SELECT.
+        formato (str): "csv" ou "ndjson".
+        nome (str): Nome base do arquivo baixado.
+        gzip (bool): Comprime a saída com gzip.
+        sessao: Fábrica da sessão usada pelo gerador (padrão: o primário).
+    """
+    gerador = _csv(colunas, stmt, sessao) if formato == "csv" else _ndjson(colunas, stmt, sessao)
+    arquivo = f"{nome}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{arquivo}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        gerador = _gzip(gerador)
+    return StreamingResponse(gerador, media_type=TIPOS_CONTEUDO[formato], headers=headers)
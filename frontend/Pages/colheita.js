@@ -2,7 +2,7 @@
 // colheitas.js (com GET único e DELETE robusto)
 // ======================
 
-const BASE = "http://127.0.0.1:8000";
+const BASE = ""; // mesma origem: a API serve as páginas em /app
 
 // ======================
 // Buscar 1 colheita
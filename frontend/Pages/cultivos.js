@@ -1,20 +1,99 @@
+const API_CULTIVOS = "/cultivos";
+
+// Cópia local dos cultivos: depois da primeira carga só as alterações
+// (/cultivos/changes) são baixadas
+const cultivos = new Map();
+let cursorCultivos = null;
+let streamCultivos = null;
+
+function chaveCultivo(c) {
+    return `${c.id_produto}|${c.id_parcela}|${c.data_plantio}`;
+}
+
+
 // ======================
 // Carregar cultivos
 // ======================
 async function carregarCultivos() {
     try {
-        const response = await fetch("http://127.0.0.1:8000/cultivos");
+        // o cursor vem antes da lista: o que mudar no meio chega como alteração
+        const inicio = await fetch(`${API_CULTIVOS}/changes`);
+        if (!inicio.ok) throw new Error("Erro ao buscar cultivos");
+        cursorCultivos = (await inicio.json()).cursor;
+
+        const response = await fetch(API_CULTIVOS);
         if (!response.ok) throw new Error("Erro ao buscar cultivos");
 
-        const cultivos = await response.json();
-        const container = document.getElementById("cultivos-list");
+        cultivos.clear();
+        for (const c of await response.json()) cultivos.set(chaveCultivo(c), c);
+        renderizarCultivos();
+        acompanharCultivos();
 
-        if (cultivos.length === 0) {
-            container.innerHTML = "<p>Nenhum cultivo registrado.</p>";
-            return;
-        }
+    } catch (error) {
+        alert(error.message);
+    }
+}
+
+
+// ======================
+// Aplicar alterações
+// ======================
+function aplicarAlteracoes(pagina) {
+    for (const a of pagina.alteracoes) {
+        if (a.operacao === "delete") cultivos.delete(chaveCultivo(a.chave));
+        else cultivos.set(chaveCultivo(a.dados), a.dados);
+    }
+    cursorCultivos = pagina.cursor;
+}
 
-        container.innerHTML = cultivos.map(c => `
+async function sincronizarCultivos() {
+    if (cursorCultivos === null) return carregarCultivos();
+    try {
+        let pagina;
+        do {
+            const response = await fetch(`${API_CULTIVOS}/changes?since=${cursorCultivos}`);
+            // 410: o cursor é mais velho que o registro de alterações
+            if (response.status === 410) return carregarCultivos();
+            if (!response.ok) throw new Error("Erro ao buscar cultivos");
+            pagina = await response.json();
+            aplicarAlteracoes(pagina);
+        } while (pagina.mais);
+        renderizarCultivos();
+    } catch (error) {
+        alert(error.message);
+    }
+}
+
+// Alterações de outros usuários chegam pelo stream (Server-Sent Events)
+function acompanharCultivos() {
+    if (streamCultivos) streamCultivos.close();
+    streamCultivos = new EventSource(`${API_CULTIVOS}/changes/stream?since=${cursorCultivos}`);
+    streamCultivos.addEventListener("alteracoes", e => {
+        const pagina = JSON.parse(e.data);
+        if (pagina.cursor <= cursorCultivos) return;
+        aplicarAlteracoes(pagina);
+        renderizarCultivos();
+    });
+    streamCultivos.addEventListener("resync", () => {
+        streamCultivos.close();
+        streamCultivos = null;
+        carregarCultivos();
+    });
+}
+
+
+// ======================
+// Renderizar cultivos
+// ======================
+function renderizarCultivos() {
+    const container = document.getElementById("cultivos-list");
+
+    if (cultivos.size === 0) {
+        container.innerHTML = "<p>Nenhum cultivo registrado.</p>";
+        return;
+    }
+
+    container.innerHTML = [...cultivos.values()].map(c => `
             <div class="card">
                 🌿 <strong>Produto:</strong> ${c.id_produto}<br>
                 🏷 <strong>Parcela:</strong> ${c.id_parcela}<br>
@@ -30,10 +109,6 @@ async function carregarCultivos() {
                 </button>
             </div>
         `).join("");
-
-    } catch (error) {
-        alert(error.message);
-    }
 }
 
 
@@ -42,7 +117,7 @@ async function carregarCultivos() {
 // ======================
 async function criarCultivo(dados) {
     try {
-        const response = await fetch("http://127.0.0.1:8000/cultivos", {
+        const response = await fetch(API_CULTIVOS, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify(dados)
@@ -54,7 +129,7 @@ async function criarCultivo(dados) {
         }
 
         alert("Cultivo criado com sucesso!");
-        carregarCultivos();
+        sincronizarCultivos();
         return true;
     } catch (error) {
         alert(error.message);
@@ -75,7 +150,7 @@ async function atualizarStatus(id_produto, id_parcela, data_plantio, statusAtual
     if (!novoStatus) return;
 
     try {
-        const response = await fetch(`http://127.0.0.1:8000/cultivos/${id_produto}/${id_parcela}/${data_plantio}`, {
+        const response = await fetch(`${API_CULTIVOS}/${id_produto}/${id_parcela}/${data_plantio}`, {
             method: "PUT",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ status_cultivo: novoStatus })
@@ -84,7 +159,7 @@ async function atualizarStatus(id_produto, id_parcela, data_plantio, statusAtual
         if (!response.ok) throw new Error("Erro ao atualizar cultivo");
 
         alert("Cultivo atualizado!");
-        carregarCultivos();
+        sincronizarCultivos();
     } catch (error) {
         alert(error.message);
     }
@@ -98,14 +173,14 @@ async function removerCultivo(id_produto, id_parcela, data_plantio) {
     if (!confirm("Tem certeza que deseja excluir este cultivo?")) return;
 
     try {
-        const response = await fetch(`http://127.0.0.1:8000/cultivos/${id_produto}/${id_parcela}/${data_plantio}`, {
+        const response = await fetch(`${API_CULTIVOS}/${id_produto}/${id_parcela}/${data_plantio}`, {
             method: "DELETE"
         });
 
         if (!response.ok) throw new Error("Erro ao excluir cultivo");
 
         alert("Cultivo removido!");
-        carregarCultivos();
+        sincronizarCultivos();
     } catch (error) {
         alert(error.message);
     }
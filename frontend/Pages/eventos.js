@@ -19,7 +19,7 @@ async function carregarEventos() {
     if (!token) return;
 
     try {
-        const response = await fetch("http://127.0.0.1:8000/eventos", {
+        const response = await fetch("/eventos", {
             headers: { "Authorization": `Bearer ${token}` }
         });
 
@@ -63,7 +63,7 @@ async function criarEvento(dados) {
     if (!token) return;
 
     try {
-        const response = await fetch("http://127.0.0.1:8000/eventos", {
+        const response = await fetch("/eventos", {
             method: "POST",
             headers: { 
                 "Content-Type": "application/json",
@@ -94,7 +94,7 @@ async function removerEvento(id) {
     if (!confirm("Tem certeza que deseja excluir este evento?")) return;
 
     try {
-        const response = await fetch(`http://127.0.0.1:8000/eventos/${id}`, {
+        const response = await fetch(`/eventos/${id}`, {
             method: "DELETE",
             headers: { "Authorization": `Bearer ${token}` }
         });
@@ -15,7 +15,7 @@ if (!token) {
 // ====================================
 async function carregarHortas() {
     try {
-        const response = await fetch("http://127.0.0.1:8000/hortas", {
+        const response = await fetch("/hortas", {
             headers: { "Authorization": `Bearer ${token}` }
         });
 
@@ -60,7 +60,7 @@ async function criarHorta(dados) {
     }
 
     try {
-        const response = await fetch("http://127.0.0.1:8000/hortas", {
+        const response = await fetch("/hortas", {
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
@@ -84,7 +84,7 @@ async function removerHorta(id) {
     if (!confirm("Tem certeza que deseja excluir esta horta?")) return;
 
     try {
-        await fetch(`http://127.0.0.1:8000/hortas/${id}`, {
+        await fetch(`/hortas/${id}`, {
             method: "DELETE",
             headers: { "Authorization": `Bearer ${token}` }
         });
@@ -108,7 +108,7 @@ async function editarHorta(id, nomeAtual, localAtual) {
     if (!novaLoc) return;
 
     try {
-        await fetch(`http://127.0.0.1:8000/hortas/${id}`, {
+        await fetch(`/hortas/${id}`, {
             method: "PUT",
             headers: {
                 "Content-Type": "application/json",
@@ -15,7 +15,7 @@ async function login() {
     formData.append("password", senha);
 
     try {
-        const response = await fetch("http://127.0.0.1:8000/login", {
+        const response = await fetch("/login", {
             method: "POST",
             body: formData  // ⚠ NÃO colocar headers!
         });
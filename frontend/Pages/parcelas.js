@@ -1,7 +1,7 @@
 // Função para buscar a lista de parcelas do backend
 async function carregarParcelas() {
     try {
-        const response = await fetch("http://127.0.0.1:8000/parcelas"); // URL do backend
+        const response = await fetch("/parcelas"); // URL do backend
         if (!response.ok) throw new Error("Erro ao buscar parcelas");
         const parcelas = await response.json();
 
@@ -26,7 +26,7 @@ async function carregarParcelas() {
 // Função para criar parcela
 async function criarParcela(dados) {
     try {
-        const response = await fetch("http://127.0.0.1:8000/parcelas", {
+        const response = await fetch("/parcelas", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify(dados)
@@ -44,7 +44,7 @@ async function criarParcela(dados) {
 async function removerParcela(id) {
     if (!confirm("Deseja realmente excluir esta parcela?")) return;
     try {
-        const response = await fetch(`http://127.0.0.1:8000/parcelas/${id}`, {
+        const response = await fetch(`/parcelas/${id}`, {
             method: "DELETE"
         });
         if (!response.ok) throw new Error("Erro ao excluir parcela");
@@ -69,7 +69,7 @@ async function editarParcela(id, localizacaoAtual, tamanhoAtual, statusAtual) {
     if (!novoStatus) return;
 
     try {
-        const response = await fetch(`http://127.0.0.1:8000/parcelas/${id}`, {
+        const response = await fetch(`/parcelas/${id}`, {
             method: "PUT",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({
@@ -1,4 +1,4 @@
-const API_BASE = "http://127.0.0.1:8000"; // seu backend local
+const API_BASE = ""; // mesma origem: a API serve as páginas em /app
 
 // Funções genéricas
 async function fetchList(endpoint) {
@@ -0,0 +1,208 @@
+"""
+Dados sintéticos para benchmark, gravados direto no banco de DATABASE_URL:
+
+    DATABASE_URL=sqlite:///bench.db python gerar_dados.py --escala 100k
+
+A escala é o número de colheitas; as outras tabelas crescem na mesma
+proporção. O mesmo --semente gera sempre os mesmos dados. Todos os
+usuários têm a senha 123456 (admin@horta.com no grupo 1,
+visitante@horta.com no grupo 2).
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+import busca
+import esquema
+import resumos
+from auth import pwd_context
+from database_mysql import Base, engine
+from models import (
+    Colheita, Cultivo, Evento, GruposUsuarios, Hortas, Parcela, ParticipacaoEvento, Produto, Usuarios
+)
+
+ESCALAS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Linhas por INSERT (executemany)
+LOTE = 5000
+
+INICIO = date(2023, 1, 1)
+DIAS = 730
+
+PRODUTOS = {
+    "Verdura": ["Alface", "Rúcula", "Couve", "Espinafre", "Agrião", "Acelga", "Almeirão", "Chicória"],
+    "Legume": ["Cenoura", "Beterraba", "Abobrinha", "Berinjela", "Chuchu", "Quiabo", "Vagem", "Pepino"],
+    "Fruta": ["Morango", "Tomate", "Maracujá", "Melancia", "Mamão", "Banana", "Limão", "Acerola"],
+    "Hortaliça": ["Cebolinha", "Salsa", "Coentro", "Manjericão", "Hortelã", "Alecrim", "Orégano", "Tomilho"],
+}
+EPOCAS = ["Primavera", "Verão", "Outono", "Inverno", "Ano todo"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João",
+         "Karina", "Lucas", "Mariana", "Nicolas", "Olívia", "Pedro", "Queila", "Rafael", "Sofia", "Thiago"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Costa", "Almeida", "Gomes", "Marchi", "Lima"]
+BAIRROS = ["Centro", "Vila Nova", "Jardim América", "Santa Cruz", "Boa Vista", "São José", "Bela Vista"]
+STATUS_CULTIVO = ["Plantado", "Crescendo", "ProntoParaColheita", "Colhido"]
+PAPEIS = ["Participante", "Participante", "Participante", "Organizador", "Palestrante"]
+
+
+def proporcoes(colheitas: int) -> dict:
+    """Quantidade de linhas por tabela para um número de colheitas."""
+    return {
+        "hortas": max(colheitas // 2000, 5),
+        "produtos": sum(len(v) for v in PRODUTOS.values()),
+        "parcelas": max(colheitas // 200, 20),
+        "cultivos": max(colheitas // 10, 50),
+        "colheitas": colheitas,
+        "usuarios": max(colheitas // 20, 20),
+        "eventos": max(colheitas // 1000, 10),
+        "participacoes": colheitas // 5,
+    }
+
+
+def _gravar(conn, modelo, linhas):
+    """INSERT em lotes de LOTE linhas; aceita um gerador."""
+    lote = []
+    total = 0
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= LOTE:
+            conn.execute(insert(modelo), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        conn.execute(insert(modelo), lote)
+        total += len(lote)
+    return total
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _amostra_pares(rng: random.Random, a: int, b: int, k: int):
+    """k pares distintos (i, j) com 0 <= i < a e 0 <= j < b."""
+    for n in rng.sample(range(a * b), min(k, a * b)):
+        yield divmod(n, b)
+
+
+def gerar(escala: int, semente: int = 42) -> dict:
+    """
+    Grava o conjunto completo num banco vazio (cria o schema se preciso).
+
+    Returns:
+        dict: Linhas gravadas por tabela.
+    """
+    rng = random.Random(semente)
+    qtd = proporcoes(escala)
+    esquema.criar()
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Colheita)).scalar():
+            raise SystemExit("O banco já tem dados; use --limpar para apagar antes de gerar")
+
+        gravados = {}
+        gravados["grupos"] = _gravar(conn, GruposUsuarios, [
+            {"id_grupo": 1, "nome_grupo": "Administrador", "descricao": "Acesso completo"},
+            {"id_grupo": 2, "nome_grupo": "Visitante", "descricao": "Somente leitura"},
+        ])
+
+        gravados["hortas"] = _gravar(conn, Hortas, (
+            {"id_horta": _uuid(rng), "nome": f"Horta {rng.choice(BAIRROS)} {i + 1}",
+             "localizacao": f"Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 2000)}",
+             "data_criacao": INICIO + timedelta(days=rng.randrange(DIAS))}
+            for i in range(qtd["hortas"])
+        ))
+
+        produtos = [(tipo, nome) for tipo, nomes in PRODUTOS.items() for nome in nomes]
+        gravados["produtos"] = _gravar(conn, Produto, (
+            {"id_produto": i + 1, "nome": nome, "tipo": tipo, "epoca_plantio": rng.choice(EPOCAS)}
+            for i, (tipo, nome) in enumerate(produtos)
+        ))
+
+        gravados["parcelas"] = _gravar(conn, Parcela, (
+            {"id_parcela": i + 1, "tamanho": round(rng.uniform(2, 50), 1),
+             "localizacao": f"{rng.choice(BAIRROS)} - canteiro {i + 1}",
+             "status": rng.choice(["Livre", "Cultivando", "Cultivando", "Em Repouso"])}
+            for i in range(qtd["parcelas"])
+        ))
+
+        # cultivos distintos por (produto, parcela, data de plantio)
+        cultivos = []
+        for n in rng.sample(range(len(produtos) * qtd["parcelas"] * DIAS), qtd["cultivos"]):
+            resto, dia = divmod(n, DIAS)
+            produto, parcela = divmod(resto, qtd["parcelas"])
+            cultivos.append((produto + 1, parcela + 1, INICIO + timedelta(days=dia)))
+        gravados["cultivos"] = _gravar(conn, Cultivo, (
+            {"id_produto": p, "id_parcela": pa, "data_plantio": d, "status_cultivo": rng.choice(STATUS_CULTIVO)}
+            for p, pa, d in cultivos
+        ))
+
+        # cada colheita sai de um cultivo, de 45 a 120 dias depois do plantio
+        def colheitas():
+            for i in range(qtd["colheitas"]):
+                p, pa, plantio = cultivos[rng.randrange(len(cultivos))]
+                yield {"id_colheita": i + 1, "id_produto": p, "id_parcela": pa,
+                       "data_colheita": plantio + timedelta(days=rng.randint(45, 120)),
+                       "quantidade_kg": round(rng.lognormvariate(1.5, 0.6), 2)}
+        gravados["colheitas"] = _gravar(conn, Colheita, colheitas())
+
+        # um hash só: bcrypt para cada usuário tornaria a carga inviável
+        senha = pwd_context.hash("123456")
+        usuarios = [_uuid(rng) for _ in range(qtd["usuarios"])]
+
+        def linhas_usuarios():
+            for i, id_usuario in enumerate(usuarios):
+                if i == 0:
+                    nome, email, grupo = "Administrador", "admin@horta.com", 1
+                elif i == 1:
+                    nome, email, grupo = "Visitante", "visitante@horta.com", 2
+                else:
+                    nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+                    email, grupo = f"usuario{i}@horta.com", 2 if rng.random() < 0.9 else 1
+                yield {"id_usuario": id_usuario, "id_grupo": grupo, "nome": nome, "email": email,
+                       "telefone": f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}", "senha": senha}
+        gravados["usuarios"] = _gravar(conn, Usuarios, linhas_usuarios())
+
+        gravados["eventos"] = _gravar(conn, Evento, (
+            {"id_evento": i + 1, "nome": f"{rng.choice(['Mutirão', 'Oficina', 'Feira', 'Palestra'])} {i + 1}",
+             "data_evento": INICIO + timedelta(days=rng.randrange(DIAS + 180)),
+             "descricao": "Evento gerado para benchmark", "local_evento": rng.choice(BAIRROS)}
+            for i in range(qtd["eventos"])
+        ))
+
+        gravados["participacoes"] = _gravar(conn, ParticipacaoEvento, (
+            {"id_usuario": usuarios[u], "id_evento": e + 1, "papel": rng.choice(PAPEIS)}
+            for u, e in _amostra_pares(rng, qtd["usuarios"], qtd["eventos"], qtd["participacoes"])
+        ))
+
+        resumos.reconstruir(Session(bind=conn))
+        busca.reconstruir(Session(bind=conn))
+    return gravados
+
+
+def limpar():
+    """Apaga as linhas de todas as tabelas (dependentes primeiro)."""
+    esquema.criar()
+    with engine.begin() as conn:
+        for tabela in reversed(Base.metadata.sorted_tables):
+            conn.execute(tabela.delete())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para benchmark")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="10k")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true", help="apaga os dados existentes antes")
+    args = parser.parse_args()
+
+    if args.limpar:
+        limpar()
+    inicio = time.perf_counter()
+    gravados = gerar(ESCALAS[args.escala], args.semente)
+    for tabela, total in gravados.items():
+        print(f"{tabela:>15}: {total}")
+    print(f"✅ Dados gerados em {time.perf_counter() - inicio:.1f} s")
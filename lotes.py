@@ -0,0 +1,82 @@
+from typing import Literal
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Itens aceitos por requisição nos endpoints /batch
+LOTE_MAXIMO = 1000
+
+# tudo_ou_nada: qualquer item inválido cancela o lote inteiro
+# melhor_esforco: grava os válidos e reporta os inválidos
+ModoLote = Literal["tudo_ou_nada", "melhor_esforco"]
+
+
+def validar_tamanho(itens: list):
+    if not itens:
+        raise HTTPException(400, "Lote vazio")
+    if len(itens) > LOTE_MAXIMO:
+        raise HTTPException(413, f"Lote maior que {LOTE_MAXIMO} itens")
+
+
+def existentes(db: Session, coluna, valores) -> set:
+    """Quais dos valores existem na coluna, com um único SELECT ... IN."""
+    valores = set(valores)
+    if not valores:
+        return set()
+    return {v for (v,) in db.query(coluna).filter(coluna.in_(valores))}
+
+
+def chaves_existentes(db: Session, colunas: list, chaves) -> set:
+    """Como existentes(), para chaves compostas: (a, b, c) IN ((...), (...))."""
+    chaves = set(chaves)
+    if not chaves:
+        return set()
+    return {tuple(r) for r in db.query(*colunas).filter(tuple_(*colunas).in_(chaves))}
+
+
+async def existentes_async(db: AsyncSession, coluna, valores) -> set:
+    return await db.run_sync(existentes, coluna, valores)
+
+
+async def chaves_existentes_async(db: AsyncSession, colunas: list, chaves) -> set:
+    return await db.run_sync(chaves_existentes, colunas, chaves)
+
+
+def responder(resultados: list[dict], modo: str, inseridos: int) -> JSONResponse:
+    """
+    201 quando tudo foi gravado; 400 quando o lote tudo_ou_nada foi
+    recusado; 207 quando o melhor_esforco gravou só parte dos itens.
+    """
+    if inseridos == len(resultados):
+        codigo = 201
+    elif modo == "tudo_ou_nada" or inseridos == 0:
+        codigo = 400
+    else:
+        codigo = 207
+    return JSONResponse(status_code=codigo, content={"inseridos": inseridos, "resultados": resultados})
+
+
+def resultados_iniciais(tamanho: int) -> list[dict]:
+    return [{"indice": i, "ok": True, "erro": None} for i in range(tamanho)]
+
+
+def marcar_erro(resultados: list[dict], indice: int, erro: str):
+    resultados[indice]["ok"] = False
+    resultados[indice]["erro"] = erro
+
+
+def cancelar(resultados: list[dict]):
+    """Marca os itens válidos de um lote que não foi gravado."""
+    for r in resultados:
+        if r["ok"]:
+            marcar_erro(resultados, r["indice"], "Não gravado: lote cancelado")
+
+
+def pode_gravar(resultados: list[dict], modo: str) -> bool:
+    """No modo tudo_ou_nada, um único erro impede a gravação."""
+    if modo == "tudo_ou_nada":
+        return all(r["ok"] for r in resultados)
+    return any(r["ok"] for r in resultados)
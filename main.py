@@ -1,14 +1,49 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from mongo_logs import log_action
+from mongo_logs import log_action, flush as flush_logs, metricas as metricas_logs
+import mongo_logs
 from sqlalchemy.orm import Session
-from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from typing import Literal, get_args
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
+import csv
+import io
+import json
+import time
 import uuid
 
-from database_mysql import engine, Base, get_db
-from models import Usuarios, Hortas, Produto, Parcela, Evento, GruposUsuarios
+from exportacao import exportar
+import resumos
+import lotes
+import escrita
+import versoes
+import alteracoes
+import admissao
+import disponibilidade
+import busca
+import produtividade
+import relatorios
+import diagnostico
+import estaticos
+import metricas
+from cache_usuarios import cache_usuarios, Principal
+from paginacao import LIMITE_MAXIMO, CABECALHO_CURSOR, campos_projecao, consulta, paginar, resposta_projetada, definir_cursor
+from paginacao import codificar_cursor, decodificar_valores
+from database_mysql import engine, async_engine, SessionLocal, get_db, get_async_db, get_read_db, get_async_read_db
+from database_mysql import (
+    replica_engine, async_replica_engine, sessao_leitura, registrar_escrita, estado_replica,
+    COOKIE_PRIMARIO, LEITURA_PRIMARIO_SEGUNDOS
+)
+from models import Usuarios, Hortas, Produto, Parcela, Evento, GruposUsuarios, JobRelatorio
 from models import ParticipacaoEvento as ParticipacaoEventoModel
 from models import Cultivo as CultivoModel, Colheita as ColheitaModel
 
@@ -19,15 +54,41 @@ from schemas import (
     ParcelaCreate, ParcelaOut, ParcelaUpdate,
     EventoCreate, EventoOut, EventoUpdate,
     GrupoCreate, GrupoOut,
-    ParticipacaoCreate, ParticipacaoOut,
+    ParticipacaoCreate, ParticipacaoOut, ParticipanteOut, EventoInscritoOut,
     CultivoCreate, CultivoUpdate, CultivoOut,
-    ColheitaCreate, ColheitaOut
+    ColheitaCreate, ColheitaOut,
+    ResumoColheitaOut, JobRelatorioCreate, JobRelatorioOut, ResultadoBuscaOut,
+    RendimentoParcelaOut, SazonalidadeOut, SerieMensalOut
 )
-from auth import verificar_senha, criar_token, gerar_hash, SECRET_KEY, ALGORITHM
+from auth import verificar_e_atualizar, criar_token, gerar_hash, hash_em_lote, encerrar_pool, SenhasOcupadasError, SECRET_KEY, ALGORITHM, GRUPO_ADMIN
 
 from jose import jwt, JWTError
-
-app = FastAPI(title="Horta Comunitária API")
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    # nada aqui espera por rede: o MongoDB conecta no escritor de logs e os
+    # pools do MySQL abrem conexões sob demanda. As tabelas são criadas
+    # pelo comando `python esquema.py criar`, não na subida da API.
+    mongo_logs.iniciar()
+    admissao.dimensionar_threadpool()
+    relatorios.despachante.iniciar()
+    yield
+    # jobs em andamento voltam para a fila (outro worker ou a próxima subida os pega)
+    relatorios.despachante.encerrar()
+    # grava o que ainda estiver na fila de auditoria antes de sair
+    flush_logs()
+    encerrar_pool()
+    engine.dispose()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+        await async_replica_engine.dispose()
+
+
+app = FastAPI(title="Horta Comunitária API", lifespan=ciclo_de_vida)
 
 origins = [
     "http://localhost",
@@ -36,19 +97,144 @@ origins = [
     "*",  # desenvolvimento
 ]
 
+# por dentro do CORS: as recusas (503/429) também levam os cabeçalhos CORS
+app.add_middleware(admissao.ControleAdmissao)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],  # permite POST, GET, DELETE, OPTIONS...
     allow_headers=["*"],  # permite cabeçalhos customizados
+    expose_headers=[CABECALHO_CURSOR],  # cursor da próxima página nas listagens
 )
 
-# criar tabelas (mantém sua linha)
-Base.metadata.create_all(bind=engine)
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# Linhas por INSERT/consulta nas importações em lote
+IMPORT_BATCH = 500
+
+
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    acumulador = metricas.iniciar_requisicao()
+    inicio = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # rota declarada (ex: /colheitas/{id}) para não explodir a cardinalidade
+        rota = request.scope.get("route")
+        caminho = rota.path if rota else "nao_mapeada"
+        metricas.registrar_requisicao(request.method, caminho, status_code, time.perf_counter() - inicio, acumulador)
+
+
+@app.middleware("http")
+async def ler_proprias_escritas(request: Request, call_next):
+    """
+    Depois de uma escrita bem-sucedida, as leituras do mesmo cliente vão
+    para o primário por LEITURA_PRIMARIO_SEGUNDOS, para ele não ler da
+    réplica um dado mais velho do que o que acabou de gravar.
+    """
+    response = await call_next(request)
+    if replica_engine is not None and request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        registrar_escrita(request)
+        response.set_cookie(
+            COOKIE_PRIMARIO, f"{time.time() + LEITURA_PRIMARIO_SEGUNDOS:.3f}",
+            max_age=max(int(LEITURA_PRIMARIO_SEGUNDOS), 1), httponly=True, samesite="lax"
+        )
+    return response
+
+
+@app.middleware("http")
+async def identificar_usuario(request: Request, call_next):
+    """Email do token, quando houver, para o campo user dos logs de auditoria."""
+    autorizacao = request.headers.get("authorization", "")
+    if autorizacao.lower().startswith("bearer "):
+        mongo_logs.usuario_atual.set(decode_token_email(autorizacao[7:]))
+    return await call_next(request)
+
+
+@app.get("/metrics", include_in_schema=False)
+def exportar_metricas():
+    logs = metricas_logs()
+    cache = cache_usuarios.metricas()
+    compartimentos = admissao.estado()
+    extras = (
+        metricas.simples("horta_audit_queue_depth", "gauge", "Entradas de auditoria na fila", logs["profundidade_fila"])
+        + metricas.simples("horta_audit_dropped_total", "counter", "Entradas de auditoria descartadas", logs["descartados"])
+        + metricas.simples("horta_audit_spooled_total", "counter", "Entradas gravadas no spool local", logs["em_spool"])
+        + metricas.simples("horta_audit_flush_failures_total", "counter", "Flushes que falharam no MongoDB", logs["falhas_flush"])
+        + metricas.simples("horta_audit_flushes_total", "counter", "Flushes para o MongoDB", logs["flushes"])
+        + metricas.simples("horta_audit_flush_seconds_total", "counter", "Tempo total de flush", logs["flush_total_ms"] / 1000)
+        + metricas.simples("horta_audit_log_action_calls_total", "counter", "Chamadas de log_action", logs["log_action_chamadas"])
+        + metricas.simples("horta_audit_log_action_seconds_total", "counter", "Tempo total dentro de log_action", logs["log_action_total_ms"] / 1000)
+        + metricas.simples("horta_auth_cache_hits_total", "counter", "Usuários resolvidos pelo cache", cache["hits"])
+        + metricas.simples("horta_auth_cache_misses_total", "counter", "Usuários buscados no banco", cache["misses"])
+        + metricas.simples("horta_auth_cache_size", "gauge", "Usuários no cache", cache["tamanho"])
+        + metricas.gauge("horta_admission_in_flight", "Requisições em andamento por classe",
+                         [({"classe": c}, e["em_uso"]) for c, e in compartimentos.items()])
+        + metricas.gauge("horta_admission_queued", "Requisições na fila por classe",
+                         [({"classe": c}, e["aguardando"]) for c, e in compartimentos.items()])
+        + metricas.simples("horta_report_jobs_running", "gauge", "Relatórios sendo gerados neste worker",
+                           relatorios.despachante.estado()["em_execucao"])
+    )
+    return PlainTextResponse(metricas.exportar(extras), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/", include_in_schema=False)
+def pagina_inicial():
+    return RedirectResponse("/app/")
+
+
+@app.get("/health/live", include_in_schema=False)
+def saude_viva():
+    """O processo está de pé e respondendo (não consulta nada)."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def saude_pronta():
+    """
+    Pronto para receber tráfego: 503 se o MySQL não responde. O MongoDB e a
+    réplica só são reportados, pois sem eles a auditoria vai para o spool
+    local e as leituras para o primário.
+    """
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        mysql = {"conectado": True, "erro": None}
+    except Exception as e:
+        mysql = {"conectado": False, "erro": str(e)}
+    mongo = mongo_logs.verificar()
+    # sem a réplica as leituras vão para o primário: só degrada
+    replica = estado_replica()
+    if replica["configurada"]:
+        try:
+            with replica_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            replica["saudavel"], replica["erro"] = True, None
+        except Exception as e:
+            replica["saudavel"], replica["erro"] = False, str(e)
+    if not mysql["conectado"]:
+        situacao = "indisponivel"
+    elif not mongo["conectado"] or (replica["configurada"] and not replica["saudavel"]):
+        situacao = "degradado"
+    else:
+        situacao = "ok"
+    corpo = {"status": situacao, "mysql": mysql, "replica": replica, "mongodb": mongo}
+    return JSONResponse(status_code=503 if situacao == "indisponivel" else 200, content=corpo)
+
+
+@app.exception_handler(SenhasOcupadasError)
+def senhas_ocupadas(request: Request, exc: SenhasOcupadasError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, tente novamente em instantes"},
+        headers={"Retry-After": "2"},
+    )
+
 
 
 # -----------------------
@@ -57,138 +243,372 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 @app.post("/login")
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     usuario = db.query(Usuarios).filter(Usuarios.email == form_data.username).first()
-    if not usuario or not verificar_senha(form_data.password, usuario.senha):
+    if not usuario:
+        raise HTTPException(400, "Usuário ou senha incorretos")
+    ok, novo_hash = verificar_e_atualizar(form_data.password, usuario.senha)
+    if not ok:
         raise HTTPException(400, "Usuário ou senha incorretos")
-    token = criar_token({"sub": usuario.email})
-    log_action("auth", "login", {"email": usuario.email})
+    if novo_hash:
+        # hash gerado com parâmetros antigos: regrava com os atuais
+        usuario.senha = novo_hash
+        db.commit()
+    token = criar_token({"sub": usuario.email}, id_grupo=usuario.id_grupo)
+    log_action("auth", "login", {"email": usuario.email}, user=usuario.email)
     return {"access_token": token, "token_type": "bearer"}
 
 
-def decode_token_email(token: str) -> str | None:
+def decode_token(token: str) -> dict | None:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
+def decode_token_email(token: str) -> str | None:
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
+
 def obter_usuario_logado(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-):
+) -> Principal:
     """
-    Decodifica token, busca usuário no DB e retorna o objeto Usuarios.
+    Decodifica token e retorna o Principal do usuário, vindo do cache ou do DB.
     Levanta HTTPException (401/404) quando apropriado.
     """
-    email = decode_token_email(token)
+    payload = decode_token(token)
+    email = payload.get("sub") if payload else None
     if not email:
         raise HTTPException(status_code=401, detail="Token inválido ou expirado")
 
-    usuario = db.query(Usuarios).filter_by(email=email).first()
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    # escritas de outros workers: lidas no máximo a cada AUTH_CACHE_REVALIDAR segundos, fora disso nenhum SQL
+    cache_usuarios.revalidar(db)
+    principal = cache_usuarios.obter(email)
+    if principal is None:
+        geracao = cache_usuarios.geracao()
+        usuario = db.query(Usuarios).filter_by(email=email).first()
+        if not usuario:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        principal = Principal.de_usuario(usuario)
+        cache_usuarios.guardar(principal, geracao)
 
-    return usuario
+    # token emitido antes de uma troca de grupo não vale mais
+    if "grp" in payload and payload["grp"] != principal.id_grupo:
+        raise HTTPException(status_code=401, detail="Token desatualizado, faça login novamente")
+
+    return principal
 
 def exigir_grupo(*grupos_permitidos: int):
-    def dependency(usuario: Usuarios = Depends(obter_usuario_logado)):
+    def dependency(usuario: Principal = Depends(obter_usuario_logado)):
         if usuario.id_grupo not in grupos_permitidos:
             raise HTTPException(status_code=403, detail="Sem permissão")
         return usuario
     return dependency
 
+def eh_admin(autorizacao: str) -> bool:
+    """Se o cabeçalho Authorization é de um usuário do GRUPO_ADMIN (para o X-Perfil)."""
+    if not autorizacao.lower().startswith("bearer "):
+        return False
+    db = SessionLocal()
+    try:
+        return obter_usuario_logado(autorizacao[7:], db).id_grupo == GRUPO_ADMIN
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+# o mais externo: o perfil cobre também os outros middlewares
+app.add_middleware(diagnostico.Perfilador, autorizar=eh_admin)
+
+
+
+# -----------------------
+# ALTERAÇÕES (sincronização incremental)
+# -----------------------
+# declaradas antes das rotas /{recurso}/{id} para não serem capturadas por elas
+def recurso_sincronizavel(recurso: str) -> str:
+    if recurso not in alteracoes.RECURSOS:
+        raise HTTPException(404, "Recurso não encontrado")
+    return recurso
+
+
+@app.get("/{recurso}/changes")
+def listar_alteracoes(
+    recurso: str = Depends(recurso_sincronizavel),
+    since: int | None = None,
+    limit: int = Query(alteracoes.LIMITE, ge=1, le=alteracoes.LIMITE),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Sem since, só o cursor para começar (pegue antes de carregar a lista
+    completa). Com since, o que mudou depois dele; 410 quando o cursor é
+    anterior à compactação e o cliente precisa recarregar tudo.
+    """
+    if since is None:
+        return {"cursor": alteracoes.cursor_atual(db, recurso), "mais": False, "alteracoes": []}
+    try:
+        return alteracoes.ler(db, recurso, since, limit)
+    except alteracoes.ResyncNecessario:
+        raise alteracoes.erro_resync()
+
+
+@app.get("/{recurso}/changes/stream")
+async def transmitir_alteracoes(
+    request: Request,
+    recurso: str = Depends(recurso_sincronizavel),
+    since: int | None = None,
+    last_event_id: int | None = Header(None)
+):
+    """Server-Sent Events com as alterações do recurso (ver alteracoes.transmitir)."""
+    # o EventSource manda Last-Event-ID ao reconectar
+    desde = last_event_id if last_event_id is not None else since
+    if desde is None:
+        def inicial():
+            db = sessao_leitura(request)
+            try:
+                return alteracoes.cursor_atual(db, recurso)
+            finally:
+                db.close()
+        desde = await run_in_threadpool(inicial)
+    return StreamingResponse(
+        alteracoes.transmitir(request, recurso, desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 
 # -----------------------
 # USUÁRIOS CRUD
 # -----------------------
 @app.post("/usuarios", response_model=UsuarioOut, status_code=201)
-def criar_usuario(dados: UsuarioCreate, db: Session = Depends(get_db)):
-    if db.query(Usuarios).filter(Usuarios.email == dados.email).first():
-        raise HTTPException(400, "Email já cadastrado")
+async def criar_usuario(dados: UsuarioCreate, db: AsyncSession = Depends(get_async_db)):
+    # email único e grupo existente são garantidos pelas constraints do banco
+    # o bcrypt roda no pool de processos; só a espera pelo resultado vai para uma thread
+    senha = await run_in_threadpool(gerar_hash, dados.senha)
     novo = Usuarios(
         id_usuario=str(uuid.uuid4()),
         nome=dados.nome,
         email=dados.email,
         telefone=dados.telefone,
-        senha=gerar_hash(dados.senha),
+        senha=senha,
         id_grupo=dados.id_grupo
     )
     db.add(novo)
-    db.commit()
-    db.refresh(novo)
+    try:
+        await versoes.incrementar_async(db, "usuarios")
+        await alteracoes.registrar_objetos_async(db, "usuarios", novo)
+        await busca.indexar_objetos_async(db, "usuarios", novo)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, "Email já cadastrado", "Grupo não encontrado")
     log_action("usuarios", "create", {"id_usuario": novo.id_usuario, "nome": novo.nome})
     return novo
 
+@app.post("/usuarios/import")
+async def importar_usuarios(request: Request, db: Session = Depends(get_db)):
+    """
+    Cadastro em lote a partir de JSON (lista de usuários) ou CSV com
+    cabeçalho nome,email,telefone,id_grupo,senha. Os hashes são calculados
+    em paralelo no pool de processos e os INSERTs vão em lotes.
+    """
+    corpo = (await request.body()).decode("utf-8-sig")
+    if "csv" in request.headers.get("content-type", ""):
+        registros = list(csv.DictReader(io.StringIO(corpo)))
+    else:
+        try:
+            registros = json.loads(corpo)
+        except json.JSONDecodeError:
+            raise HTTPException(400, "JSON inválido")
+        if not isinstance(registros, list):
+            raise HTTPException(400, "Esperada uma lista de usuários")
+    return await run_in_threadpool(_importar_usuarios, registros, db)
+
+
+def _importar_usuarios(registros: list, db: Session):
+    erros = []
+    validos = []
+    vistos = set()
+    for linha, registro in enumerate(registros, start=1):
+        try:
+            if isinstance(registro, dict) and not registro.get("telefone"):
+                registro["telefone"] = None
+            dados = UsuarioCreate.model_validate(registro)
+        except ValidationError as e:
+            erros.append({"linha": linha, "erro": e.errors(include_url=False, include_context=False)})
+            continue
+        if dados.email in vistos:
+            erros.append({"linha": linha, "erro": "Email repetido no arquivo"})
+            continue
+        vistos.add(dados.email)
+        validos.append((linha, dados))
+
+    # uma consulta só para todos os emails já cadastrados
+    existentes = set()
+    emails = [d.email for _, d in validos]
+    for i in range(0, len(emails), IMPORT_BATCH):
+        existentes.update(
+            e for (e,) in db.query(Usuarios.email).filter(Usuarios.email.in_(emails[i:i + IMPORT_BATCH]))
+        )
+    novos = []
+    for linha, dados in validos:
+        if dados.email in existentes:
+            erros.append({"linha": linha, "erro": "Email já cadastrado"})
+        else:
+            novos.append(dados)
+
+    hashes = hash_em_lote([d.senha for d in novos])
+    linhas = [
+        {
+            "id_usuario": str(uuid.uuid4()),
+            "nome": d.nome,
+            "email": d.email,
+            "telefone": d.telefone,
+            "senha": h,
+            "id_grupo": d.id_grupo,
+        }
+        for d, h in zip(novos, hashes)
+    ]
+    for i in range(0, len(linhas), IMPORT_BATCH):
+        db.execute(insert(Usuarios), linhas[i:i + IMPORT_BATCH])
+        versoes.incrementar(db, "usuarios")
+        alteracoes.registrar(db, "usuarios", [(l["id_usuario"],) for l in linhas[i:i + IMPORT_BATCH]])
+        busca.indexar(db, "usuarios", [l["id_usuario"] for l in linhas[i:i + IMPORT_BATCH]])
+        db.commit()
+
+    erros.sort(key=lambda e: e["linha"])
+    log_action("usuarios", "import", {"inseridos": len(linhas), "erros": len(erros)})
+    return {"inseridos": len(linhas), "erros": erros}
+
 @app.put("/usuarios/{id}", response_model=UsuarioOut)
-def atualizar_usuario(id: str, dados: UsuarioUpdate, db: Session = Depends(get_db)):
-    u = db.query(Usuarios).filter_by(id_usuario=id).first()
-    if not u:
-        raise HTTPException(404, "Usuário não encontrado")
+async def atualizar_usuario(id: str, dados: UsuarioUpdate, db: AsyncSession = Depends(get_async_db)):
     update_data = dados.dict(exclude_unset=True)
     if "senha" in update_data:
-        update_data["senha"] = gerar_hash(update_data["senha"])
-    for campo, valor in update_data.items():
-        setattr(u, campo, valor)
-    db.commit()
-    db.refresh(u)
+        update_data["senha"] = await run_in_threadpool(gerar_hash, update_data["senha"])
+    try:
+        u = await escrita.atualizar_async(db, Usuarios, {"id_usuario": id}, update_data)
+        if u:
+            await versoes.incrementar_async(db, "usuarios")
+            await alteracoes.registrar_async(db, "usuarios", [(u.id_usuario,)])
+            await busca.indexar_async(db, "usuarios", [u.id_usuario])
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, "Email já cadastrado", "Grupo não encontrado")
+    if not u:
+        raise HTTPException(404, "Usuário não encontrado")
+    cache_usuarios.invalidar_usuario(u.id_usuario)
     log_action("usuarios", "update", {"id_usuario": u.id_usuario, "atualizado": update_data})
     return u
 
 @app.delete("/usuarios/{id}", status_code=204)
-def apagar_usuario(id: str, db: Session = Depends(get_db)):
-    u = db.query(Usuarios).filter_by(id_usuario=id).first()
-    if not u:
+async def apagar_usuario(id: str, db: AsyncSession = Depends(get_async_db)):
+    try:
+        apagado = await escrita.remover_async(db, Usuarios, {"id_usuario": id})
+        if apagado:
+            await versoes.incrementar_async(db, "usuarios")
+            await alteracoes.registrar_async(db, "usuarios", [(id,)], "delete")
+            await busca.remover_async(db, "usuarios", [id])
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Usuário possui participações em eventos", status_referencia=400)
+    if not apagado:
         raise HTTPException(404, "Usuário não encontrado")
-    db.delete(u)
-    db.commit()
+    cache_usuarios.invalidar_usuario(id)
     log_action("usuarios", "delete", {"id_usuario": id})
     return
 
 @app.get("/usuarios/me", response_model=UsuarioOut)
-def perfil(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    email = decode_token_email(token)
-    if not email:
-        raise HTTPException(401, "Token inválido")
-    u = db.query(Usuarios).filter_by(email=email).first()
-    if not u:
-        raise HTTPException(404, "Usuário não encontrado")
-    return u
+def perfil(usuario: Principal = Depends(obter_usuario_logado)):
+    return usuario
 
-@app.get("/usuarios", response_model=list[UsuarioOut])
-def listar_usuarios(db: Session = Depends(get_db)):
-    return db.query(Usuarios).all()
+@app.get("/usuarios", response_model=list[UsuarioOut], dependencies=[versoes.condicional("usuarios", assincrono=True)])
+async def listar_usuarios(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [Usuarios.id_usuario]
+    campos = campos_projecao(fields, UsuarioOut.model_fields)
+    rows, proximo = await db.run_sync(
+        lambda s: paginar(consulta(s, Usuarios, campos, chave), chave, limit, cursor)
+    )
+    if campos:
+        return resposta_projetada(rows, campos, proximo, response)
+    definir_cursor(response, proximo)
+    return rows
+
+@app.get(
+    "/usuarios/{id}/eventos",
+    response_model=list[EventoInscritoOut],
+    dependencies=[versoes.condicional("usuarios", "ParticipacaoEvento", "evento", assincrono=True)]
+)
+async def eventos_do_usuario(
+    id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    P = ParticipacaoEventoModel
+    chave = [P.id_evento]
+
+    def buscar(s: Session):
+        # a PK (id_usuario, id_evento) já entrega as participações do usuário em ordem
+        q = s.query(
+            P.id_evento, Evento.nome, Evento.data_evento, Evento.descricao, Evento.local_evento, P.papel
+        ).join(Evento, Evento.id_evento == P.id_evento).filter(P.id_usuario == id)
+        linhas, proximo = paginar(q, chave, limit, cursor)
+        if not linhas and not cursor and s.get(Usuarios, id) is None:
+            raise HTTPException(404, "Usuário não encontrado")
+        return linhas, proximo
+
+    rows, proximo = await db.run_sync(buscar)
+    definir_cursor(response, proximo)
+    return rows
 
 # -----------------------
 # GRUPOS CRUD
 # -----------------------
 @app.post("/grupos", response_model=GrupoOut, status_code=201)
-def criar_grupo(dados: GrupoCreate, db: Session = Depends(get_db)):
+async def criar_grupo(dados: GrupoCreate, db: AsyncSession = Depends(get_async_db)):
     novo = GruposUsuarios(nome_grupo=dados.nome_grupo, descricao=dados.descricao)
     db.add(novo)
-    db.commit()
-    db.refresh(novo)
+    await versoes.incrementar_async(db, "grupos_usuarios")
+    await alteracoes.registrar_objetos_async(db, "grupos", novo)
+    await db.commit()
     log_action("grupos", "create", {"id_grupo": novo.id_grupo, "nome_grupo": novo.nome_grupo})
     return novo
 
 @app.put("/grupos/{id}", response_model=GrupoOut)
-def atualizar_grupo(id: int, dados: GrupoCreate, db: Session = Depends(get_db)):
-    g = db.query(GruposUsuarios).filter_by(id_grupo=id).first()
+async def atualizar_grupo(id: int, dados: GrupoCreate, db: AsyncSession = Depends(get_async_db)):
+    g = await escrita.atualizar_async(
+        db, GruposUsuarios, {"id_grupo": id}, {"nome_grupo": dados.nome_grupo, "descricao": dados.descricao}
+    )
     if not g:
         raise HTTPException(404, "Grupo não encontrado")
-    g.nome_grupo = dados.nome_grupo
-    g.descricao = dados.descricao
-    db.commit()
-    db.refresh(g)
+    await versoes.incrementar_async(db, "grupos_usuarios")
+    await alteracoes.registrar_async(db, "grupos", [(id,)])
+    await db.commit()
     log_action("grupos", "update", {"id_grupo": g.id_grupo, "nome_grupo": g.nome_grupo})
     return g
 
 @app.delete("/grupos/{id}", status_code=204)
-def apagar_grupo(id: int, db: Session = Depends(get_db)):
-    g = db.query(GruposUsuarios).filter_by(id_grupo=id).first()
-    if not g:
+async def apagar_grupo(id: int, db: AsyncSession = Depends(get_async_db)):
+    # mesmo efeito do delete pelo ORM: os usuários do grupo ficam sem grupo
+    afetados = (await db.execute(select(Usuarios.id_usuario).where(Usuarios.id_grupo == id))).all()
+    await db.execute(update(Usuarios).where(Usuarios.id_grupo == id).values(id_grupo=None))
+    if not await escrita.remover_async(db, GruposUsuarios, {"id_grupo": id}):
+        await db.rollback()
         raise HTTPException(404, "Grupo não encontrado")
-    db.delete(g)
-    db.commit()
+    await versoes.incrementar_async(db, "grupos_usuarios", "usuarios")
+    await alteracoes.registrar_async(db, "grupos", [(id,)], "delete")
+    await alteracoes.registrar_async(db, "usuarios", afetados)
+    await db.commit()
+    cache_usuarios.invalidar_grupo(id)
     log_action("grupos", "delete", {"id_grupo": id})
     return
 
@@ -196,39 +616,55 @@ def apagar_grupo(id: int, db: Session = Depends(get_db)):
 # HORTAS CRUD
 # -----------------------
 @app.post("/hortas", response_model=HortaOut, status_code=201)
-def criar_horta(horta: HortaCreate, db: Session = Depends(get_db)):
+async def criar_horta(horta: HortaCreate, db: AsyncSession = Depends(get_async_db)):
     nova_horta = Hortas(id_horta=str(uuid.uuid4()), nome=horta.nome, localizacao=horta.localizacao, data_criacao=date.today())
     db.add(nova_horta)
-    db.commit()
-    db.refresh(nova_horta)
+    await versoes.incrementar_async(db, "hortas")
+    await alteracoes.registrar_objetos_async(db, "hortas", nova_horta)
+    await busca.indexar_objetos_async(db, "hortas", nova_horta)
+    await db.commit()
     log_action("hortas", "create", {"id_horta": nova_horta.id_horta, "nome": nova_horta.nome})
     return nova_horta
 
 @app.put("/hortas/{id_horta}", response_model=HortaOut)
-def atualizar_horta(id_horta: str, dados: HortaUpdate, db: Session = Depends(get_db)):
-    h = db.query(Hortas).filter_by(id_horta=id_horta).first()
+async def atualizar_horta(id_horta: str, dados: HortaUpdate, db: AsyncSession = Depends(get_async_db)):
+    h = await escrita.atualizar_async(db, Hortas, {"id_horta": id_horta}, dados.dict(exclude_unset=True))
     if not h:
         raise HTTPException(404, "Horta não encontrada")
-    for k, v in dados.dict(exclude_unset=True).items():
-        setattr(h, k, v)
-    db.commit()
-    db.refresh(h)
+    await versoes.incrementar_async(db, "hortas")
+    await alteracoes.registrar_async(db, "hortas", [(id_horta,)])
+    await busca.indexar_async(db, "hortas", [id_horta])
+    await db.commit()
     log_action("hortas", "update", {"id_horta": h.id_horta})
     return h
 
 @app.delete("/hortas/{id_horta}", status_code=204)
-def remover_horta(id_horta: str, db: Session = Depends(get_db)):
-    h = db.query(Hortas).filter_by(id_horta=id_horta).first()
-    if not h:
+async def remover_horta(id_horta: str, db: AsyncSession = Depends(get_async_db)):
+    if not await escrita.remover_async(db, Hortas, {"id_horta": id_horta}):
         raise HTTPException(404, "Horta não encontrada")
-    db.delete(h)
-    db.commit()
+    await versoes.incrementar_async(db, "hortas")
+    await alteracoes.registrar_async(db, "hortas", [(id_horta,)], "delete")
+    await busca.remover_async(db, "hortas", [id_horta])
+    await db.commit()
     log_action("hortas", "delete", {"id_horta": id_horta})
     return
 
-@app.get("/hortas")
-def listar_hortas(db: Session = Depends(get_db)):
-    hortas = db.query(Hortas).all()
+@app.get("/hortas", dependencies=[versoes.condicional("hortas", assincrono=True)])
+async def listar_hortas(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [Hortas.id_horta]
+    campos = campos_projecao(fields, HortaOut.model_fields)
+    hortas, proximo = await db.run_sync(
+        lambda s: paginar(consulta(s, Hortas, campos, chave), chave, limit, cursor)
+    )
+    if campos:
+        return resposta_projetada(hortas, campos, proximo, response)
+    definir_cursor(response, proximo)
     return hortas
 
 
@@ -236,142 +672,360 @@ def listar_hortas(db: Session = Depends(get_db)):
 # PRODUTOS CRUD
 # -----------------------
 @app.post("/produtos", response_model=ProdutoOut, status_code=201)
-def criar_produto(produto: ProdutoCreate, db: Session = Depends(get_db)):
+async def criar_produto(produto: ProdutoCreate, db: AsyncSession = Depends(get_async_db)):
     novo = Produto(**produto.dict())
     db.add(novo)
-    db.commit()
-    db.refresh(novo)
+    await versoes.incrementar_async(db, "produto")
+    await alteracoes.registrar_objetos_async(db, "produtos", novo)
+    await busca.indexar_objetos_async(db, "produtos", novo)
+    await db.commit()
     log_action("produtos", "create", {"id_produto": novo.id_produto, "nome": novo.nome})
     return novo
 
 @app.put("/produtos/{id}", response_model=ProdutoOut)
-def atualizar_produto(id: int, dados: ProdutoCreate, db: Session = Depends(get_db)):
-    p = db.query(Produto).filter_by(id_produto=id).first()
+async def atualizar_produto(id: int, dados: ProdutoCreate, db: AsyncSession = Depends(get_async_db)):
+    p = await escrita.atualizar_async(db, Produto, {"id_produto": id}, dados.dict(exclude_unset=True))
     if not p:
         raise HTTPException(404, "Produto não encontrado")
-    for k, v in dados.dict(exclude_unset=True).items():
-        setattr(p, k, v)
-    db.commit()
-    db.refresh(p)
+    await versoes.incrementar_async(db, "produto")
+    await alteracoes.registrar_async(db, "produtos", [(id,)])
+    await busca.indexar_async(db, "produtos", [id])
+    await db.commit()
     log_action("produtos", "update", {"id_produto": id})
     return p
 
 @app.delete("/produtos/{id}", status_code=204)
-def remover_produto(id: int, db: Session = Depends(get_db)):
-    p = db.query(Produto).filter_by(id_produto=id).first()
-    if not p:
+async def remover_produto(id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        apagado = await escrita.remover_async(db, Produto, {"id_produto": id})
+        if apagado:
+            await versoes.incrementar_async(db, "produto")
+            await alteracoes.registrar_async(db, "produtos", [(id,)], "delete")
+            await busca.remover_async(db, "produtos", [id])
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Produto possui cultivos ou colheitas", status_referencia=400)
+    if not apagado:
         raise HTTPException(404, "Produto não encontrado")
-    db.delete(p)
-    db.commit()
     log_action("produtos", "delete", {"id_produto": id})
     return
 
-@app.get("/produtos", response_model=list[ProdutoOut])
-def listar_produtos(db: Session = Depends(get_db)):
-    produtos = db.query(Produto).all()
+@app.get("/produtos", response_model=list[ProdutoOut], dependencies=[versoes.condicional("produto", assincrono=True)])
+async def listar_produtos(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [Produto.id_produto]
+    campos = campos_projecao(fields, ProdutoOut.model_fields)
+    produtos, proximo = await db.run_sync(
+        lambda s: paginar(consulta(s, Produto, campos, chave), chave, limit, cursor)
+    )
+    if campos:
+        return resposta_projetada(produtos, campos, proximo, response)
+    definir_cursor(response, proximo)
     return produtos
 
 # -----------------------
 # PARCELAS CRUD
 # -----------------------
 @app.post("/parcelas", response_model=ParcelaOut, status_code=201)
-def criar_parcela(parcela: ParcelaCreate, db: Session = Depends(get_db)):
+async def criar_parcela(parcela: ParcelaCreate, db: AsyncSession = Depends(get_async_db)):
     nova = Parcela(**parcela.dict())
     db.add(nova)
-    db.commit()
-    db.refresh(nova)
+    await versoes.incrementar_async(db, "parcela")
+    await alteracoes.registrar_objetos_async(db, "parcelas", nova)
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [nova.id_parcela], ("parcela",))
     log_action("parcelas", "create", {"id_parcela": nova.id_parcela})
     return nova
 
 @app.put("/parcelas/{id}", response_model=ParcelaOut)
-def atualizar_parcela(id: int, dados: ParcelaUpdate, db: Session = Depends(get_db)):
-    p = db.query(Parcela).filter_by(id_parcela=id).first()
+async def atualizar_parcela(id: int, dados: ParcelaUpdate, db: AsyncSession = Depends(get_async_db)):
+    p = await escrita.atualizar_async(db, Parcela, {"id_parcela": id}, dados.dict(exclude_unset=True))
     if not p:
         raise HTTPException(404, "Parcela não encontrada")
-    for k, v in dados.dict(exclude_unset=True).items():
-        setattr(p, k, v)
-    db.commit()
-    db.refresh(p)
+    await versoes.incrementar_async(db, "parcela")
+    await alteracoes.registrar_async(db, "parcelas", [(id,)])
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [id], ("parcela",))
     log_action("parcelas", "update", {"id_parcela": id})
     return p
 
 @app.delete("/parcelas/{id}", status_code=204)
-def remover_parcela(id: int, db: Session = Depends(get_db)):
-    p = db.query(Parcela).filter_by(id_parcela=id).first()
-    if not p:
+async def remover_parcela(id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        apagado = await escrita.remover_async(db, Parcela, {"id_parcela": id})
+        if apagado:
+            await versoes.incrementar_async(db, "parcela")
+            await alteracoes.registrar_async(db, "parcelas", [(id,)], "delete")
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Parcela possui cultivos ou colheitas", status_referencia=400)
+    if not apagado:
         raise HTTPException(404, "Parcela não encontrada")
-    db.delete(p)
-    db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [id], ("parcela",))
     log_action("parcelas", "delete", {"id_parcela": id})
     return
 
-@app.get("/parcelas", response_model=list[ParcelaOut])
-def listar_parcelas(db: Session = Depends(get_db)):
-    parcelas = db.query(Parcela).all()
+@app.get("/parcelas", response_model=list[ParcelaOut], dependencies=[versoes.condicional("parcela", assincrono=True)])
+async def listar_parcelas(
+    response: Response,
+    status: str | None = None,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [Parcela.id_parcela]
+    campos = campos_projecao(fields, ParcelaOut.model_fields)
+
+    def buscar(s: Session):
+        q = consulta(s, Parcela, campos, chave)
+        if status is not None:
+            q = q.filter(Parcela.status == status)
+        return paginar(q, chave, limit, cursor)
+
+    parcelas, proximo = await db.run_sync(buscar)
+    if campos:
+        return resposta_projetada(parcelas, campos, proximo, response)
+    definir_cursor(response, proximo)
     return parcelas
 
+
+@app.get("/parcelas/disponiveis", response_model=list[ParcelaOut])
+def parcelas_disponiveis(inicio: date, fim: date, tamanho_min: float | None = Query(None, ge=0)):
+    """Parcelas sem cultivo em nenhum dia de [inicio, fim], da menor para a maior (ver disponibilidade.py)."""
+    if fim < inicio:
+        raise HTTPException(400, "fim deve ser igual ou posterior a inicio")
+    return disponibilidade.indice.disponiveis(inicio, fim, tamanho_min)
+
 # -----------------------
 # EVENTOS CRUD
 # -----------------------
 @app.post("/eventos", response_model=EventoOut, status_code=201)
-def criar_evento(evento: EventoCreate, db: Session = Depends(get_db)):
+async def criar_evento(evento: EventoCreate, db: AsyncSession = Depends(get_async_db)):
     novo = Evento(**evento.dict())
     db.add(novo)
-    db.commit()
-    db.refresh(novo)
+    await versoes.incrementar_async(db, "evento")
+    await alteracoes.registrar_objetos_async(db, "eventos", novo)
+    await busca.indexar_objetos_async(db, "eventos", novo)
+    await db.commit()
     log_action("eventos", "create", {"id_evento": novo.id_evento})
     return novo
 
 @app.put("/eventos/{id}", response_model=EventoOut)
-def atualizar_evento(id: int, dados: EventoUpdate, db: Session = Depends(get_db)):
-    e = db.query(Evento).filter_by(id_evento=id).first()
+async def atualizar_evento(id: int, dados: EventoUpdate, db: AsyncSession = Depends(get_async_db)):
+    e = await escrita.atualizar_async(db, Evento, {"id_evento": id}, dados.dict(exclude_unset=True))
     if not e:
         raise HTTPException(404, "Evento não encontrado")
-    for k, v in dados.dict(exclude_unset=True).items():
-        setattr(e, k, v)
-    db.commit()
-    db.refresh(e)
+    await versoes.incrementar_async(db, "evento")
+    await alteracoes.registrar_async(db, "eventos", [(id,)])
+    await busca.indexar_async(db, "eventos", [id])
+    await db.commit()
     log_action("eventos", "update", {"id_evento": id})
     return e
 
 @app.delete("/eventos/{id}", status_code=204)
-def remover_evento(id: int, db: Session = Depends(get_db)):
-    e = db.query(Evento).filter_by(id_evento=id).first()
-    if not e:
+async def remover_evento(id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        apagado = await escrita.remover_async(db, Evento, {"id_evento": id})
+        if apagado:
+            await versoes.incrementar_async(db, "evento")
+            await alteracoes.registrar_async(db, "eventos", [(id,)], "delete")
+            await busca.remover_async(db, "eventos", [id])
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Evento possui participações", status_referencia=400)
+    if not apagado:
         raise HTTPException(404, "Evento não encontrado")
-    db.delete(e)
-    db.commit()
     log_action("eventos", "delete", {"id_evento": id})
     return
 
-@app.get("/eventos")
-def listar_eventos(db: Session = Depends(get_db)):
-    return db.query(Evento).all()
+# papéis aceitos em ParticipacaoCreate, na ordem das contagens
+PAPEIS = get_args(ParticipacaoCreate.model_fields["papel"].annotation)
+
+
+def filtros_eventos(data_inicio, data_fim) -> list:
+    """Filtros comuns da listagem de eventos e da contagem de participantes."""
+    filtros = []
+    if data_inicio is not None:
+        filtros.append(Evento.data_evento >= data_inicio)
+    if data_fim is not None:
+        filtros.append(Evento.data_evento <= data_fim)
+    return filtros
+
+
+def contar_participantes(s: Session, ids: list[int], filtros: list) -> dict:
+    """
+    Participações por papel dos eventos de uma página, num único GROUP BY.
+    A página sai ordenada por id_evento: o intervalo [primeiro, último] com
+    os mesmos filtros da listagem cobre exatamente os eventos dela, sem um IN
+    com cada id, então é uma consulta só para 10 ou 10.000 eventos.
+    """
+    contagens = {i: {**dict.fromkeys(PAPEIS, 0), "total": 0} for i in ids}
+    if not ids:
+        return contagens
+    P = ParticipacaoEventoModel
+    stmt = select(P.id_evento, P.papel, func.count()).where(P.id_evento.between(ids[0], ids[-1]))
+    if filtros:
+        stmt = stmt.join(Evento, Evento.id_evento == P.id_evento).where(*filtros)
+    for id_evento, papel, n in s.execute(stmt.group_by(P.id_evento, P.papel)):
+        if id_evento in contagens:
+            contagens[id_evento][papel] = n
+            contagens[id_evento]["total"] += n
+    return contagens
+
+
+@app.get("/eventos", dependencies=[versoes.condicional("evento", "ParticipacaoEvento", assincrono=True)])
+async def listar_eventos(
+    response: Response,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    contagens: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [Evento.id_evento]
+    campos = campos_projecao(fields, EventoOut.model_fields)
+    filtros = filtros_eventos(data_inicio, data_fim)
+
+    def buscar(s: Session):
+        eventos, proximo = paginar(consulta(s, Evento, campos, chave).filter(*filtros), chave, limit, cursor)
+        participantes = contar_participantes(s, [e.id_evento for e in eventos], filtros) if contagens else None
+        return eventos, proximo, participantes
+
+    eventos, proximo, participantes = await db.run_sync(buscar)
+    if participantes is not None:
+        # participantes por papel em cada evento, com ou sem fields=
+        definir_cursor(response, proximo)
+        return [
+            {**{c: getattr(e, c) for c in campos or EventoOut.model_fields}, "participantes": participantes[e.id_evento]}
+            for e in eventos
+        ]
+    if campos:
+        return resposta_projetada(eventos, campos, proximo, response)
+    definir_cursor(response, proximo)
+    return eventos
+
+
+@app.get("/eventos/proximos", response_model=list[EventoOut])
+async def proximos_eventos(
+    response: Response,
+    a_partir_de: date | None = None,
+    limit: int = Query(20, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Eventos de hoje (ou de a_partir_de) em diante, por data; filtro e ordem saem do índice ix_evento_data."""
+    # sem ETag: a mesma URL muda de resposta quando o dia vira
+    chave = [Evento.data_evento, Evento.id_evento]
+    inicio = a_partir_de or date.today()
+    eventos, proximo = await db.run_sync(
+        lambda s: paginar(s.query(Evento).filter(Evento.data_evento >= inicio), chave, limit, cursor)
+    )
+    definir_cursor(response, proximo)
+    return eventos
+
+
+@app.get(
+    "/eventos/{id}/participantes",
+    response_model=list[ParticipanteOut],
+    dependencies=[versoes.condicional("evento", "ParticipacaoEvento", "usuarios", assincrono=True)]
+)
+async def participantes_evento(
+    id: int,
+    response: Response,
+    papel: Literal["Participante", "Organizador", "Palestrante"] | None = None,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    P = ParticipacaoEventoModel
+    chave = [P.id_usuario]
+
+    def buscar(s: Session):
+        # ix_participacao_evento: filtra por evento já na ordem de id_usuario
+        q = s.query(P.id_usuario, Usuarios.nome, Usuarios.email, P.papel).join(
+            Usuarios, Usuarios.id_usuario == P.id_usuario
+        ).filter(P.id_evento == id)
+        if papel is not None:
+            q = q.filter(P.papel == papel)
+        linhas, proximo = paginar(q, chave, limit, cursor)
+        if not linhas and not cursor and s.get(Evento, id) is None:
+            raise HTTPException(404, "Evento não encontrado")
+        return linhas, proximo
+
+    linhas, proximo = await db.run_sync(buscar)
+    definir_cursor(response, proximo)
+    return linhas
 
 # -----------------------
 # PARTICIPACAO EVENTO (M:N)
 # -----------------------
 @app.post("/participacoes", response_model=ParticipacaoOut, status_code=201)
-def inscrever_participacao(dados: ParticipacaoCreate, db: Session = Depends(get_db)):
-    u = db.query(Usuarios).filter_by(id_usuario=dados.id_usuario).first()
-    e = db.query(Evento).filter_by(id_evento=dados.id_evento).first()
-    if not u or not e:
-        raise HTTPException(404, "Usuário ou Evento não encontrado")
-    if db.query(ParticipacaoEventoModel).filter_by(id_usuario=dados.id_usuario, id_evento=dados.id_evento).first():
-        raise HTTPException(400, "Participação já registrada")
+async def inscrever_participacao(dados: ParticipacaoCreate, db: AsyncSession = Depends(get_async_db)):
     novo = ParticipacaoEventoModel(id_usuario=dados.id_usuario, id_evento=dados.id_evento, papel=dados.papel)
     db.add(novo)
-    db.commit()
+    try:
+        await versoes.incrementar_async(db, "ParticipacaoEvento")
+        await alteracoes.registrar_objetos_async(db, "participacoes", novo)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, "Participação já registrada", "Usuário ou Evento não encontrado")
     log_action("participacoes", "create", {"id_usuario": dados.id_usuario, "id_evento": dados.id_evento})
     return dados
 
+@app.post("/participacoes/batch")
+async def inscrever_participacoes_lote(
+    itens: list[ParticipacaoCreate],
+    modo: lotes.ModoLote = "tudo_ou_nada",
+    db: AsyncSession = Depends(get_async_db)
+):
+    lotes.validar_tamanho(itens)
+    resultados = lotes.resultados_iniciais(len(itens))
+    usuarios = await lotes.existentes_async(db, Usuarios.id_usuario, [i.id_usuario for i in itens])
+    eventos = await lotes.existentes_async(db, Evento.id_evento, [i.id_evento for i in itens])
+    ja_registradas = await lotes.chaves_existentes_async(
+        db, [ParticipacaoEventoModel.id_usuario, ParticipacaoEventoModel.id_evento],
+        [(i.id_usuario, i.id_evento) for i in itens]
+    )
+    vistas = set()
+    for n, item in enumerate(itens):
+        chave = (item.id_usuario, item.id_evento)
+        if item.id_usuario not in usuarios or item.id_evento not in eventos:
+            lotes.marcar_erro(resultados, n, "Usuário ou Evento não encontrado")
+        elif chave in ja_registradas or chave in vistas:
+            lotes.marcar_erro(resultados, n, "Participação já registrada")
+        vistas.add(chave)
+
+    if not lotes.pode_gravar(resultados, modo):
+        lotes.cancelar(resultados)
+        return lotes.responder(resultados, modo, 0)
+    validos = [item for item, r in zip(itens, resultados) if r["ok"]]
+    await db.execute(insert(ParticipacaoEventoModel), [item.dict() for item in validos])
+    await versoes.incrementar_async(db, "ParticipacaoEvento")
+    await alteracoes.registrar_async(db, "participacoes", [(i.id_usuario, i.id_evento) for i in validos])
+    await db.commit()
+    for item in validos:
+        log_action("participacoes", "create", {"id_usuario": item.id_usuario, "id_evento": item.id_evento})
+    return lotes.responder(resultados, modo, len(validos))
+
 @app.delete("/participacoes/{id_usuario}/{id_evento}", status_code=204)
-def remover_participacao(id_usuario: str, id_evento: int, db: Session = Depends(get_db)):
-    p = db.query(ParticipacaoEventoModel).filter_by(id_usuario=id_usuario, id_evento=id_evento).first()
-    if not p:
+async def remover_participacao(id_usuario: str, id_evento: int, db: AsyncSession = Depends(get_async_db)):
+    if not await escrita.remover_async(db, ParticipacaoEventoModel, {"id_usuario": id_usuario, "id_evento": id_evento}):
         raise HTTPException(404, "Participação não encontrada")
-    db.delete(p)
-    db.commit()
+    await versoes.incrementar_async(db, "ParticipacaoEvento")
+    await alteracoes.registrar_async(db, "participacoes", [(id_usuario, id_evento)], "delete")
+    await db.commit()
     log_action("participacoes", "delete", {"id_usuario": id_usuario, "id_evento": id_evento})
     return
 
@@ -379,21 +1033,8 @@ def remover_participacao(id_usuario: str, id_evento: int, db: Session = Depends(
 # CULTIVOS CRUD (PK composta)
 # -----------------------
 @app.post("/cultivos", response_model=CultivoOut, status_code=201)
-def criar_cultivo(dados: CultivoCreate, db: Session = Depends(get_db)):
-    # validar existência produto/parcela
-    pr = db.query(Produto).filter_by(id_produto=dados.id_produto).first()
-    pa = db.query(Parcela).filter_by(id_parcela=dados.id_parcela).first()
-    if not pr or not pa:
-        raise HTTPException(404, "Produto ou Parcela não encontrado")
-    # checar duplicidade de PK composta
-    exists = db.query(CultivoModel).filter_by(
-        id_produto=dados.id_produto,
-        id_parcela=dados.id_parcela,
-        data_plantio=dados.data_plantio
-    ).first()
-    if exists:
-        raise HTTPException(400, "Cultivo já registrado nesta data")
-    
+async def criar_cultivo(dados: CultivoCreate, db: AsyncSession = Depends(get_async_db)):
+    # produto/parcela existentes (FK) e PK composta única ficam a cargo do banco
     novo = CultivoModel(
         id_produto=dados.id_produto,
         id_parcela=dados.id_parcela,
@@ -401,7 +1042,14 @@ def criar_cultivo(dados: CultivoCreate, db: Session = Depends(get_db)):
         status_cultivo=dados.status_cultivo
     )
     db.add(novo)
-    db.commit()
+    try:
+        await versoes.incrementar_async(db, "cultivos")
+        await alteracoes.registrar_objetos_async(db, "cultivos", novo)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, "Cultivo já registrado nesta data", "Produto ou Parcela não encontrado")
+    await run_in_threadpool(disponibilidade.indice.atualizar, [dados.id_parcela], ("cultivos",))
     
     log_action("cultivos", "create", {
         "id_produto": dados.id_produto,
@@ -412,9 +1060,80 @@ def criar_cultivo(dados: CultivoCreate, db: Session = Depends(get_db)):
     return dados
 
 
-@app.get("/cultivos", response_model=list[CultivoOut])
-def listar_cultivos(db: Session = Depends(get_db)):
-    rows = db.query(CultivoModel).all()
+@app.post("/cultivos/batch")
+async def criar_cultivos_lote(
+    itens: list[CultivoCreate],
+    modo: lotes.ModoLote = "tudo_ou_nada",
+    db: AsyncSession = Depends(get_async_db)
+):
+    lotes.validar_tamanho(itens)
+    resultados = lotes.resultados_iniciais(len(itens))
+    produtos = await lotes.existentes_async(db, Produto.id_produto, [i.id_produto for i in itens])
+    parcelas = await lotes.existentes_async(db, Parcela.id_parcela, [i.id_parcela for i in itens])
+    ja_registrados = await lotes.chaves_existentes_async(
+        db, [CultivoModel.id_produto, CultivoModel.id_parcela, CultivoModel.data_plantio],
+        [(i.id_produto, i.id_parcela, i.data_plantio) for i in itens]
+    )
+    vistos = set()
+    for n, item in enumerate(itens):
+        chave = (item.id_produto, item.id_parcela, item.data_plantio)
+        if item.id_produto not in produtos or item.id_parcela not in parcelas:
+            lotes.marcar_erro(resultados, n, "Produto ou Parcela não encontrado")
+        elif chave in ja_registrados or chave in vistos:
+            lotes.marcar_erro(resultados, n, "Cultivo já registrado nesta data")
+        vistos.add(chave)
+
+    if not lotes.pode_gravar(resultados, modo):
+        lotes.cancelar(resultados)
+        return lotes.responder(resultados, modo, 0)
+    validos = [item for item, r in zip(itens, resultados) if r["ok"]]
+    await db.execute(insert(CultivoModel), [item.dict() for item in validos])
+    await versoes.incrementar_async(db, "cultivos")
+    await alteracoes.registrar_async(db, "cultivos", [(i.id_produto, i.id_parcela, i.data_plantio) for i in validos])
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [i.id_parcela for i in validos], ("cultivos",))
+    for item in validos:
+        log_action("cultivos", "create", {
+            "id_produto": item.id_produto,
+            "id_parcela": item.id_parcela,
+            "data_plantio": str(item.data_plantio),
+            "status_cultivo": item.status_cultivo
+        })
+    return lotes.responder(resultados, modo, len(validos))
+
+
+def filtrar_cultivos(q, status_cultivo, id_parcela, id_produto):
+    """Filtros comuns da listagem e da exportação de cultivos (Query ou select)."""
+    if status_cultivo is not None:
+        q = q.filter(CultivoModel.status_cultivo == status_cultivo)
+    if id_parcela is not None:
+        q = q.filter(CultivoModel.id_parcela == id_parcela)
+    if id_produto is not None:
+        q = q.filter(CultivoModel.id_produto == id_produto)
+    return q
+
+
+@app.get("/cultivos", response_model=list[CultivoOut], dependencies=[versoes.condicional("cultivos", assincrono=True)])
+async def listar_cultivos(
+    response: Response,
+    status_cultivo: str | None = None,
+    id_parcela: int | None = None,
+    id_produto: int | None = None,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    # chave = PK composta, na ordem em que está declarada
+    chave = [CultivoModel.id_produto, CultivoModel.id_parcela, CultivoModel.data_plantio]
+    campos = campos_projecao(fields, CultivoOut.model_fields)
+    rows, proximo = await db.run_sync(lambda s: paginar(
+        filtrar_cultivos(consulta(s, CultivoModel, campos, chave), status_cultivo, id_parcela, id_produto),
+        chave, limit, cursor
+    ))
+    if campos:
+        return resposta_projetada(rows, campos, proximo, response)
+    definir_cursor(response, proximo)
     return [
         {
             "id_produto": r.id_produto,
@@ -425,25 +1144,45 @@ def listar_cultivos(db: Session = Depends(get_db)):
     ]
 
 
+# a exportação continua síncrona: o gerador lê de um cursor do lado do servidor
+# numa sessão própria, e o StreamingResponse já o consome numa thread
+@app.get("/cultivos/export")
+def exportar_cultivos(
+    request: Request,
+    formato: Literal["csv", "ndjson"] = "csv",
+    status_cultivo: str | None = None,
+    id_parcela: int | None = None,
+    id_produto: int | None = None,
+    accept_encoding: str = Header("")
+):
+    colunas = ["id_produto", "id_parcela", "data_plantio", "status_cultivo"]
+    stmt = select(*[getattr(CultivoModel, c) for c in colunas]).order_by(
+        CultivoModel.id_produto, CultivoModel.id_parcela, CultivoModel.data_plantio
+    )
+    stmt = filtrar_cultivos(stmt, status_cultivo, id_parcela, id_produto)
+    return exportar(stmt, colunas, formato, "cultivos", gzip="gzip" in accept_encoding, sessao=lambda: sessao_leitura(request))
+
+
 @app.put("/cultivos/{id_produto}/{id_parcela}/{data_plantio}", response_model=CultivoOut)
-def atualizar_cultivo(id_produto: int, id_parcela: int, data_plantio: str, dados: CultivoUpdate, db: Session = Depends(get_db)):
-    r = db.query(CultivoModel).filter_by(
-        id_produto=id_produto,
-        id_parcela=id_parcela,
-        data_plantio=data_plantio
-    ).first()
+async def atualizar_cultivo(id_produto: int, id_parcela: int, data_plantio: date, dados: CultivoUpdate, db: AsyncSession = Depends(get_async_db)):
+    update_data = dados.dict(exclude_unset=True)
+    r = await escrita.atualizar_async(db, CultivoModel, {
+        "id_produto": id_produto,
+        "id_parcela": id_parcela,
+        "data_plantio": data_plantio
+    }, update_data)
     if not r:
         raise HTTPException(404, "Cultivo não encontrado")
-    
-    update_data = dados.dict(exclude_unset=True)
-    for k, v in update_data.items():
-        setattr(r, k, v)
-    db.commit()
+    await versoes.incrementar_async(db, "cultivos")
+    await alteracoes.registrar_async(db, "cultivos", [(id_produto, id_parcela, data_plantio)])
+    await db.commit()
+    # só o status mudou: a ocupação é a mesma
+    await run_in_threadpool(disponibilidade.indice.atualizar, [], ("cultivos",))
     
     log_action("cultivos", "update", {
         "id_produto": id_produto,
         "id_parcela": id_parcela,
-        "data_plantio": data_plantio,
+        "data_plantio": str(data_plantio),
         **update_data
     })
     
@@ -456,22 +1195,22 @@ def atualizar_cultivo(id_produto: int, id_parcela: int, data_plantio: str, dados
 
 
 @app.delete("/cultivos/{id_produto}/{id_parcela}/{data_plantio}", status_code=204)
-def remover_cultivo(id_produto: int, id_parcela: int, data_plantio: str, db: Session = Depends(get_db)):
-    r = db.query(CultivoModel).filter_by(
-        id_produto=id_produto,
-        id_parcela=id_parcela,
-        data_plantio=data_plantio
-    ).first()
-    if not r:
+async def remover_cultivo(id_produto: int, id_parcela: int, data_plantio: date, db: AsyncSession = Depends(get_async_db)):
+    if not await escrita.remover_async(db, CultivoModel, {
+        "id_produto": id_produto,
+        "id_parcela": id_parcela,
+        "data_plantio": data_plantio
+    }):
         raise HTTPException(404, "Cultivo não encontrado")
-    
-    db.delete(r)
-    db.commit()
+    await versoes.incrementar_async(db, "cultivos")
+    await alteracoes.registrar_async(db, "cultivos", [(id_produto, id_parcela, data_plantio)], "delete")
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [id_parcela], ("cultivos",))
     
     log_action("cultivos", "delete", {
         "id_produto": id_produto,
         "id_parcela": id_parcela,
-        "data_plantio": data_plantio
+        "data_plantio": str(data_plantio)
     })
     return
 
@@ -481,13 +1220,7 @@ def remover_cultivo(id_produto: int, id_parcela: int, data_plantio: str, db: Ses
 # COLHEITA CRUD
 # -----------------------
 @app.post("/colheitas", response_model=ColheitaOut, status_code=201)
-def criar_colheita(dados: ColheitaCreate, db: Session = Depends(get_db)):
-    # validar existência produto/parcela
-    pr = db.query(Produto).filter_by(id_produto=dados.id_produto).first()
-    pa = db.query(Parcela).filter_by(id_parcela=dados.id_parcela).first()
-    if not pr or not pa:
-        raise HTTPException(404, "Parcela ou Produto não encontrado")
-    
+async def criar_colheita(dados: ColheitaCreate, db: AsyncSession = Depends(get_async_db)):
     novo = ColheitaModel(
         id_parcela=dados.id_parcela,
         id_produto=dados.id_produto,
@@ -495,15 +1228,27 @@ def criar_colheita(dados: ColheitaCreate, db: Session = Depends(get_db)):
         quantidade_kg=dados.quantidade_kg
     )
     db.add(novo)
+    try:
+        # o INSERT sai aqui; produto/parcela inexistentes falham na FK
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Parcela ou Produto não encontrado")
+    await resumos.somar_colheita_async(db, dados.id_produto, dados.id_parcela, dados.data_colheita, dados.quantidade_kg)
     
     # atualizar status dos cultivos correspondentes
-    db.query(CultivoModel).filter_by(
+    await db.execute(update(CultivoModel).filter_by(
         id_parcela=dados.id_parcela,
         id_produto=dados.id_produto
-    ).update({"status_cultivo": "Colhido"})
+    ).values(status_cultivo="Colhido"))
     
-    db.commit()
-    db.refresh(novo)
+    await versoes.incrementar_async(db, "colheitas", "cultivos")
+    await alteracoes.registrar_objetos_async(db, "colheitas", novo)
+    await alteracoes.registrar_consulta_async(
+        db, "cultivos", CultivoModel.id_parcela == dados.id_parcela, CultivoModel.id_produto == dados.id_produto
+    )
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [dados.id_parcela], ("colheitas", "cultivos"))
     
     log_action("colheitas", "create", {
         "id_parcela": dados.id_parcela,
@@ -514,9 +1259,95 @@ def criar_colheita(dados: ColheitaCreate, db: Session = Depends(get_db)):
     return novo
 
 
-@app.get("/colheitas", response_model=list[ColheitaOut])
-def listar_colheitas(db: Session = Depends(get_db)):
-    rows = db.query(ColheitaModel).all()
+@app.post("/colheitas/batch")
+async def criar_colheitas_lote(
+    itens: list[ColheitaCreate],
+    modo: lotes.ModoLote = "tudo_ou_nada",
+    db: AsyncSession = Depends(get_async_db)
+):
+    lotes.validar_tamanho(itens)
+    resultados = lotes.resultados_iniciais(len(itens))
+    produtos = await lotes.existentes_async(db, Produto.id_produto, [i.id_produto for i in itens])
+    parcelas = await lotes.existentes_async(db, Parcela.id_parcela, [i.id_parcela for i in itens])
+    for n, item in enumerate(itens):
+        if item.id_produto not in produtos or item.id_parcela not in parcelas:
+            lotes.marcar_erro(resultados, n, "Parcela ou Produto não encontrado")
+
+    if not lotes.pode_gravar(resultados, modo):
+        lotes.cancelar(resultados)
+        return lotes.responder(resultados, modo, 0)
+    indices = [n for n, r in enumerate(resultados) if r["ok"]]
+    validos = [itens[n] for n in indices]
+    linhas = [item.dict() for item in validos]
+    if db.get_bind().dialect.insert_executemany_returning:
+        ids = (await db.scalars(insert(ColheitaModel).returning(ColheitaModel.id_colheita, sort_by_parameter_order=True), linhas)).all()
+    else:
+        # MySQL: um INSERT de várias linhas recebe ids consecutivos a partir de
+        # lastrowid (em qualquer innodb_autoinc_lock_mode, com incremento 1)
+        primeiro = (await db.execute(insert(ColheitaModel).values(linhas))).lastrowid
+        ids = list(range(primeiro, primeiro + len(linhas)))
+    for n, id_colheita in zip(indices, ids):
+        resultados[n]["id_colheita"] = id_colheita
+    await resumos.somar_lote_async(db, [(i.id_produto, i.id_parcela, i.data_colheita, i.quantidade_kg) for i in validos])
+
+    # atualizar status dos cultivos correspondentes, um UPDATE para o lote
+    pares = {(i.id_parcela, i.id_produto) for i in validos}
+    await db.execute(
+        update(CultivoModel).where(
+            tuple_(CultivoModel.id_parcela, CultivoModel.id_produto).in_(pares)
+        ).values(status_cultivo="Colhido"),
+        execution_options={"synchronize_session": False}
+    )
+    await versoes.incrementar_async(db, "colheitas", "cultivos")
+    await alteracoes.registrar_async(db, "colheitas", [(i,) for i in ids])
+    await alteracoes.registrar_consulta_async(db, "cultivos", tuple_(CultivoModel.id_parcela, CultivoModel.id_produto).in_(pares))
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [id_parcela for id_parcela, _ in pares], ("colheitas", "cultivos"))
+
+    for item in validos:
+        log_action("colheitas", "create", {
+            "id_parcela": item.id_parcela,
+            "id_produto": item.id_produto,
+            "data_colheita": str(item.data_colheita),
+            "quantidade_kg": float(item.quantidade_kg)
+        })
+    return lotes.responder(resultados, modo, len(validos))
+
+
+def filtrar_colheitas(q, id_parcela, id_produto, data_inicio, data_fim):
+    """Filtros comuns da listagem e da exportação de colheitas (Query ou select)."""
+    if id_parcela is not None:
+        q = q.filter(ColheitaModel.id_parcela == id_parcela)
+    if id_produto is not None:
+        q = q.filter(ColheitaModel.id_produto == id_produto)
+    if data_inicio is not None:
+        q = q.filter(ColheitaModel.data_colheita >= data_inicio)
+    if data_fim is not None:
+        q = q.filter(ColheitaModel.data_colheita <= data_fim)
+    return q
+
+
+@app.get("/colheitas", response_model=list[ColheitaOut], dependencies=[versoes.condicional("colheitas", assincrono=True)])
+async def listar_colheitas(
+    response: Response,
+    id_parcela: int | None = None,
+    id_produto: int | None = None,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    limit: int | None = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    chave = [ColheitaModel.id_colheita]
+    campos = campos_projecao(fields, ColheitaOut.model_fields)
+    rows, proximo = await db.run_sync(lambda s: paginar(
+        filtrar_colheitas(consulta(s, ColheitaModel, campos, chave), id_parcela, id_produto, data_inicio, data_fim),
+        chave, limit, cursor
+    ))
+    if campos:
+        return resposta_projetada(rows, campos, proximo, response)
+    definir_cursor(response, proximo)
     return [
         {
             "id_colheita": r.id_colheita,
@@ -528,9 +1359,27 @@ def listar_colheitas(db: Session = Depends(get_db)):
     ]
 
 
-@app.get("/colheitas/{id}", response_model=ColheitaOut)
-def buscar_colheita(id: int, db: Session = Depends(get_db)):
-    c = db.query(ColheitaModel).filter_by(id_colheita=id).first()
+# declarada antes de /colheitas/{id} para não ser capturada por ela; síncrona
+# pelo mesmo motivo da exportação de cultivos
+@app.get("/colheitas/export")
+def exportar_colheitas(
+    request: Request,
+    formato: Literal["csv", "ndjson"] = "csv",
+    id_parcela: int | None = None,
+    id_produto: int | None = None,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    accept_encoding: str = Header("")
+):
+    colunas = ["id_colheita", "id_parcela", "id_produto", "data_colheita", "quantidade_kg"]
+    stmt = select(*[getattr(ColheitaModel, c) for c in colunas]).order_by(ColheitaModel.id_colheita)
+    stmt = filtrar_colheitas(stmt, id_parcela, id_produto, data_inicio, data_fim)
+    return exportar(stmt, colunas, formato, "colheitas", gzip="gzip" in accept_encoding, sessao=lambda: sessao_leitura(request))
+
+
+@app.get("/colheitas/{id}", response_model=ColheitaOut, dependencies=[versoes.condicional("colheitas", assincrono=True)])
+async def buscar_colheita(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    c = await db.get(ColheitaModel, id)
     if not c:
         raise HTTPException(404, "Colheita não encontrada")
     return {
@@ -543,21 +1392,36 @@ def buscar_colheita(id: int, db: Session = Depends(get_db)):
 
 
 @app.put("/colheitas/{id}", response_model=ColheitaOut)
-def atualizar_colheita(id: int, dados: ColheitaCreate, db: Session = Depends(get_db)):
-    c = db.query(ColheitaModel).filter_by(id_colheita=id).first()
+async def atualizar_colheita(id: int, dados: ColheitaCreate, db: AsyncSession = Depends(get_async_db)):
+    # os valores antigos são necessários para o agregado, então o SELECT fica
+    c = (await db.scalars(select(ColheitaModel).filter_by(id_colheita=id).with_for_update())).first()
     if not c:
         raise HTTPException(404, "Colheita não encontrada")
+    antes = (c.id_produto, c.id_parcela, c.data_colheita, c.quantidade_kg)
     for k, v in dados.dict(exclude_unset=True).items():
         setattr(c, k, v)
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        raise escrita.erro_integridade(e, referencia="Parcela ou Produto não encontrado")
+    # move a colheita no agregado (pode ter mudado produto, parcela ou mês)
+    await resumos.subtrair_colheita_async(db, *antes)
+    await resumos.somar_colheita_async(db, c.id_produto, c.id_parcela, c.data_colheita, c.quantidade_kg)
     
     # atualizar status do cultivo relacionado
-    db.query(CultivoModel).filter_by(
+    await db.execute(update(CultivoModel).filter_by(
         id_parcela=c.id_parcela,
         id_produto=c.id_produto
-    ).update({"status_cultivo": "Colhido"})
+    ).values(status_cultivo="Colhido"))
     
-    db.commit()
-    db.refresh(c)
+    await versoes.incrementar_async(db, "colheitas", "cultivos")
+    await alteracoes.registrar_async(db, "colheitas", [(id,)])
+    await alteracoes.registrar_consulta_async(
+        db, "cultivos", CultivoModel.id_parcela == c.id_parcela, CultivoModel.id_produto == c.id_produto
+    )
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [antes[1], c.id_parcela], ("colheitas", "cultivos"))
     
     log_action("colheitas", "update", {
         "id_colheita": id,
@@ -568,13 +1432,284 @@ def atualizar_colheita(id: int, dados: ColheitaCreate, db: Session = Depends(get
 
 
 @app.delete("/colheitas/{id}", status_code=204)
-def remover_colheita(id: int, db: Session = Depends(get_db)):
-    c = db.query(ColheitaModel).filter_by(id_colheita=id).first()
+async def remover_colheita(id: int, db: AsyncSession = Depends(get_async_db)):
+    c = await escrita.remover_retornando_async(db, ColheitaModel, {"id_colheita": id}, [
+        ColheitaModel.id_produto, ColheitaModel.id_parcela, ColheitaModel.data_colheita, ColheitaModel.quantidade_kg
+    ])
     if not c:
         raise HTTPException(404, "Colheita não encontrada")
-    db.delete(c)
-    db.commit()
+    await resumos.subtrair_colheita_async(db, *c)
+    await versoes.incrementar_async(db, "colheitas")
+    await alteracoes.registrar_async(db, "colheitas", [(id,)], "delete")
+    await db.commit()
+    await run_in_threadpool(disponibilidade.indice.atualizar, [c[1]], ("colheitas",))
     
     log_action("colheitas", "delete", {"id_colheita": id})
     return
 
+
+# -----------------------
+# RELATÓRIOS
+# -----------------------
+@app.get(
+    "/relatorios/colheitas",
+    response_model=list[ResumoColheitaOut],
+    response_model_exclude_none=True,
+    dependencies=[versoes.condicional("colheitas")]
+)
+def relatorio_colheitas(
+    agrupar_por: str = "produto,parcela,mes",
+    id_produto: int | None = None,
+    id_parcela: int | None = None,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Totais de colheita a partir do agregado mensal. agrupar_por aceita
+    qualquer combinação de produto, parcela, ano e mes (vazio = total geral).
+    """
+    dimensoes = [d.strip() for d in agrupar_por.split(",") if d.strip()]
+    for d in dimensoes:
+        if d not in resumos.AGRUPAMENTOS:
+            raise HTTPException(400, f"Agrupamento inválido: {d}")
+    return resumos.consultar(db, dimensoes, id_produto, id_parcela, data_inicio, data_fim)
+
+def job_do_usuario(db: Session, id: str, usuario: Principal) -> JobRelatorio:
+    """O job, se ele é do usuário (ou o usuário é admin); 404 ou 403 caso contrário."""
+    job = db.get(JobRelatorio, id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+    if job.solicitante != usuario.email and usuario.id_grupo != GRUPO_ADMIN:
+        raise HTTPException(403, "Sem permissão")
+    return job
+
+@app.post("/relatorios/jobs", response_model=JobRelatorioOut, status_code=202)
+def criar_job_relatorio(
+    dados: JobRelatorioCreate,
+    response: Response,
+    usuario: Principal = Depends(obter_usuario_logado),
+    db: Session = Depends(get_db)
+):
+    """
+    Enfileira um relatório pesado (ver relatorios.py). Um pedido igual a
+    um job ativo do mesmo usuário, ou a um concluído com os dados
+    inalterados, devolve esse job em vez de criar outro.
+    """
+    try:
+        job, criado = relatorios.enfileirar(db, dados.tipo, {"ano": dados.ano}, usuario.email)
+    except relatorios.FilaCheiaError:
+        raise HTTPException(503, "Fila de relatórios cheia, tente novamente mais tarde", headers={"Retry-After": "30"})
+    except relatorios.LimiteJobsError:
+        raise HTTPException(429, f"Limite de {relatorios.JOBS_POR_SOLICITANTE} relatórios em andamento por usuário")
+    response.headers["Location"] = f"/relatorios/jobs/{job.id}"
+    if job.status == "concluido":
+        response.status_code = 200
+    if criado:
+        log_action("relatorios", "create", {"id_job": job.id, "tipo": job.tipo, "parametros": job.parametros})
+    return relatorios.descrever(db, job)
+
+@app.get("/relatorios/jobs/{id}", response_model=JobRelatorioOut)
+def consultar_job_relatorio(
+    id: str,
+    response: Response,
+    usuario: Principal = Depends(obter_usuario_logado),
+    db: Session = Depends(get_db)
+):
+    # primário: logo depois do POST a réplica ainda pode não ter o job
+    job = job_do_usuario(db, id, usuario)
+    if job.status in relatorios.ATIVOS:
+        response.headers["Retry-After"] = "2"
+    return relatorios.descrever(db, job)
+
+@app.get("/relatorios/jobs/{id}/arquivo")
+def baixar_job_relatorio(id: str, usuario: Principal = Depends(obter_usuario_logado), db: Session = Depends(get_db)):
+    job = job_do_usuario(db, id, usuario)
+    if job.status in relatorios.ATIVOS:
+        raise HTTPException(409, "Relatório ainda não está pronto", headers={"Retry-After": "2"})
+    caminho = relatorios.caminho(job)
+    if not caminho:
+        raise HTTPException(410, "Relatório sem arquivo (cancelado, com erro ou expirado)")
+    nome = f"relatorio_{job.tipo}_{'_'.join(str(v) for v in json.loads(job.parametros).values())}.csv"
+    return FileResponse(caminho, media_type="text/csv; charset=utf-8", filename=nome)
+
+@app.delete("/relatorios/jobs/{id}", status_code=204)
+def cancelar_job_relatorio(id: str, usuario: Principal = Depends(obter_usuario_logado), db: Session = Depends(get_db)):
+    job_do_usuario(db, id, usuario)
+    job = relatorios.cancelar(db, id)
+    if job.status != "cancelado":
+        raise HTTPException(409, f"Job já terminou ({job.status})")
+    log_action("relatorios", "cancel", {"id_job": id})
+    return
+
+
+# -----------------------
+# ANÁLISES
+# -----------------------
+@app.get(
+    "/analytics/parcelas",
+    response_model=list[RendimentoParcelaOut],
+    dependencies=[versoes.condicional(*produtividade.TABELAS)]
+)
+def analytics_parcelas(
+    ano: int | None = Query(None, ge=1900, le=2100),
+    id_produto: int | None = None,
+    percentil_max: float | None = Query(None, ge=0, le=100),
+    limit: int = Query(100, ge=1, le=LIMITE_MAXIMO),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Parcelas da mais para a menos produtiva em kg/m² por temporada (ano).
+    percentil_max=25 lista só o quartil de pior rendimento.
+    """
+    dados = produtividade.cache.obter(db)
+    return produtividade.rendimento_parcelas(dados, ano, id_produto, percentil_max)[:limit]
+
+@app.get(
+    "/analytics/sazonalidade",
+    response_model=list[SazonalidadeOut],
+    dependencies=[versoes.condicional(*produtividade.TABELAS)]
+)
+def analytics_sazonalidade(id_produto: int | None = None, id_parcela: int | None = None, db: Session = Depends(get_read_db)):
+    """kg médio por mês do ano e índice sazonal de cada produto."""
+    return produtividade.sazonalidade(produtividade.cache.obter(db), id_produto, id_parcela)
+
+@app.get(
+    "/analytics/serie",
+    response_model=list[SerieMensalOut],
+    dependencies=[versoes.condicional(*produtividade.TABELAS)]
+)
+def analytics_serie(
+    janela: int = Query(3, ge=1, le=36),
+    id_produto: int | None = None,
+    id_parcela: int | None = None,
+    db: Session = Depends(get_read_db)
+):
+    """Total colhido por mês com a média móvel dos últimos `janela` meses."""
+    return produtividade.serie_mensal(produtividade.cache.obter(db), janela, id_produto, id_parcela)
+
+
+# -----------------------
+# BUSCA
+# -----------------------
+@app.get(
+    "/busca",
+    response_model=list[ResultadoBuscaOut],
+    dependencies=[versoes.condicional("produto", "hortas", "evento", "usuarios")]
+)
+def busca_textual(
+    q: str = Query(..., min_length=1, max_length=200),
+    tipos: str | None = None,
+    limit: int = Query(20, ge=1, le=busca.LIMITE),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Busca textual em produtos, hortas, eventos e usuários, sem diferenciar
+    acentos e com cada termo valendo como prefixo. tipos filtra por lista
+    separada por vírgula (ex.: produtos,hortas).
+    """
+    filtro = None
+    if tipos:
+        filtro = [t.strip() for t in tipos.split(",") if t.strip()]
+        for t in filtro:
+            if t not in busca.FONTES:
+                raise HTTPException(400, f"Tipo inválido: {t}")
+    return busca.buscar(db, q, filtro, limit)
+
+
+# -----------------------
+# LOGS DE AUDITORIA
+# -----------------------
+def colecoes_logs(recurso: str | None) -> tuple:
+    if recurso is None:
+        return mongo_logs.COLECOES
+    if recurso not in mongo_logs.COLECOES:
+        raise HTTPException(400, f"Recurso inválido: {recurso}")
+    return (recurso,)
+
+
+@app.get("/logs", dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def listar_logs(
+    response: Response,
+    recurso: str | None = None,
+    action: str | None = None,
+    user: str | None = None,
+    inicio: datetime | None = None,
+    fim: datetime | None = None,
+    limit: int = Query(100, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = None
+):
+    """
+    Logs de auditoria, mais recentes primeiro; sem recurso, de todas as
+    coleções. O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    """
+    depois = None
+    if cursor:
+        try:
+            momento, id_log = decodificar_valores(cursor)
+            depois = (datetime.fromisoformat(momento), ObjectId(id_log))
+        except (ValueError, TypeError, InvalidId):
+            raise HTTPException(400, "Cursor inválido")
+    try:
+        entradas, ultima = mongo_logs.consultar(colecoes_logs(recurso), action, user, inicio, fim, limit, depois)
+    except mongo_logs.AuditoriaIndisponivel as e:
+        raise HTTPException(503, f"Logs indisponíveis: {e}")
+    definir_cursor(response, codificar_cursor((ultima[0].isoformat(), str(ultima[1]))) if ultima else None)
+    return jsonable_encoder(entradas, custom_encoder={ObjectId: str})
+
+
+@app.get("/logs/resumo", dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def resumo_logs(
+    recurso: str | None = None,
+    action: str | None = None,
+    user: str | None = None,
+    inicio: datetime | None = None,
+    fim: datetime | None = None
+):
+    """Quantidade de ações por dia (UTC), recurso e ação."""
+    try:
+        return mongo_logs.acoes_por_dia(colecoes_logs(recurso), action, user, inicio, fim)
+    except mongo_logs.AuditoriaIndisponivel as e:
+        raise HTTPException(503, f"Logs indisponíveis: {e}")
+
+
+# -----------------------
+# DIAGNÓSTICO
+# -----------------------
+@app.get("/diagnostico/perfis", dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def listar_perfis(limit: int = Query(50, ge=1, le=diagnostico.PERFIL_MAX)):
+    """Perfis salvos (X-Perfil ou amostragem), dos mais novos para os mais antigos."""
+    return diagnostico.listar_perfis(limit)
+
+@app.get("/diagnostico/perfis/{id}", dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def ler_perfil(id: str, formato: Literal["json", "folded"] = "json"):
+    """Resumo com as funções mais frequentes, ou as pilhas em formato folded (flamegraph)."""
+    perfil = diagnostico.ler_perfil(id)
+    if perfil is None:
+        raise HTTPException(404, "Perfil não encontrado")
+    if formato == "folded":
+        return PlainTextResponse(
+            perfil["folded"], headers={"Content-Disposition": f'attachment; filename="perfil_{id}.folded"'}
+        )
+    return perfil
+
+@app.get("/diagnostico/consultas-lentas", dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def listar_consultas_lentas(
+    limit: int = Query(100, ge=1, le=diagnostico.LENTAS_MAX),
+    rota: str | None = None,
+    agrupar: bool = False
+):
+    """Comandos SQL acima de LENTAS_LIMITE_MS neste worker; agrupar=true soma por rota e comando."""
+    return diagnostico.consultas_lentas(limit, rota, agrupar)
+
+@app.delete("/diagnostico/consultas-lentas", status_code=204, dependencies=[Depends(exigir_grupo(GRUPO_ADMIN))])
+def limpar_consultas_lentas():
+    diagnostico.limpar_consultas_lentas()
+    return
+
+
+# -----------------------
+# FRONTEND
+# -----------------------
+# por último: /app/... não concorre com nenhuma rota da API
+app.mount("/app", estaticos.Estaticos(), name="frontend")
@@ -0,0 +1,217 @@
+"""
+Métricas no formato texto do Prometheus, expostas em /metrics.
+
+Os valores ficam na memória do processo: com vários workers do uvicorn,
+cada um responde pelas suas próprias requisições.
+"""
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_QUANTIDADE = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _rotulos(nomes: tuple, valores: tuple) -> str:
+    if not nomes:
+        return ""
+    pares = []
+    for n, v in zip(nomes, valores):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pares.append(f'{n}="{v}"')
+    return "{" + ",".join(pares) + "}"
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1, *rotulos):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def exportar(self) -> list[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for rotulos, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(self.rotulos, rotulos)} {valor}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), buckets: tuple = BUCKETS_SEGUNDOS):
+        self.nome, self.ajuda, self.rotulos, self.buckets = nome, ajuda, rotulos, buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *rotulos):
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def totais(self) -> tuple[float, int]:
+        """Soma e número de observações, somando todas as séries."""
+        with self._lock:
+            return sum(s[1] for s in self._series.values()), sum(s[2] for s in self._series.values())
+
+    def exportar(self) -> list[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        nomes_le = self.rotulos + ("le",)
+        with self._lock:
+            for rotulos, (contagens, soma, total) in sorted(self._series.items()):
+                for limite, contagem in zip(self.buckets, contagens):
+                    linhas.append(f"{self.nome}_bucket{_rotulos(nomes_le, rotulos + (limite,))} {contagem}")
+                linhas.append(f"{self.nome}_bucket{_rotulos(nomes_le, rotulos + ('+Inf',))} {total}")
+                linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {soma}")
+                linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {total}")
+        return linhas
+
+
+def gauge(nome: str, ajuda: str, valores: list[tuple]) -> list[str]:
+    """valores: [(rótulos como dict, valor)]"""
+    linhas = [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge"]
+    for rotulos, valor in valores:
+        linhas.append(f"{nome}{_rotulos(tuple(rotulos), tuple(rotulos.values()))} {valor}")
+    return linhas
+
+
+# -----------------------
+# REGISTRO
+# -----------------------
+http_duracao = Histograma("horta_http_request_duration_seconds", "Latência das requisições por rota", ("method", "route"))
+http_total = Contador("horta_http_requests_total", "Requisições por rota e status", ("method", "route", "status"))
+http_sql = Histograma(
+    "horta_http_request_sql_statements", "Comandos SQL por requisição", ("route",), BUCKETS_QUANTIDADE
+)
+http_db = Histograma("horta_http_request_db_seconds", "Tempo total de banco por requisição", ("route",))
+sql_duracao = Histograma("horta_db_statement_duration_seconds", "Duração de cada comando SQL", ("engine",))
+pool_espera = Histograma("horta_db_pool_checkout_wait_seconds", "Espera por uma conexão do pool", ("engine",))
+sessoes_leitura = Contador("horta_db_read_sessions_total", "Sessões de leitura por destino", ("destino",))
+admissao_recusas = Contador(
+    "horta_admission_rejected_total", "Requisições recusadas pelo controle de admissão", ("classe", "motivo")
+)
+admissao_espera = Histograma("horta_admission_queue_seconds", "Espera na fila do controle de admissão", ("classe",))
+
+_registro = [
+    http_duracao, http_total, http_sql, http_db, sql_duracao, pool_espera, sessoes_leitura,
+    admissao_recusas, admissao_espera,
+]
+_engines = {}
+# Funções chamadas com (engine, statement, parameters, executemany, duração) a cada comando SQL
+_observadores_sql = []
+
+# Acumulador da requisição atual (SQL e tempo de banco), preenchido pelos eventos do engine
+_requisicao = contextvars.ContextVar("metricas_requisicao", default=None)
+
+
+def iniciar_requisicao() -> dict:
+    acumulador = {"sql": 0, "db": 0.0}
+    _requisicao.set(acumulador)
+    return acumulador
+
+
+def registrar_requisicao(metodo: str, rota: str, status: int, duracao: float, acumulador: dict):
+    http_duracao.observar(duracao, metodo, rota)
+    http_total.inc(1, metodo, rota, str(status))
+    http_sql.observar(acumulador["sql"], rota)
+    http_db.observar(acumulador["db"], rota)
+
+
+# -----------------------
+# SQLALCHEMY
+# -----------------------
+class _PoolMedido:
+    """Mede quanto tempo cada checkout esperou por uma conexão livre."""
+    nome_metricas = "default"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_espera.observar(time.perf_counter() - inicio, self.nome_metricas)
+
+
+class QueuePoolMedido(_PoolMedido, QueuePool):
+    pass
+
+
+class AsyncQueuePoolMedido(_PoolMedido, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrumentar_engine(engine, nome: str):
+    """Liga os eventos de cursor do engine (sync, ou o sync_engine de um AsyncEngine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    _engines[nome] = sync_engine
+    if isinstance(sync_engine.pool, _PoolMedido):
+        sync_engine.pool.nome_metricas = nome
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["metricas_inicio"].pop()
+        sql_duracao.observar(duracao, nome)
+        acumulador = _requisicao.get()
+        if acumulador is not None:
+            acumulador["sql"] += 1
+            acumulador["db"] += duracao
+        for observador in _observadores_sql:
+            observador(nome, statement, parameters, executemany, duracao)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _erro(contexto):
+        inicios = contexto.connection.info.get("metricas_inicio") if contexto.connection is not None else None
+        if inicios:
+            inicios.pop()
+
+
+def observar_sql(funcao):
+    """Registra funcao(engine, statement, parameters, executemany, duração) para cada comando SQL."""
+    _observadores_sql.append(funcao)
+    return funcao
+
+
+def _pool_gauges() -> list[str]:
+    tamanhos, overflow, em_uso = [], [], []
+    for nome, engine in sorted(_engines.items()):
+        pool = engine.pool
+        if not hasattr(pool, "overflow"):
+            continue
+        tamanhos.append(({"engine": nome}, pool.size()))
+        overflow.append(({"engine": nome}, max(pool.overflow(), 0)))
+        em_uso.append(({"engine": nome}, pool.checkedout()))
+    return (
+        gauge("horta_db_pool_size", "Tamanho configurado do pool", tamanhos)
+        + gauge("horta_db_pool_overflow", "Conexões além do tamanho do pool", overflow)
+        + gauge("horta_db_pool_checked_out", "Conexões em uso", em_uso)
+    )
+
+
+def simples(nome: str, tipo: str, ajuda: str, valor) -> list[str]:
+    """Métrica sem rótulos, para contadores mantidos por outros módulos."""
+    return [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}", f"{nome} {valor}"]
+
+
+def exportar(extras: list[str] = ()) -> str:
+    """Texto completo do /metrics."""
+    linhas = []
+    for metrica in _registro:
+        linhas.extend(metrica.exportar())
+    linhas.extend(_pool_gauges())
+    linhas.extend(extras)
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,118 @@
+"""
+Migrações versionadas do schema.
+
+Cada migração roda uma única vez e fica registrada em schema_versao. Todas
+conferem o que já existe antes de criar, então valem tanto para um banco
+novo (depois do create_all) quanto para um banco antigo, criado antes dos
+índices e das tabelas auxiliares. Aplicar:
+
+    python esquema.py migrar
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlalchemy.orm import Session
+
+import busca
+import resumos
+from models import (
+    Alteracao, Colheita, Cultivo, Evento, JobRelatorio, ParticipacaoEvento, ResumoColheita, Usuarios, VersaoTabela,
+)
+
+schema_versao = Table(
+    "schema_versao",
+    MetaData(),
+    Column("versao", Integer, primary_key=True),
+    Column("descricao", String(200), nullable=False),
+    Column("aplicada_em", DateTime, nullable=False),
+)
+
+# (versão, descrição, função que recebe a Connection já em transação)
+MIGRACOES = []
+
+
+def migracao(versao: int, descricao: str):
+    def registrar(funcao):
+        MIGRACOES.append((versao, descricao, funcao))
+        return funcao
+    return registrar
+
+
+def _criar_indices(conn, modelo):
+    """Cria os índices declarados no modelo que a tabela ainda não tem."""
+    existentes = {i["name"] for i in inspect(conn).get_indexes(modelo.__tablename__)}
+    for indice in modelo.__table__.indexes:
+        if indice.name not in existentes:
+            indice.create(conn)
+
+
+@migracao(1, "tabelas colheitas_resumo e versoes_tabela")
+def _tabelas_auxiliares(conn):
+    for modelo in (ResumoColheita, VersaoTabela):
+        modelo.__table__.create(conn, checkfirst=True)
+    # o agregado precisa refletir as colheitas que já existiam
+    resumos.reconstruir(Session(bind=conn))
+
+
+@migracao(2, "índices de email, cultivos, colheitas e eventos")
+def _indices(conn):
+    duplicados = conn.execute(
+        select(Usuarios.email).group_by(Usuarios.email).having(func.count() > 1).limit(10)
+    ).scalars().all()
+    if duplicados:
+        raise RuntimeError(f"Emails duplicados impedem o índice único: {', '.join(map(str, duplicados))}")
+    for modelo in (Usuarios, Cultivo, Colheita, Evento):
+        _criar_indices(conn, modelo)
+
+
+@migracao(3, "tabela alteracoes (sincronização incremental)")
+def _alteracoes(conn):
+    Alteracao.__table__.create(conn, checkfirst=True)
+
+
+@migracao(4, "índice de participações por evento")
+def _indice_participacoes(conn):
+    _criar_indices(conn, ParticipacaoEvento)
+
+
+@migracao(5, "tabela busca (busca textual)")
+def _busca(conn):
+    busca.criar(conn)
+    # o índice precisa refletir os registros que já existiam
+    busca.reconstruir(Session(bind=conn))
+
+
+@migracao(6, "tabela relatorio_jobs (relatórios em segundo plano)")
+def _jobs_relatorios(conn):
+    JobRelatorio.__table__.create(conn, checkfirst=True)
+
+
+@migracao(7, "coluna execucao em relatorio_jobs (dono de cada execução)")
+def _execucao_jobs(conn):
+    if "execucao" not in {c["name"] for c in inspect(conn).get_columns("relatorio_jobs")}:
+        tipo = JobRelatorio.__table__.c.execucao.type.compile(conn.dialect)
+        conn.execute(text(f"ALTER TABLE relatorio_jobs ADD COLUMN execucao {tipo}"))
+
+
+def versao_atual(conn) -> int:
+    return conn.execute(select(func.max(schema_versao.c.versao))).scalar() or 0
+
+
+def migrar(engine) -> list[str]:
+    """
+    Aplica as migrações pendentes, cada uma na sua transação (no MySQL o DDL
+    não volta atrás, por isso elas são idempotentes).
+
+    Returns:
+        list[str]: Descrição das migrações aplicadas agora.
+    """
+    schema_versao.create(engine, checkfirst=True)
+    aplicadas = []
+    for versao, descricao, funcao in sorted(MIGRACOES, key=lambda m: m[0]):
+        with engine.begin() as conn:
+            if versao <= versao_atual(conn):
+                continue
+            funcao(conn)
+            conn.execute(insert(schema_versao).values(versao=versao, descricao=descricao, aplicada_em=datetime.utcnow()))
+        aplicadas.append(f"{versao:03d} {descricao}")
+    return aplicadas
@@ -1,4 +1,4 @@
-from sqlalchemy import func, Text, Column, Integer, String, CHAR, ForeignKey, Date, text, Enum, Float
+from sqlalchemy import func, Text, Column, Integer, BigInteger, String, CHAR, ForeignKey, Date, DateTime, text, Enum, Float, Index
 from sqlalchemy.orm import relationship
 from database_mysql import Base
 import uuid
@@ -22,6 +22,9 @@ class Usuarios(Base):
 
     grupo = relationship("GruposUsuarios", back_populates="usuarios")
 
+    # login e obter_usuario_logado buscam por email
+    __table_args__ = (Index("ux_usuarios_email", "email", unique=True),)
+
 
 
 
@@ -59,12 +62,17 @@ class Evento(Base):
     descricao = Column(Text)
     local_evento = Column(String(100))
 
+    __table_args__ = (Index("ix_evento_data", "data_evento"),)
+
 class ParticipacaoEvento(Base):
     __tablename__ = 'ParticipacaoEvento'
     id_usuario = Column(CHAR(36), ForeignKey('usuarios.id_usuario'), primary_key=True)
     id_evento = Column(Integer, ForeignKey('evento.id_evento'), primary_key=True)
     papel = Column(Enum('Participante', 'Organizador', 'Palestrante', name='papel_enum'), nullable=False)
 
+    # a PK começa por id_usuario; participantes de um evento e contagem por papel partem de id_evento
+    __table_args__ = (Index("ix_participacao_evento", "id_evento", "id_usuario", "papel"),)
+
 class Cultivo(Base):
     __tablename__ = "cultivos"
     id_produto = Column(Integer, ForeignKey("produto.id_produto"), primary_key=True)
@@ -72,10 +80,104 @@ class Cultivo(Base):
     data_plantio = Column(Date, primary_key=True)
     status_cultivo = Column(String(50))
 
+    # os handlers de colheita atualizam cultivos por (parcela, produto), que não é prefixo da PK
+    __table_args__ = (Index("ix_cultivos_parcela_produto", "id_parcela", "id_produto"),)
+
 class Colheita(Base):
     __tablename__ = "colheitas"
     id_colheita = Column(Integer, primary_key=True, autoincrement=True)
     id_parcela = Column(Integer, ForeignKey("parcela.id_parcela"))
     id_produto = Column(Integer, ForeignKey("produto.id_produto"))
     data_colheita = Column(Date)
-    quantidade_kg = Column(Float)
\ No newline at end of file
+    quantidade_kg = Column(Float)
+
+    # filtros da listagem/exportação e recálculo de mínimo/máximo do resumo
+    __table_args__ = (Index("ix_colheitas_parcela_produto_data", "id_parcela", "id_produto", "data_colheita"),)
+
+class ResumoColheita(Base):
+    """Agregado mensal de colheitas, mantido pelos handlers de colheita (ver resumos.py)."""
+    __tablename__ = "colheitas_resumo"
+    id_produto = Column(Integer, primary_key=True)
+    id_parcela = Column(Integer, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    total_kg = Column(Float, nullable=False, default=0)
+    quantidade = Column(Integer, nullable=False, default=0)
+    min_kg = Column(Float)
+    max_kg = Column(Float)
+
+class VersaoTabela(Base):
+    """Contador de escritas por tabela, usado nos ETags (ver versoes.py)."""
+    __tablename__ = "versoes_tabela"
+    tabela = Column(String(50), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+
+class Alteracao(Base):
+    """Registro de escritas por recurso, lido pela sincronização incremental (ver alteracoes.py)."""
+    __tablename__ = "alteracoes"
+    # no SQLite só INTEGER PRIMARY KEY é autoincremento
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    recurso = Column(String(30), nullable=False)
+    chave = Column(String(200), nullable=False)  # PK do registro em JSON, na ordem das colunas
+    operacao = Column(Enum("upsert", "delete", name="operacao_enum"), nullable=False)
+    criado_em = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # /{recurso}/changes: recurso = ? AND id > cursor
+        Index("ix_alteracoes_recurso_id", "recurso", "id"),
+        # compactação: entradas substituídas por uma mais nova da mesma chave
+        Index("ix_alteracoes_recurso_chave", "recurso", "chave", "id"),
+        Index("ix_alteracoes_criado_em", "criado_em"),
+    )
+
+class Busca(Base):
+    """Texto normalizado de produtos, hortas, eventos e usuários para a busca (ver busca.py)."""
+    __tablename__ = "busca"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    tipo = Column(String(20), nullable=False)
+    chave = Column(String(36), nullable=False)
+    titulo = Column(String(255))                # nome original, para exibir
+    nome = Column(String(255), nullable=False)  # sem acentos e em minúsculas
+    detalhe = Column(Text)
+
+    __table_args__ = (
+        # reindexar/remover um registro
+        Index("ux_busca_tipo_chave", "tipo", "chave", unique=True),
+        # MySQL: índice FULLTEXT; no SQLite a tabela FTS5 busca_fts faz esse papel
+        Index("ft_busca", "nome", "detalhe", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+class JobRelatorio(Base):
+    """Relatório pesado gerado em segundo plano (ver relatorios.py)."""
+    __tablename__ = "relatorio_jobs"
+    id = Column(CHAR(36), primary_key=True)
+    tipo = Column(String(30), nullable=False)
+    parametros = Column(String(500), nullable=False)  # JSON com as chaves ordenadas
+    chave = Column(String(64), nullable=False)        # sha256 de solicitante + tipo + parâmetros
+    # = chave enquanto pendente/executando, NULL depois: o índice único barra duplicados ativos
+    ativo = Column(String(64))
+    versao = Column(String(100))                      # versões das tabelas lidas, ao enfileirar
+    status = Column(
+        Enum("pendente", "executando", "concluido", "erro", "cancelado", name="status_job_enum"),
+        nullable=False, default="pendente"
+    )
+    solicitante = Column(String(100))
+    # gerado a cada reivindicação: batimento e resultado só valem para a execução que o tem
+    execucao = Column(CHAR(36))
+    tentativas = Column(Integer, nullable=False, default=0)
+    criado_em = Column(DateTime, nullable=False)
+    iniciado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)                  # batimento do processo que executa
+    concluido_em = Column(DateTime)
+    arquivo = Column(String(255))
+    linhas = Column(Integer)
+    tamanho = Column(BigInteger)
+    erro = Column(Text)
+
+    __table_args__ = (
+        Index("ux_relatorio_jobs_ativo", "ativo", unique=True),
+        # próximo pendente, abandonados e limpeza
+        Index("ix_relatorio_jobs_status", "status", "criado_em"),
+        # reaproveitar um concluído com os mesmos parâmetros e versão
+        Index("ix_relatorio_jobs_chave", "chave", "status"),
+    )
@@ -1,47 +1,552 @@
 from pymongo import MongoClient
-from datetime import datetime
+from pymongo.errors import BulkWriteError
+from bson import ObjectId, json_util
+from collections import Counter, deque
+from datetime import date, datetime, timezone
+from dotenv import load_dotenv
+import atexit
+import contextvars
+import operator
+import os
+import queue
+import threading
+import time
 
-# URI do MongoDB (ajuste se colocar usuário e senha)
-MONGO_URI = "mongodb://localhost:27017"
+load_dotenv()
 
-# Conexão com o MongoDB
-try:
-    client = MongoClient(MONGO_URI)
-    # Testa conexão
-    client.admin.command("ping")
-    print("✅ Conectado ao MongoDB!")
-except Exception as e:
-    print("❌ Falha ao conectar no MongoDB:", e)
-    client = None  # Evita erros caso não tenha conexão
+# URI do MongoDB (ajuste se colocar usuário e senha). "memoria://" guarda os
+# logs no próprio processo, para rodar testes e benchmarks sem MongoDB
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+# Timeouts curtos: com o MongoDB fora, nada deve esperar os 30 s padrão do pymongo
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "2000"))
+# Intervalo entre tentativas de reconexão feitas pelo escritor
+MONGO_RECONNECT_INTERVAL = float(os.getenv("MONGO_RECONNECT_INTERVAL", "10"))
+# Entradas guardadas por coleção com MONGO_URI=memoria:// (as mais antigas saem)
+AUDIT_MEMORIA_MAX = int(os.getenv("AUDIT_MEMORIA_MAX", "100000"))
+
+# Parâmetros do escritor de auditoria em segundo plano
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_SPOOL_PATH = os.getenv("AUDIT_SPOOL_PATH", "audit_spool.jsonl")
+AUDIT_REPLAY_INTERVAL = float(os.getenv("AUDIT_REPLAY_INTERVAL", "30"))
+# Retenção dos logs: índice TTL em timestamp (0 = guarda para sempre)
+AUDIT_RETENCAO_DIAS = int(os.getenv("AUDIT_RETENCAO_DIAS", "365"))
+
+# Coleções gravadas por log_action, uma por recurso
+COLECOES = (
+    "auth", "usuarios", "grupos", "hortas", "produtos", "parcelas",
+    "eventos", "participacoes", "cultivos", "colheitas", "relatorios",
+)
+
+# Usuário da requisição atual (preenchido pelo middleware a partir do token)
+usuario_atual = contextvars.ContextVar("audit_usuario", default=None)
+
+
+# -----------------------
+# CONEXÃO
+# -----------------------
+# A conexão não é feita no import: o escritor conecta em segundo plano e,
+# enquanto o MongoDB estiver fora, db_mongo fica None e tudo vai para o spool.
+client = None
+db_mongo = None
+_lock_conexao = threading.Lock()
+_estado = {"conectado": False, "erro": None, "ultima_tentativa": 0.0, "preparado": False}
+
+
+_OPERADORES = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def _casa(documento: dict, filtro: dict) -> bool:
+    """Avalia em Python o subconjunto de filtros do MongoDB usado por consultar()."""
+    for campo, condicao in filtro.items():
+        if campo == "$and":
+            if not all(_casa(documento, f) for f in condicao):
+                return False
+        elif campo == "$or":
+            if not any(_casa(documento, f) for f in condicao):
+                return False
+        elif isinstance(condicao, dict):
+            valor = documento.get(campo)
+            if valor is None or not all(_OPERADORES[op](valor, ref) for op, ref in condicao.items()):
+                return False
+        elif documento.get(campo) != condicao:
+            return False
+    return True
+
+
+class _ColecaoMemoria:
+    def __init__(self):
+        self.documentos = deque(maxlen=AUDIT_MEMORIA_MAX)
+
+    def insert_many(self, documentos, ordered=True):
+        for documento in documentos:
+            documento.setdefault("_id", ObjectId())
+        self.documentos.extend(documentos)
+
+    def find(self, filtro=None, sort=None, limit=0):
+        encontrados = [d for d in list(self.documentos) if _casa(d, filtro or {})]
+        # ordenações estáveis, da última chave para a primeira
+        for campo, direcao in reversed(sort or []):
+            encontrados.sort(key=lambda d: d[campo], reverse=direcao < 0)
+        return encontrados[:limit] if limit else encontrados
+
+
+class _BancoMemoria(dict):
+    """Substituto do banco de logs em memória, com só o que o escritor e as consultas usam."""
+    def __missing__(self, nome):
+        colecao = self[nome] = _ColecaoMemoria()
+        return colecao
+
+
+def conectar() -> bool:
+    """Cria o cliente (uma vez) e testa com ping. Retorna se está conectado."""
+    global client, db_mongo
+    with _lock_conexao:
+        _estado["ultima_tentativa"] = time.monotonic()
+        if MONGO_URI.startswith("memoria://"):
+            if db_mongo is None:
+                db_mongo = _BancoMemoria()
+            _estado.update(conectado=True, erro=None)
+            return True
+        try:
+            if client is None:
+                client = MongoClient(
+                    MONGO_URI,
+                    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                    connectTimeoutMS=MONGO_TIMEOUT_MS,
+                    socketTimeoutMS=MONGO_TIMEOUT_MS * 5,  # insert_many de um lote cheio
+                )
+            client.admin.command("ping")
+        except Exception as e:
+            if _estado["conectado"] or _estado["erro"] is None:
+                print("❌ Falha ao conectar no MongoDB:", e)
+            db_mongo = None
+            _estado.update(conectado=False, erro=str(e))
+            return False
+        if not _estado["conectado"]:
+            print("✅ Conectado ao MongoDB!")
+        db_mongo = client["horta_logs"]
+        if not _estado["preparado"]:
+            try:
+                preparar_colecoes(db_mongo)
+                _estado["preparado"] = True
+            except Exception as e:
+                # sem os índices os logs continuam sendo gravados; tenta na próxima conexão
+                print("❌ Erro ao criar os índices dos logs:", e)
+        _estado.update(conectado=True, erro=None)
+        return True
+
+
+def _indice_timestamp(colecao, segundos: int | None):
+    """Índice em timestamp, com TTL quando há retenção; ajusta um índice existente."""
+    atual = colecao.index_information().get("timestamp")
+    if atual is not None and atual.get("expireAfterSeconds") != segundos:
+        if segundos is not None and "expireAfterSeconds" in atual:
+            colecao.database.command("collMod", colecao.name, index={"name": "timestamp", "expireAfterSeconds": segundos})
+            return
+        colecao.drop_index("timestamp")
+    opcoes = {"expireAfterSeconds": segundos} if segundos is not None else {}
+    colecao.create_index([("timestamp", -1)], name="timestamp", **opcoes)
+
+
+def preparar_colecoes(banco):
+    """
+    Cria as coleções de COLECOES com os índices das consultas de /logs
+    (create_index não faz nada quando o índice já existe). O índice de
+    timestamp é TTL: o MongoDB apaga sozinho o que passa de AUDIT_RETENCAO_DIAS.
+    """
+    segundos = AUDIT_RETENCAO_DIAS * 86400 if AUDIT_RETENCAO_DIAS > 0 else None
+    for nome in COLECOES:
+        colecao = banco[nome]
+        _indice_timestamp(colecao, segundos)
+        colecao.create_index([("action", 1), ("timestamp", -1)], name="action_timestamp")
+        colecao.create_index([("user", 1), ("timestamp", -1)], name="user_timestamp")
+
+
+def _desconectado(erro: Exception):
+    """Marca o MongoDB como fora após uma falha de escrita; o escritor tenta de novo depois."""
+    global db_mongo
+    with _lock_conexao:
+        db_mongo = None
+        _estado.update(conectado=False, erro=str(erro), ultima_tentativa=time.monotonic())
+
+
+def estado() -> dict:
+    with _lock_conexao:
+        return {"conectado": _estado["conectado"], "erro": _estado["erro"]}
+
+
+def verificar() -> dict:
+    """
+    Estado para o /health/ready: com conexão, confirma com um ping (limitado
+    por MONGO_TIMEOUT_MS); sem ela, devolve o último erro do escritor.
+    """
+    if _estado["conectado"]:
+        conectar()
+    return estado()
+
+
+# -----------------------
+# ESCRITOR EM SEGUNDO PLANO
+# -----------------------
+_fila = queue.Queue(maxsize=AUDIT_QUEUE_MAX)
+_lock_escritor = threading.Lock()
+_lock_spool = threading.Lock()
+_lock_contadores = threading.Lock()
+_escritor = None
+_ultimo_reprocesso = 0.0
+
+_contadores = {
+    "enfileirados": 0,
+    "descartados": 0,
+    "inseridos": 0,
+    "em_spool": 0,
+    "reprocessados": 0,
+    "falhas_flush": 0,
+    "flushes": 0,
+    "flush_ultimo_ms": 0.0,
+    "flush_total_ms": 0.0,
+    "log_action_chamadas": 0,
+    "log_action_total_ms": 0.0,
+}
+
+
+def _incrementar(chave: str, valor=1):
+    with _lock_contadores:
+        _contadores[chave] += valor
+
+
+class _PedidoFlush:
+    """Marcador colocado na fila para pedir um flush síncrono ao escritor."""
+    def __init__(self):
+        self.concluido = threading.Event()
+
+
+def _gravar_spool(lotes: dict):
+    """Acrescenta os lotes não gravados ao arquivo local (append-only)."""
+    with _lock_spool:
+        with open(AUDIT_SPOOL_PATH, "a", encoding="utf-8") as f:
+            for collection_name, entradas in lotes.items():
+                for entrada in entradas:
+                    linha = {"collection": collection_name, "entry": entrada}
+                    f.write(json_util.dumps(linha) + "\n")
+                    _incrementar("em_spool", 1)
+
+
+def _spool_pendente() -> bool:
+    return os.path.exists(AUDIT_SPOOL_PATH) or os.path.exists(AUDIT_SPOOL_PATH + ".replay")
+
+
+def _reprocessar_spool():
+    """
+    Reenvia ao MongoDB as entradas guardadas no spool enquanto ele estava fora.
+
+    O spool é renomeado para .replay e o .replay só é apagado depois do
+    insert_many; o que falhar volta para o fim do spool. Um .replay que
+    sobrou de uma queda no meio do reenvio vai primeiro, antes de o spool
+    ser renomeado por cima dele. Reenviar uma entrada já gravada não a
+    duplica (mesmo _id).
+    """
+    if db_mongo is None:
+        return
+    processando = AUDIT_SPOOL_PATH + ".replay"
+    # no máximo duas voltas: o .replay que sobrou e o spool atual
+    for _ in range(2):
+        with _lock_spool:
+            if not os.path.exists(processando):
+                if not os.path.exists(AUDIT_SPOOL_PATH):
+                    return
+                os.replace(AUDIT_SPOOL_PATH, processando)
+        lotes = {}
+        with open(processando, encoding="utf-8") as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                item = json_util.loads(linha)
+                lotes.setdefault(item["collection"], []).append(item["entry"])
+        restantes = _inserir_lotes(lotes)
+        if restantes:
+            _gravar_spool(restantes)
+        else:
+            _incrementar("reprocessados", sum(len(v) for v in lotes.values()))
+        os.remove(processando)
+        if restantes:
+            return
+
+
+def _inserir_lotes(lotes: dict) -> dict:
+    """Grava cada coleção com insert_many; devolve o que não pôde ser gravado."""
+    falhas = {}
+    for collection_name, entradas in lotes.items():
+        if db_mongo is None:
+            falhas[collection_name] = entradas
+            continue
+        try:
+            db_mongo[collection_name].insert_many(entradas, ordered=False)
+            _incrementar("inseridos", len(entradas))
+        except BulkWriteError as e:
+            # entradas reenviadas do spool podem já ter sido gravadas (mesmo _id)
+            erros = e.details.get("writeErrors", [])
+            if all(err.get("code") == 11000 for err in erros):
+                _incrementar("inseridos", e.details.get("nInserted", 0))
+                continue
+            print("❌ Erro ao inserir logs no MongoDB:", e)
+            falhas[collection_name] = entradas
+        except Exception as e:
+            print("❌ Erro ao inserir logs no MongoDB:", e)
+            _desconectado(e)
+            falhas[collection_name] = entradas
+    return falhas
+
+
+def _flush(pendentes: dict):
+    global _ultimo_reprocesso
+    if not pendentes:
+        # Sem entradas novas: tenta esvaziar o spool de tempos em tempos
+        if _spool_pendente() and time.monotonic() - _ultimo_reprocesso >= AUDIT_REPLAY_INTERVAL:
+            _ultimo_reprocesso = time.monotonic()
+            _reprocessar_spool()
+        return
+    inicio = time.perf_counter()
+    falhas = _inserir_lotes(pendentes)
+    if falhas:
+        _incrementar("falhas_flush", 1)
+        _gravar_spool(falhas)
+    elif _spool_pendente():
+        # MongoDB respondeu: aproveita para esvaziar o spool
+        _ultimo_reprocesso = time.monotonic()
+        _reprocessar_spool()
+    duracao = (time.perf_counter() - inicio) * 1000
+    _incrementar("flushes", 1)
+    with _lock_contadores:
+        _contadores["flush_ultimo_ms"] = duracao
+    _incrementar("flush_total_ms", duracao)
+    pendentes.clear()
+
+
+def _loop_escritor():
+    pendentes = {}
+    total = 0
+    limite = time.monotonic() + AUDIT_FLUSH_INTERVAL
+    while True:
+        if not _estado["conectado"] and time.monotonic() - _estado["ultima_tentativa"] >= MONGO_RECONNECT_INTERVAL:
+            try:
+                if conectar():
+                    _reprocessar_spool()
+            except Exception as e:
+                print("❌ Erro no escritor de logs:", e)
+
+        espera = max(limite - time.monotonic(), 0)
+        try:
+            item = _fila.get(timeout=espera)
+        except queue.Empty:
+            item = None
+
+        if isinstance(item, _PedidoFlush):
+            try:
+                _flush(pendentes)
+            except Exception as e:
+                print("❌ Erro no escritor de logs:", e)
+                _incrementar("descartados", total)
+                pendentes.clear()
+            total = 0
+            limite = time.monotonic() + AUDIT_FLUSH_INTERVAL
+            item.concluido.set()
+            continue
+
+        if item is not None:
+            collection_name, entrada = item
+            pendentes.setdefault(collection_name, []).append(entrada)
+            total += 1
+
+        if total >= AUDIT_BATCH_SIZE or time.monotonic() >= limite:
+            try:
+                _flush(pendentes)
+            except Exception as e:
+                # o escritor não pode morrer: perde só este lote
+                print("❌ Erro no escritor de logs:", e)
+                _incrementar("descartados", total)
+                pendentes.clear()
+            total = 0
+            limite = time.monotonic() + AUDIT_FLUSH_INTERVAL
+
+
+def iniciar():
+    """Sobe o escritor (que conecta ao MongoDB em segundo plano) sem bloquear."""
+    _garantir_escritor()
+
+
+def _garantir_escritor():
+    global _escritor
+    if _escritor is not None and _escritor.is_alive():
+        return
+    with _lock_escritor:
+        if _escritor is None or not _escritor.is_alive():
+            _escritor = threading.Thread(target=_loop_escritor, name="audit-writer", daemon=True)
+            _escritor.start()
+
+
+def _normalizar(valor):
+    """Datas puras não são aceitas pelo BSON; grava como texto ISO."""
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, date) and not isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
 
-# Banco de dados para logs
-db_mongo = client["horta_logs"] if client else None
 
 def log_action(collection_name: str, action: str, details: dict, user: str = None):
     """
     Registra uma ação no MongoDB.
 
+    A entrada é apenas colocada numa fila limitada; um escritor em segundo
+    plano agrupa por coleção e grava com insert_many. Se o MongoDB estiver
+    fora, as entradas vão para um arquivo local e são reenviadas depois.
+
     Args:
         collection_name (str): Nome da coleção (ex: "cultivos", "usuarios").
         action (str): Tipo de ação (ex: "create", "update", "delete").
         details (dict): Informações do registro.
-        user (str, opcional): Usuário responsável pela ação.
+        user (str, opcional): Usuário responsável pela ação (padrão: o do token da requisição).
     """
-    if db_mongo is None:
-        print("⚠️ Não é possível logar: banco MongoDB não conectado.")
-        return
-
-    collection = db_mongo[collection_name]
+    inicio = time.perf_counter()
     log_entry = {
         "action": action,
-        "details": details,
+        "details": _normalizar(details),
         "timestamp": datetime.utcnow()
     }
+    user = user or usuario_atual.get()
     if user:
         log_entry["user"] = user
 
+    _garantir_escritor()
+    try:
+        _fila.put_nowait((collection_name, log_entry))
+        _incrementar("enfileirados", 1)
+    except queue.Full:
+        _incrementar("descartados", 1)
+    _incrementar("log_action_chamadas", 1)
+    _incrementar("log_action_total_ms", (time.perf_counter() - inicio) * 1000)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """
+    Força a gravação de tudo que está na fila. Retorna False se o escritor
+    não terminou dentro do timeout.
+    """
+    if _escritor is None and _fila.empty():
+        return True
+    _garantir_escritor()
+    pedido = _PedidoFlush()
     try:
-        collection.insert_one(log_entry)
-        print(f"📌 Log inserido na coleção '{collection_name}': {action}")
-    except Exception as e:
-        print("❌ Erro ao inserir log no MongoDB:", e)
+        _fila.put(pedido, timeout=timeout)
+    except queue.Full:
+        return False
+    return pedido.concluido.wait(timeout)
+
+
+# -----------------------
+# CONSULTAS
+# -----------------------
+class AuditoriaIndisponivel(Exception):
+    """MongoDB fora do ar: não há de onde ler os logs."""
+
+
+def _utc(momento: datetime) -> datetime:
+    """Os logs guardam UTC sem fuso (datetime.utcnow)."""
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento
+
+
+def _filtro(acao=None, usuario=None, inicio=None, fim=None, depois=None) -> dict:
+    filtro = {}
+    if acao:
+        filtro["action"] = acao
+    if usuario:
+        filtro["user"] = usuario
+    if inicio or fim:
+        filtro["timestamp"] = {}
+        if inicio:
+            filtro["timestamp"]["$gte"] = _utc(inicio)
+        if fim:
+            filtro["timestamp"]["$lt"] = _utc(fim)
+    if depois:
+        # keyset em (timestamp, _id) decrescente
+        ts, id_doc = depois
+        filtro = {"$and": [filtro, {"$or": [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": id_doc}}]}]}
+    return filtro
+
+
+def _banco():
+    banco = db_mongo
+    if banco is None:
+        raise AuditoriaIndisponivel(_estado["erro"] or "MongoDB não conectado")
+    return banco
+
+
+def consultar(colecoes, acao=None, usuario=None, inicio=None, fim=None, limite: int = 100, depois=None):
+    """
+    Logs mais recentes primeiro. Os filtros vão para o MongoDB (índices de
+    timestamp, action e user); com várias coleções, cada uma devolve no
+    máximo limite + 1 entradas e o resultado é intercalado aqui.
+
+    Args:
+        colecoes: Coleções (recursos) consultadas.
+        depois (tuple, opcional): (timestamp, _id) da última entrada da página anterior.
+
+    Returns:
+        (entradas, (timestamp, _id) da última entrada ou None se não há mais páginas)
+    """
+    banco = _banco()
+    filtro = _filtro(acao, usuario, inicio, fim, depois)
+    entradas = []
+    for nome in colecoes:
+        for documento in banco[nome].find(filtro, sort=[("timestamp", -1), ("_id", -1)], limit=limite + 1):
+            documento["collection"] = nome
+            entradas.append(documento)
+    entradas.sort(key=lambda d: (d["timestamp"], d["_id"]), reverse=True)
+    if len(entradas) <= limite:
+        return entradas, None
+    entradas = entradas[:limite]
+    return entradas, (entradas[-1]["timestamp"], entradas[-1]["_id"])
+
+
+def acoes_por_dia(colecoes, acao=None, usuario=None, inicio=None, fim=None) -> list[dict]:
+    """Quantidade de ações por dia (UTC), recurso e ação, agregada no MongoDB."""
+    banco = _banco()
+    filtro = _filtro(acao, usuario, inicio, fim)
+    totais = Counter()
+    for nome in colecoes:
+        colecao = banco[nome]
+        if isinstance(colecao, _ColecaoMemoria):
+            for d in colecao.find(filtro):
+                totais[(d["timestamp"].date().isoformat(), nome, d["action"])] += 1
+            continue
+        pipeline = [
+            {"$match": filtro},
+            {"$group": {
+                "_id": {"dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "action": "$action"},
+                "total": {"$sum": 1},
+            }},
+        ]
+        for r in colecao.aggregate(pipeline):
+            totais[(r["_id"]["dia"], nome, r["_id"]["action"])] += r["total"]
+    return [
+        {"dia": dia, "recurso": nome, "action": acao, "total": total}
+        for (dia, nome, acao), total in sorted(totais.items())
+    ]
+
+
+def metricas() -> dict:
+    """Contadores do escritor de auditoria (profundidade da fila, descartes, latência)."""
+    with _lock_contadores:
+        dados = dict(_contadores)
+    dados["profundidade_fila"] = _fila.qsize()
+    return dados
+
+
+atexit.register(flush)
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import json
+from datetime import date
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+# Tamanho máximo de página aceito pelos endpoints de listagem
+LIMITE_MAXIMO = 1000
+
+# Cabeçalho com o cursor da próxima página (ausente na última página)
+CABECALHO_CURSOR = "X-Next-Cursor"
+
+
+def codificar_cursor(valores: tuple) -> str:
+    """Transforma os valores da chave da última linha num cursor opaco."""
+    bruto = json.dumps(list(valores), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_valores(cursor: str) -> list:
+    """Valores crus de um cursor de codificar_cursor (ValueError se inválido)."""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+    except (TypeError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("cursor inválido")
+    if not isinstance(valores, list):
+        raise ValueError("cursor inválido")
+    return valores
+
+
+def decodificar_cursor(cursor: str, chave: list) -> tuple:
+    """
+    Converte o cursor de volta para os valores da chave, respeitando o tipo
+    de cada coluna (ex: datas da PK composta de cultivos).
+    """
+    try:
+        valores = decodificar_valores(cursor)
+        if len(valores) != len(chave):
+            raise ValueError
+        convertidos = []
+        for coluna, valor in zip(chave, valores):
+            if coluna.type.python_type is date:
+                valor = date.fromisoformat(valor)
+            convertidos.append(valor)
+        return tuple(convertidos)
+    except (ValueError, TypeError, binascii.Error, NotImplementedError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def _depois_de(chave: list, valores: tuple):
+    """
+    (a, b, c) > (x, y, z) expandido em OR/AND, que qualquer backend consegue
+    resolver com o índice da chave.
+    """
+    condicoes = []
+    for i, coluna in enumerate(chave):
+        iguais = [chave[j] == valores[j] for j in range(i)]
+        condicoes.append(and_(*iguais, coluna > valores[i]))
+    return or_(*condicoes)
+
+
+def campos_projecao(fields: str | None, permitidos) -> list[str] | None:
+    """Valida o parâmetro fields= contra os campos do schema de saída."""
+    if not fields:
+        return None
+    campos = [c.strip() for c in fields.split(",") if c.strip()]
+    for campo in campos:
+        if campo not in permitidos:
+            raise HTTPException(400, f"Campo inválido: {campo}")
+    return campos
+
+
+def consulta(db: Session, modelo, campos: list[str] | None, chave: list):
+    """
+    Monta a query da listagem: entidade inteira, ou só as colunas pedidas
+    (mais as da chave, necessárias para o cursor).
+    """
+    if not campos:
+        return db.query(modelo)
+    nomes = list(dict.fromkeys(campos + [c.key for c in chave]))
+    return db.query(*[getattr(modelo, nome) for nome in nomes])
+
+
+def paginar(query, chave: list, limit: int | None, cursor: str | None):
+    """
+    Ordena pela chave e aplica a paginação por keyset.
+
+    Returns:
+        (linhas, próximo cursor ou None)
+    """
+    query = query.order_by(*chave)
+    if cursor:
+        query = query.filter(_depois_de(chave, decodificar_cursor(cursor, chave)))
+    if limit is None:
+        return query.all(), None
+
+    linhas = query.limit(limit + 1).all()
+    if len(linhas) <= limit:
+        return linhas, None
+    linhas = linhas[:limit]
+    ultima = linhas[-1]
+    return linhas, codificar_cursor(tuple(getattr(ultima, c.key) for c in chave))
+
+
+def resposta_projetada(linhas, campos: list[str], proximo: str | None, response=None) -> JSONResponse:
+    """
+    Resposta para fields=: só os campos pedidos, sem passar pelo response_model.
+    Os cabeçalhos já colocados em response (ex: ETag) são copiados.
+    """
+    corpo = [{campo: getattr(linha, campo) for campo in campos} for linha in linhas]
+    resposta = JSONResponse(jsonable_encoder(corpo))
+    if response is not None:
+        resposta.headers.update(response.headers)
+    definir_cursor(resposta, proximo)
+    return resposta
+
+
+def definir_cursor(response, proximo: str | None):
+    if proximo:
+        response.headers[CABECALHO_CURSOR] = proximo
@@ -0,0 +1,364 @@
+"""
+Análises de produtividade das colheitas: kg por m² por temporada,
+sazonalidade por produto e série mensal com média móvel.
+
+As colheitas (parcela, produto, ano, mês, kg) são carregadas uma vez em
+arrays do NumPy, com o tamanho das parcelas e o nome dos produtos ao lado,
+e as análises são feitas com operações vetorizadas (bincount, cumsum,
+searchsorted) em vez de laços em Python. A temporada é o ano da colheita.
+O carregamento fica em memória enquanto a versão das TABELAS (versoes.py)
+não muda; qualquer escrita em colheitas, parcelas ou produtos, de qualquer
+worker, faz a próxima consulta recarregar.
+
+    python produtividade.py benchmark --linhas 1000000   # vetorizado x laço linha a linha
+"""
+import random
+import statistics
+import threading
+import time
+from bisect import bisect_right
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import extract, select
+from sqlalchemy.orm import Session
+
+import versoes
+from models import Colheita, Parcela, Produto
+
+# Tabelas cujas escritas mudam as análises (a primeira define o Cache-Control)
+TABELAS = ("colheitas", "parcela", "produto")
+
+# Linhas por fetchmany ao carregar
+LOTE = 50_000
+
+
+class Colheitas:
+    """Colheitas em arrays colunares: a posição i de cada array é a mesma colheita."""
+
+    def __init__(self, id_parcela, id_produto, ano, mes, kg, parcelas: dict, produtos: dict):
+        """
+        Args:
+            id_parcela, id_produto, ano, mes, kg: Arrays com uma posição por colheita.
+            parcelas (dict): id_parcela -> (tamanho, localizacao).
+            produtos (dict): id_produto -> nome.
+        """
+        self.ids_parcelas = np.array(sorted(parcelas), dtype=np.int64)
+        self.tamanhos = np.array([parcelas[i][0] or 0 for i in self.ids_parcelas.tolist()], dtype=np.float64)
+        self.localizacoes = [parcelas[i][1] for i in self.ids_parcelas.tolist()]
+        self.ids_produtos = np.array(sorted(produtos), dtype=np.int64)
+        self.nomes = [produtos[i] for i in self.ids_produtos.tolist()]
+
+        # ids viram posições em ids_parcelas/ids_produtos; colheita de parcela ou produto inexistente fica de fora
+        parcela = _posicoes(self.ids_parcelas, np.asarray(id_parcela, dtype=np.int64))
+        produto = _posicoes(self.ids_produtos, np.asarray(id_produto, dtype=np.int64))
+        validas = (parcela >= 0) & (produto >= 0)
+        self.parcela = parcela[validas].astype(np.int32)
+        self.produto = produto[validas].astype(np.int32)
+        self.ano = np.asarray(ano, dtype=np.int32)[validas]
+        self.mes = np.asarray(mes, dtype=np.int32)[validas]
+        self.kg = np.asarray(kg, dtype=np.float64)[validas]
+        # meses corridos desde o ano 0: ordena e agrupa a série mensal
+        self.periodo = self.ano * 12 + self.mes - 1
+
+    def __len__(self):
+        return len(self.kg)
+
+
+def _posicoes(ids: np.ndarray, valores: np.ndarray) -> np.ndarray:
+    """Posição de cada valor em `ids` (ordenado), -1 se não estiver lá."""
+    if len(ids) == 0:
+        return np.full(len(valores), -1, dtype=np.int64)
+    i = np.searchsorted(ids, valores).clip(max=len(ids) - 1)
+    return np.where(ids[i] == valores, i, -1)
+
+
+def carregar(db: Session) -> Colheitas:
+    """Lê as colheitas completas (com data e kg) e as parcelas e produtos para os arrays."""
+    parcelas = {p.id_parcela: (p.tamanho, p.localizacao) for p in db.query(Parcela)}
+    produtos = dict(db.execute(select(Produto.id_produto, Produto.nome)).all())
+    stmt = select(
+        Colheita.id_parcela, Colheita.id_produto,
+        extract("year", Colheita.data_colheita), extract("month", Colheita.data_colheita),
+        Colheita.quantidade_kg,
+    ).where(
+        Colheita.id_parcela.is_not(None), Colheita.id_produto.is_not(None),
+        Colheita.data_colheita.is_not(None), Colheita.quantidade_kg.is_not(None),
+    )
+    resultado = db.execute(stmt)
+    blocos = []
+    while linhas := resultado.fetchmany(LOTE):
+        blocos.append(np.fromiter(chain.from_iterable(linhas), dtype=np.float64, count=5 * len(linhas)).reshape(-1, 5))
+    colunas = np.concatenate(blocos) if blocos else np.empty((0, 5))
+    return Colheitas(*colunas.T, parcelas, produtos)
+
+
+class CacheColheitas:
+    """Último carregamento das colheitas, refeito quando a versão das TABELAS muda; seguro para várias threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (versão, Colheitas) trocados juntos
+        self._atual = (None, None)
+
+    def obter(self, db: Session) -> Colheitas:
+        # a versão é lida antes dos dados: se uma escrita cair no meio, a próxima consulta recarrega
+        versao = versoes.ler(db, TABELAS)
+        atual = self._atual
+        if atual[0] == versao:
+            return atual[1]
+        with self._lock:
+            if self._atual[0] != versao:
+                self._atual = (versao, carregar(db))
+            return self._atual[1]
+
+    def limpar(self):
+        self._atual = (None, None)
+
+
+cache = CacheColheitas()
+
+
+# -----------------------
+# ANÁLISES
+# -----------------------
+def _filtro(c: Colheitas, ano=None, id_produto=None, id_parcela=None):
+    """Máscara das colheitas que atendem aos filtros (slice(None) sem filtro, para não copiar)."""
+    mascara = None
+    if ano is not None:
+        mascara = c.ano == ano
+    for valor, ids, coluna in ((id_produto, c.ids_produtos, c.produto), (id_parcela, c.ids_parcelas, c.parcela)):
+        if valor is None:
+            continue
+        condicao = coluna == _posicoes(ids, np.array([valor]))[0]
+        mascara = condicao if mascara is None else mascara & condicao
+    return slice(None) if mascara is None else mascara
+
+
+def _distintos(grupo: np.ndarray, ano: np.ndarray, tamanho: int) -> np.ndarray:
+    """Quantos anos diferentes aparecem em cada grupo (posição 0..tamanho-1)."""
+    if len(grupo) == 0:
+        return np.zeros(tamanho, dtype=np.int64)
+    primeiro = ano.min()
+    anos = int(ano.max()) - int(primeiro) + 1
+    # tabela grupo x ano com as contagens; sem ordenar as colheitas
+    presenca = np.bincount(grupo.astype(np.int64) * anos + (ano - primeiro), minlength=tamanho * anos)
+    return np.count_nonzero(presenca.reshape(tamanho, anos), axis=1)
+
+
+def _arredondar(valores: np.ndarray, casas: int = 4) -> list:
+    return [None if np.isnan(v) else v for v in np.round(valores, casas).tolist()]
+
+
+def rendimento_parcelas(
+    c: Colheitas, ano: int | None = None, id_produto: int | None = None, percentil_max: float | None = None
+) -> list[dict]:
+    """
+    Ranking das parcelas por kg/m² por temporada: total colhido / tamanho /
+    temporadas com colheita (com `ano`, uma temporada só). Entram as
+    parcelas com colheita nos filtros e tamanho maior que zero.
+
+    Args:
+        percentil_max (float): Só as parcelas até esse percentil (25 = o quartil de pior rendimento).
+
+    Returns:
+        list[dict]: Da mais para a menos produtiva, com percentil (% das parcelas
+        com rendimento menor ou igual) e posição (empates dividem a posição).
+    """
+    m = _filtro(c, ano, id_produto)
+    parcela = c.parcela[m]
+    n = len(c.ids_parcelas)
+    total = np.bincount(parcela, weights=c.kg[m], minlength=n)
+    colheitas = np.bincount(parcela, minlength=n)
+    temporadas = _distintos(parcela, c.ano[m], n)
+
+    i = np.flatnonzero((colheitas > 0) & (c.tamanhos > 0))
+    if len(i) == 0:
+        return []
+    kg_m2 = total[i] / c.tamanhos[i] / temporadas[i]
+    ate = np.searchsorted(np.sort(kg_m2), kg_m2, side="right")
+    percentil = ate / len(i) * 100
+    posicao = len(i) - ate + 1
+
+    ordem = np.argsort(-kg_m2, kind="stable")
+    if percentil_max is not None:
+        ordem = ordem[percentil[ordem] <= percentil_max]
+    i, kg_m2, percentil, posicao = i[ordem], kg_m2[ordem], percentil[ordem], posicao[ordem]
+    return [
+        {"id_parcela": id_parcela, "localizacao": c.localizacoes[p], "tamanho": tamanho,
+         "total_kg": kg, "colheitas": qtd, "temporadas": temp, "kg_m2": r, "percentil": pct, "posicao": pos}
+        for p, id_parcela, tamanho, kg, qtd, temp, r, pct, pos in zip(
+            i.tolist(), c.ids_parcelas[i].tolist(), c.tamanhos[i].tolist(), _arredondar(total[i]),
+            colheitas[i].tolist(), temporadas[i].tolist(), _arredondar(kg_m2), _arredondar(percentil, 2), posicao.tolist(),
+        )
+    ]
+
+
+def sazonalidade(c: Colheitas, id_produto: int | None = None, id_parcela: int | None = None) -> list[dict]:
+    """
+    Perfil mensal de cada produto: kg médio colhido em cada mês (total do mês
+    / anos em que o produto foi colhido) e o índice sazonal (1 = mês médio,
+    2 = o dobro da média dos 12 meses).
+
+    Returns:
+        list[dict]: Um por produto com colheita, com listas de 12 valores (janeiro a dezembro).
+    """
+    m = _filtro(c, id_produto=id_produto, id_parcela=id_parcela)
+    produto = c.produto[m]
+    n = len(c.ids_produtos)
+    total = np.bincount(produto * 12 + c.mes[m] - 1, weights=c.kg[m], minlength=n * 12).reshape(n, 12)
+    anos = _distintos(produto, c.ano[m], n)
+
+    i = np.flatnonzero(anos)
+    media = total[i] / anos[i, None]
+    # produto com colheitas só de 0 kg: índice indefinido, sai como null
+    with np.errstate(invalid="ignore", divide="ignore"):
+        indice = media / media.mean(axis=1, keepdims=True)
+    pico = media.argmax(axis=1) + 1
+    return [
+        {"id_produto": id_produto, "nome": c.nomes[p], "anos": qtd, "mes_pico": mes,
+         "kg_por_mes": _arredondar(kg), "indice": _arredondar(ind)}
+        for p, id_produto, qtd, mes, kg, ind in zip(
+            i.tolist(), c.ids_produtos[i].tolist(), anos[i].tolist(), pico.tolist(), media, indice,
+        )
+    ]
+
+
+def serie_mensal(
+    c: Colheitas, janela: int = 3, id_produto: int | None = None, id_parcela: int | None = None
+) -> list[dict]:
+    """
+    Total colhido por mês, do primeiro ao último mês com colheita (meses sem
+    colheita entram com 0), e a média móvel dos últimos `janela` meses.
+
+    Returns:
+        list[dict]: ano, mes, total_kg e media_movel (null nos primeiros janela-1 meses).
+    """
+    m = _filtro(c, id_produto=id_produto, id_parcela=id_parcela)
+    periodo = c.periodo[m]
+    if len(periodo) == 0:
+        return []
+    inicio = int(periodo.min())
+    total = np.bincount(periodo - inicio, weights=c.kg[m])
+    acumulado = np.concatenate(([0.0], np.cumsum(total)))
+    movel = np.full(len(total), np.nan)
+    movel[janela - 1:] = (acumulado[janela:] - acumulado[:-janela]) / janela
+    return [
+        {"ano": p // 12, "mes": p % 12 + 1, "total_kg": kg, "media_movel": mm}
+        for p, kg, mm in zip(range(inicio, inicio + len(total)), _arredondar(total), _arredondar(movel))
+    ]
+
+
+# -----------------------
+# BENCHMARK
+# -----------------------
+def _laco_rendimento(linhas, tamanhos):
+    total, anos = {}, {}
+    for parcela, _, ano, _, kg in linhas:
+        total[parcela] = total.get(parcela, 0.0) + kg
+        anos.setdefault(parcela, set()).add(ano)
+    kg_m2 = {p: total[p] / tamanhos[p] / len(anos[p]) for p in total if tamanhos[p] > 0}
+    ordenados = sorted(kg_m2.values())
+    return {p: (r, bisect_right(ordenados, r) / len(ordenados) * 100) for p, r in kg_m2.items()}
+
+
+def _laco_sazonalidade(linhas):
+    meses, anos = {}, {}
+    for _, produto, ano, mes, kg in linhas:
+        meses.setdefault(produto, [0.0] * 12)[mes - 1] += kg
+        anos.setdefault(produto, set()).add(ano)
+    return {p: [kg / len(anos[p]) for kg in totais] for p, totais in meses.items()}
+
+
+def _laco_serie(linhas, janela):
+    total = {}
+    for _, _, ano, mes, kg in linhas:
+        total[ano * 12 + mes - 1] = total.get(ano * 12 + mes - 1, 0.0) + kg
+    valores = [total.get(p, 0.0) for p in range(min(total), max(total) + 1)]
+    return [sum(valores[i - janela + 1:i + 1]) / janela if i >= janela - 1 else None for i in range(len(valores))]
+
+
+def sinteticas(linhas: int, parcelas: int = 500, produtos: int = 40, semente: int = 42) -> Colheitas:
+    """Colheitas aleatórias em memória (dez temporadas, com um pico sazonal por produto)."""
+    rng = np.random.default_rng(semente)
+    produto = rng.integers(1, produtos + 1, linhas)
+    # cada produto tem um mês de pico; a colheita cai perto dele
+    mes = (rng.integers(0, 12, produtos + 1)[produto] + rng.normal(0, 1.5, linhas).round().astype(int)) % 12 + 1
+    return Colheitas(
+        rng.integers(1, parcelas + 1, linhas), produto, rng.integers(2015, 2025, linhas), mes,
+        rng.gamma(2.0, 5.0, linhas).round(2),
+        {p: (float(rng.uniform(5, 200)), f"Setor {p}") for p in range(1, parcelas + 1)},
+        {p: f"Produto {p}" for p in range(1, produtos + 1)},
+    )
+
+
+def _medir(funcao, repeticoes: int) -> tuple[float, object]:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), resultado
+
+
+def benchmark(linhas: int, repeticoes: int = 3, janela: int = 3, semente: int = 42) -> dict:
+    """
+    Mede cada análise vetorizada e o laço linha a linha equivalente sobre as
+    mesmas colheitas sintéticas, conferindo se os resultados batem.
+
+    Returns:
+        dict: Por análise, mediana (ms) dos dois modos e se os resultados conferem.
+    """
+    c = sinteticas(linhas, semente=semente)
+    # o laço recebe ids e tamanhos já em listas do Python, como viriam do banco linha a linha
+    dados = list(zip(
+        c.ids_parcelas[c.parcela].tolist(), c.ids_produtos[c.produto].tolist(), c.ano.tolist(), c.mes.tolist(), c.kg.tolist(),
+    ))
+    tamanhos = dict(zip(c.ids_parcelas.tolist(), c.tamanhos.tolist()))
+    rng = random.Random(semente)
+    id_parcela = rng.choice(c.ids_parcelas.tolist())
+
+    def confere(a, b):
+        return all(x is None and y is None or abs(x - y) <= 5e-3 + 1e-6 * abs(y) for x, y in zip(a, b))
+
+    casos = {
+        "rendimento": (
+            lambda: rendimento_parcelas(c), lambda: _laco_rendimento(dados, tamanhos),
+            lambda v, l: len(v) == len(l) and all(confere(
+                (r["kg_m2"], r["percentil"]), l[r["id_parcela"]]) for r in v),
+        ),
+        "sazonalidade": (
+            lambda: sazonalidade(c), lambda: _laco_sazonalidade(dados),
+            lambda v, l: len(v) == len(l) and all(confere(r["kg_por_mes"], l[r["id_produto"]]) for r in v),
+        ),
+        "serie_mensal": (
+            lambda: serie_mensal(c, janela, id_parcela=id_parcela),
+            lambda: _laco_serie([d for d in dados if d[0] == id_parcela], janela),
+            lambda v, l: len(v) == len(l) and confere([r["media_movel"] for r in v], l),
+        ),
+    }
+    resultado = {}
+    for nome, (vetorizado, laco, iguais) in casos.items():
+        tempo_v, r_v = _medir(vetorizado, repeticoes)
+        tempo_l, r_l = _medir(laco, repeticoes)
+        resultado[nome] = {"vetorizado_ms": round(tempo_v, 2), "laco_ms": round(tempo_l, 2), "confere": iguais(r_v, r_l)}
+    return resultado
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Análises de produtividade das colheitas")
+    parser.add_argument("comando", choices=["benchmark"])
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="colheitas sintéticas")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    r = benchmark(args.linhas, args.repeticoes)
+    for nome, tempos in r.items():
+        marca = "✅" if tempos["confere"] else "❌"
+        print(
+            f"{marca} {nome:>12}: vetorizado {tempos['vetorizado_ms']:>9.2f} ms  laço {tempos['laco_ms']:>9.2f} ms"
+            f"  ({tempos['laco_ms'] / max(tempos['vetorizado_ms'], 1e-9):.0f}x)"
+        )
+    raise SystemExit(0 if all(t["confere"] for t in r.values()) else 1)
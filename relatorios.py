@@ -0,0 +1,600 @@
+"""
+Relatórios pesados gerados em segundo plano, sem broker externo.
+
+POST /relatorios/jobs grava o pedido na tabela relatorio_jobs (pendente) e
+acorda o despachante: uma thread do processo da API que passa os pendentes
+para um pool de JOBS_WORKERS processos. Cada job é reivindicado com um
+UPDATE condicional que grava um id novo de execução, então com vários
+workers do uvicorn (ou um worker avulso) ele roda uma vez só: batimento e
+resultado só valem com esse id, e um processo atrasado cujo job foi
+devolvido e reivindicado de novo não grava mais nada. O processo que gera o relatório grava um CSV em
+RELATORIOS_DIR e renova atualizado_em a cada JOBS_BATIMENTO segundos; job
+executando sem batimento há JOBS_ABANDONO segundos (API reiniciada, processo
+morto) volta para a fila, até JOBS_TENTATIVAS vezes.
+
+Cada job é de quem o pediu (só ele e os admins o consultam). Pedido igual
+a um pendente ou executando do mesmo usuário devolve esse job; igual a um
+concluído, com as tabelas ainda na mesma versão, devolve o arquivo pronto.
+Cancelar só marca o job: o processo percebe no próximo batimento e para.
+
+    python relatorios.py gerar parcelas --ano 2024 --saida parcelas.csv  # na hora, sem fila
+    python relatorios.py worker --processos 2   # executa a fila fora da API (JOBS_WORKERS=0 na API)
+"""
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from functools import partial
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import versoes
+from database_mysql import SessionLocal
+from models import Colheita, Cultivo, JobRelatorio, Parcela, Produto, ResumoColheita
+
+load_dotenv()
+
+# Processos que geram relatórios neste worker da API (0 = só enfileira)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+# Pendentes aceitos no total e jobs ativos por usuário
+JOBS_FILA_MAX = int(os.getenv("JOBS_FILA_MAX", "50"))
+JOBS_POR_SOLICITANTE = int(os.getenv("JOBS_POR_SOLICITANTE", "3"))
+# Duração máxima de um job, intervalo do batimento e silêncio que conta como abandono (segundos)
+JOBS_TIMEOUT = float(os.getenv("JOBS_TIMEOUT", "900"))
+JOBS_BATIMENTO = float(os.getenv("JOBS_BATIMENTO", "5"))
+JOBS_ABANDONO = float(os.getenv("JOBS_ABANDONO", "60"))
+JOBS_TENTATIVAS = int(os.getenv("JOBS_TENTATIVAS", "3"))
+# Por quanto tempo jobs terminados e seus arquivos são mantidos
+JOBS_RETENCAO_HORAS = float(os.getenv("JOBS_RETENCAO_HORAS", "168"))
+RELATORIOS_DIR = os.getenv("RELATORIOS_DIR", "relatorios_gerados")
+
+# Tabelas lidas pelos relatórios: a versão delas decide se um arquivo pronto ainda vale
+TABELAS = ("colheitas", "cultivos", "parcela", "produto")
+ATIVOS = ("pendente", "executando")
+
+# Com o despachante parado a fila ainda é conferida a cada INTERVALO segundos
+INTERVALO = 2.0
+LIMPEZA_SEGUNDOS = 600
+
+MESES = ("jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez")
+
+
+class FilaCheiaError(Exception):
+    """Já há JOBS_FILA_MAX jobs pendentes."""
+
+
+class LimiteJobsError(Exception):
+    """O solicitante já tem JOBS_POR_SOLICITANTE jobs ativos."""
+
+
+class _Interrompido(Exception):
+    """O job foi cancelado, devolvido à fila ou estourou JOBS_TIMEOUT no meio da geração."""
+
+
+def _agora() -> datetime:
+    return datetime.utcnow()
+
+
+# -----------------------
+# RELATÓRIOS
+# -----------------------
+def _periodo(ano: int):
+    return date(ano, 1, 1), date(ano, 12, 31)
+
+
+def relatorio_parcelas(db: Session, ano: int):
+    """Por parcela e produto: cultivos plantados, colheitas, kg e kg/m² no ano."""
+    inicio, fim = _periodo(ano)
+    colheitas = {
+        (r.id_parcela, r.id_produto): r
+        for r in db.execute(
+            select(
+                Colheita.id_parcela, Colheita.id_produto,
+                func.count().label("colheitas"),
+                func.sum(Colheita.quantidade_kg).label("total_kg"),
+                func.min(Colheita.data_colheita).label("primeira"),
+                func.max(Colheita.data_colheita).label("ultima"),
+            )
+            .where(Colheita.data_colheita.between(inicio, fim))
+            .group_by(Colheita.id_parcela, Colheita.id_produto)
+        )
+    }
+    cultivos = dict(
+        ((p, pr), n) for p, pr, n in db.execute(
+            select(Cultivo.id_parcela, Cultivo.id_produto, func.count())
+            .where(Cultivo.data_plantio.between(inicio, fim))
+            .group_by(Cultivo.id_parcela, Cultivo.id_produto)
+        )
+    )
+    parcelas = {p.id_parcela: p for p in db.query(Parcela)}
+    produtos = {p.id_produto: p for p in db.query(Produto)}
+
+    yield ["id_parcela", "localizacao", "tamanho_m2", "id_produto", "produto", "tipo",
+           "cultivos", "colheitas", "total_kg", "kg_por_m2", "primeira_colheita", "ultima_colheita"]
+    for id_parcela, id_produto in sorted(colheitas.keys() | cultivos.keys(), key=lambda k: (k[0] or 0, k[1] or 0)):
+        parcela, produto = parcelas.get(id_parcela), produtos.get(id_produto)
+        c = colheitas.get((id_parcela, id_produto))
+        total = float(c.total_kg or 0) if c else 0.0
+        tamanho = parcela.tamanho if parcela else None
+        yield [
+            id_parcela, parcela.localizacao if parcela else "", tamanho,
+            id_produto, produto.nome if produto else "", produto.tipo if produto else "",
+            cultivos.get((id_parcela, id_produto), 0), c.colheitas if c else 0, round(total, 3),
+            round(total / tamanho, 3) if tamanho else "",
+            c.primeira if c else "", c.ultima if c else "",
+        ]
+
+
+def relatorio_produtos(db: Session, ano: int):
+    """Por produto: kg de cada mês do ano (do agregado mensal), total e parcelas que colheram."""
+    por_produto = {}
+    for id_produto, mes, total in db.execute(
+        select(ResumoColheita.id_produto, ResumoColheita.mes, func.sum(ResumoColheita.total_kg))
+        .where(ResumoColheita.ano == ano)
+        .group_by(ResumoColheita.id_produto, ResumoColheita.mes)
+    ):
+        por_produto.setdefault(id_produto, {})[mes] = float(total or 0)
+    distintas = dict(db.execute(
+        select(ResumoColheita.id_produto, func.count(func.distinct(ResumoColheita.id_parcela)))
+        .where(ResumoColheita.ano == ano)
+        .group_by(ResumoColheita.id_produto)
+    ).all())
+    produtos = {p.id_produto: p for p in db.query(Produto)}
+
+    yield ["id_produto", "produto", "tipo", "parcelas", "total_kg", *MESES]
+    for id_produto in sorted(por_produto):
+        meses = por_produto[id_produto]
+        produto = produtos.get(id_produto)
+        yield [
+            id_produto, produto.nome if produto else "", produto.tipo if produto else "",
+            distintas.get(id_produto, 0), round(sum(meses.values()), 3),
+            *(round(meses.get(m, 0), 3) for m in range(1, 13)),
+        ]
+
+
+# tipo -> função(db, **parametros) que gera as linhas do CSV (a primeira é o cabeçalho)
+RELATORIOS = {
+    "parcelas": relatorio_parcelas,
+    "produtos": relatorio_produtos,
+}
+
+
+def gerar(db: Session, tipo: str, parametros: dict, arquivo, continuar=lambda: True) -> int:
+    """
+    Escreve o relatório em CSV no arquivo aberto.
+
+    Returns:
+        int: Linhas de dados escritas (sem o cabeçalho).
+    """
+    writer = csv.writer(arquivo)
+    linhas = -1
+    for linha in RELATORIOS[tipo](db, **parametros):
+        if not continuar():
+            raise _Interrompido()
+        writer.writerow(linha)
+        linhas += 1
+    return linhas
+
+
+# -----------------------
+# EXECUÇÃO (no processo do pool)
+# -----------------------
+class _Batimento(threading.Thread):
+    """Renova atualizado_em do job e avisa quando ele foi cancelado, perdido ou estourou o tempo."""
+
+    def __init__(self, id_job: str, execucao: str):
+        super().__init__(daemon=True)
+        self.id_job = id_job
+        self.execucao = execucao
+        self.limite = time.monotonic() + JOBS_TIMEOUT
+        self.motivo = None  # "tempo" ou "perdido" (cancelado ou devolvido à fila)
+        self._fim = threading.Event()
+
+    def run(self):
+        while not self._fim.wait(JOBS_BATIMENTO):
+            if time.monotonic() > self.limite:
+                self.motivo = "tempo"
+                return
+            db = SessionLocal()
+            try:
+                vivo = db.execute(
+                    update(JobRelatorio)
+                    .where(JobRelatorio.id == self.id_job, JobRelatorio.execucao == self.execucao,
+                           JobRelatorio.status == "executando")
+                    .values(atualizado_em=_agora())
+                ).rowcount
+                db.commit()
+            except Exception as e:
+                print("⚠️ Batimento do job", self.id_job, e)
+                continue
+            finally:
+                db.close()
+            if not vivo:
+                self.motivo = "perdido"
+                return
+
+    def encerrar(self):
+        self._fim.set()
+
+
+def _finalizar(db: Session, id_job: str, execucao: str, **valores) -> bool:
+    """Grava o resultado se o job ainda é desta execução (não foi cancelado nem devolvido)."""
+    gravou = db.execute(
+        update(JobRelatorio)
+        .where(JobRelatorio.id == id_job, JobRelatorio.execucao == execucao, JobRelatorio.status == "executando")
+        .values(ativo=None, concluido_em=_agora(), **valores)
+    ).rowcount
+    db.commit()
+    return bool(gravou)
+
+
+def executar(id_job: str, execucao: str):
+    """Gera o relatório de um job já reivindicado com o id de execução `execucao`."""
+    db = SessionLocal()
+    batimento = _Batimento(id_job, execucao)
+    # arquivo por execução: a atrasada não sobrescreve o CSV da que ficou com o job
+    arquivo = f"{id_job}_{execucao}.csv"
+    caminho = os.path.join(RELATORIOS_DIR, arquivo)
+    temporario = caminho + ".tmp"
+    try:
+        job = db.get(JobRelatorio, id_job)
+        if job is None or job.status != "executando" or job.execucao != execucao:
+            return
+        parametros = json.loads(job.parametros)
+        db.commit()
+        batimento.start()
+        os.makedirs(RELATORIOS_DIR, exist_ok=True)
+        with open(temporario, "w", newline="", encoding="utf-8") as f:
+            linhas = gerar(db, job.tipo, parametros, f, lambda: batimento.motivo is None)
+        os.replace(temporario, caminho)
+        if not _finalizar(db, id_job, execucao, status="concluido", arquivo=arquivo, linhas=linhas,
+                          tamanho=os.path.getsize(caminho)):
+            os.remove(caminho)
+    except _Interrompido:
+        if batimento.motivo == "tempo":
+            _finalizar(db, id_job, execucao, status="erro", erro=f"Tempo limite de {JOBS_TIMEOUT:g} s excedido")
+    except Exception as e:
+        db.rollback()
+        _finalizar(db, id_job, execucao, status="erro", erro=str(e)[:1000])
+    finally:
+        batimento.encerrar()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        db.close()
+
+
+# -----------------------
+# FILA (no processo da API)
+# -----------------------
+def _devolver(db: Session, *condicoes, contar: bool = True) -> int:
+    """
+    Jobs executando que perderam o processo voltam para pendente; os que já
+    usaram JOBS_TENTATIVAS viram erro. contar=False desfaz a tentativa
+    (encerramento normal da API).
+    """
+    base = update(JobRelatorio).where(JobRelatorio.status == "executando", *condicoes)
+    tentativas = JobRelatorio.tentativas if contar else JobRelatorio.tentativas - 1
+    db.execute(
+        base.where(tentativas >= JOBS_TENTATIVAS)
+        .values(status="erro", ativo=None, concluido_em=_agora(), erro="Processo interrompido várias vezes")
+    )
+    devolvidos = db.execute(
+        base.values(status="pendente", execucao=None, iniciado_em=None, atualizado_em=None, tentativas=tentativas)
+    ).rowcount
+    db.commit()
+    return devolvidos
+
+
+def reivindicar(db: Session, id_job: str) -> str | None:
+    """
+    Passa o job de pendente para executando com um id de execução novo.
+
+    Returns:
+        str | None: O id da execução, ou None se outro processo pegou o job antes.
+    """
+    agora, execucao = _agora(), str(uuid.uuid4())
+    # outro processo pode ter pego o mesmo job: só um UPDATE acerta
+    reivindicado = db.execute(
+        update(JobRelatorio)
+        .where(JobRelatorio.id == id_job, JobRelatorio.status == "pendente")
+        .values(status="executando", execucao=execucao, iniciado_em=agora, atualizado_em=agora,
+                tentativas=JobRelatorio.tentativas + 1)
+    ).rowcount
+    db.commit()
+    return execucao if reivindicado else None
+
+
+class Despachante:
+    """Passa os jobs pendentes para o pool de processos; um por processo da API."""
+
+    def __init__(self, workers: int = JOBS_WORKERS, sessao=SessionLocal):
+        self.workers = workers
+        self._sessao = sessao
+        self._pool = None
+        self._thread = None
+        self._acordar = threading.Event()
+        self._parar = False
+        self._lock = threading.Lock()
+        self._em_execucao = {}  # id_job -> Future
+        self._proxima_limpeza = 0.0
+
+    def _novo_pool(self):
+        # spawn: o processo da API tem threads, fork não é seguro aqui
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def iniciar(self):
+        if self.workers <= 0 or self._thread is not None:
+            return
+        os.makedirs(RELATORIOS_DIR, exist_ok=True)
+        self._parar = False
+        self._pool = self._novo_pool()
+        self._thread = threading.Thread(target=self._laco, name="despachante-relatorios", daemon=True)
+        self._thread.start()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def encerrar(self):
+        """Para de despachar e devolve à fila os jobs em andamento (os processos param no próximo batimento)."""
+        if self._thread is None:
+            return
+        self._parar = True
+        self._acordar.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            ids = list(self._em_execucao)
+        if ids:
+            db = self._sessao()
+            try:
+                _devolver(db, JobRelatorio.id.in_(ids), contar=False)
+            except Exception as e:
+                print("⚠️ Jobs de relatório não devolvidos à fila:", e)
+            finally:
+                db.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {"em_execucao": len(self._em_execucao), "workers": self.workers}
+
+    def _laco(self):
+        while not self._parar:
+            self._acordar.clear()
+            try:
+                self._recuperar()
+                self._despachar()
+                if time.monotonic() >= self._proxima_limpeza:
+                    self._proxima_limpeza = time.monotonic() + LIMPEZA_SEGUNDOS
+                    limpar(self._sessao)
+            except Exception as e:
+                print("⚠️ Despachante de relatórios:", e)
+            self._acordar.wait(INTERVALO)
+
+    def _recuperar(self):
+        db = self._sessao()
+        try:
+            if _devolver(db, JobRelatorio.atualizado_em < _agora() - timedelta(seconds=JOBS_ABANDONO)):
+                self._acordar.set()
+        finally:
+            db.close()
+
+    def _despachar(self):
+        with self._lock:
+            livres = self.workers - len(self._em_execucao)
+        if livres <= 0:
+            return
+        db = self._sessao()
+        try:
+            candidatos = db.scalars(
+                select(JobRelatorio.id).where(JobRelatorio.status == "pendente")
+                .order_by(JobRelatorio.criado_em).limit(livres * 2)
+            ).all()
+            for id_job in candidatos:
+                if livres == 0 or self._parar:
+                    break
+                execucao = reivindicar(db, id_job)
+                if execucao is None:
+                    continue
+                with self._lock:
+                    pool = self._pool
+                    futuro = pool.submit(executar, id_job, execucao)
+                    self._em_execucao[id_job] = futuro
+                futuro.add_done_callback(partial(self._terminou, id_job, pool))
+                livres -= 1
+        finally:
+            db.close()
+
+    def _terminou(self, id_job: str, pool, futuro):
+        with self._lock:
+            self._em_execucao.pop(id_job, None)
+        erro = None if futuro.cancelled() else futuro.exception()
+        if erro is not None:
+            # o processo morreu (ou o pool quebrou): o job volta para a fila
+            print("⚠️ Job de relatório interrompido:", id_job, erro)
+            db = self._sessao()
+            try:
+                _devolver(db, JobRelatorio.id == id_job)
+            except Exception as e:
+                print("⚠️ Job de relatório não devolvido à fila:", e)
+            finally:
+                db.close()
+            if isinstance(erro, BrokenProcessPool) and not self._parar:
+                # todos os jobs do pool quebrado caem aqui: só o primeiro troca o pool
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = self._novo_pool()
+                        pool.shutdown(wait=False)
+        self._acordar.set()
+
+
+despachante = Despachante()
+
+
+def limpar(sessao=SessionLocal) -> int:
+    """Apaga os jobs terminados há mais de JOBS_RETENCAO_HORAS e os arquivos deles."""
+    limite = _agora() - timedelta(hours=JOBS_RETENCAO_HORAS)
+    db = sessao()
+    try:
+        antigos = db.execute(
+            select(JobRelatorio.id, JobRelatorio.arquivo)
+            .where(JobRelatorio.status.not_in(ATIVOS), JobRelatorio.concluido_em < limite)
+        ).all()
+        for _, arquivo in antigos:
+            if arquivo and os.path.exists(os.path.join(RELATORIOS_DIR, arquivo)):
+                os.remove(os.path.join(RELATORIOS_DIR, arquivo))
+        if antigos:
+            db.execute(delete(JobRelatorio).where(JobRelatorio.id.in_([i for i, _ in antigos])))
+            db.commit()
+        return len(antigos)
+    finally:
+        db.close()
+
+
+# -----------------------
+# API
+# -----------------------
+def caminho(job: JobRelatorio) -> str | None:
+    """Arquivo gerado pelo job, se ele está concluído e o arquivo ainda existe."""
+    if job.status != "concluido" or not job.arquivo:
+        return None
+    arquivo = os.path.join(RELATORIOS_DIR, job.arquivo)
+    return arquivo if os.path.exists(arquivo) else None
+
+
+def enfileirar(db: Session, tipo: str, parametros: dict, solicitante: str) -> tuple[JobRelatorio, bool]:
+    """
+    Cria o job, ou devolve um igual do mesmo solicitante que ainda serve
+    (ativo, ou concluído com as tabelas na mesma versão).
+
+    Returns:
+        tuple[JobRelatorio, bool]: O job e se ele foi criado agora.
+
+    Raises:
+        FilaCheiaError: Já há JOBS_FILA_MAX pendentes.
+        LimiteJobsError: O solicitante já tem JOBS_POR_SOLICITANTE jobs ativos.
+    """
+    texto = json.dumps(parametros, sort_keys=True, default=str)
+    chave = hashlib.sha256(f"{solicitante}:{tipo}:{texto}".encode()).hexdigest()
+    existente = db.scalar(select(JobRelatorio).where(JobRelatorio.ativo == chave))
+    if existente is not None:
+        return existente, False
+    versao = versoes.ler(db, TABELAS)
+    pronto = db.scalar(
+        select(JobRelatorio)
+        .where(JobRelatorio.chave == chave, JobRelatorio.status == "concluido", JobRelatorio.versao == versao)
+        .order_by(JobRelatorio.concluido_em.desc()).limit(1)
+    )
+    if pronto is not None and caminho(pronto):
+        return pronto, False
+
+    pendentes = db.scalar(select(func.count()).where(JobRelatorio.status == "pendente"))
+    if pendentes >= JOBS_FILA_MAX:
+        raise FilaCheiaError()
+    if db.scalar(
+        select(func.count()).where(JobRelatorio.solicitante == solicitante, JobRelatorio.status.in_(ATIVOS))
+    ) >= JOBS_POR_SOLICITANTE:
+        raise LimiteJobsError()
+
+    job = JobRelatorio(
+        id=str(uuid.uuid4()), tipo=tipo, parametros=texto, chave=chave, ativo=chave, versao=versao,
+        status="pendente", solicitante=solicitante, tentativas=0, criado_em=_agora(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # outro pedido igual entrou entre a consulta e o INSERT
+        db.rollback()
+        existente = db.scalar(select(JobRelatorio).where(JobRelatorio.ativo == chave))
+        if existente is None:
+            raise
+        return existente, False
+    despachante.acordar()
+    return job, True
+
+
+def cancelar(db: Session, id_job: str) -> JobRelatorio | None:
+    """Cancela o job se ainda está ativo; devolve o job (None se não existe)."""
+    job = db.get(JobRelatorio, id_job)
+    if job is None:
+        return None
+    if job.status in ATIVOS:
+        db.execute(
+            update(JobRelatorio)
+            .where(JobRelatorio.id == id_job, JobRelatorio.status.in_(ATIVOS))
+            .values(status="cancelado", ativo=None, concluido_em=_agora())
+        )
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+def descrever(db: Session, job: JobRelatorio) -> dict:
+    """Situação do job para a API (posição na fila quando pendente)."""
+    saida = {
+        "id": job.id,
+        "tipo": job.tipo,
+        "parametros": json.loads(job.parametros),
+        "status": job.status,
+        "criado_em": job.criado_em,
+        "iniciado_em": job.iniciado_em,
+        "concluido_em": job.concluido_em,
+        "linhas": job.linhas,
+        "tamanho": job.tamanho,
+        "erro": job.erro,
+        "posicao": None,
+        "arquivo": f"/relatorios/jobs/{job.id}/arquivo" if job.status == "concluido" else None,
+    }
+    if job.status == "pendente":
+        saida["posicao"] = db.scalar(
+            select(func.count()).where(JobRelatorio.status == "pendente", JobRelatorio.criado_em < job.criado_em)
+        ) + 1
+    return saida
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Relatórios pesados")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_gerar = sub.add_parser("gerar", help="gera um relatório na hora, sem passar pela fila")
+    p_gerar.add_argument("tipo", choices=sorted(RELATORIOS))
+    p_gerar.add_argument("--ano", type=int, required=True)
+    p_gerar.add_argument("--saida", required=True)
+    p_worker = sub.add_parser("worker", help="executa os jobs da fila até Ctrl+C")
+    p_worker.add_argument("--processos", type=int, default=max(JOBS_WORKERS, 1))
+    sub.add_parser("limpar", help="apaga jobs terminados há mais de JOBS_RETENCAO_HORAS")
+    args = parser.parse_args()
+
+    if args.comando == "gerar":
+        db = SessionLocal()
+        try:
+            inicio = time.perf_counter()
+            with open(args.saida, "w", newline="", encoding="utf-8") as f:
+                linhas = gerar(db, args.tipo, {"ano": args.ano}, f)
+            print(f"✅ {linhas} linhas em {args.saida} ({time.perf_counter() - inicio:.2f} s)")
+        finally:
+            db.close()
+    elif args.comando == "worker":
+        worker = Despachante(args.processos)
+        worker.iniciar()
+        print(f"✅ Executando jobs de relatório com {args.processos} processo(s); Ctrl+C para parar")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            worker.encerrar()
+    else:
+        print(f"✅ {limpar()} job(s) apagado(s)")
@@ -0,0 +1,247 @@
+"""
+Agregado mensal de colheitas por (produto, parcela, ano, mês).
+
+Os handlers de colheita chamam somar_colheita/somar_lote/subtrair_colheita na mesma
+transação do INSERT/UPDATE/DELETE. Para recalcular tudo ou conferir o
+agregado contra um GROUP BY completo:
+
+    python resumos.py reconstruir
+    python resumos.py verificar
+"""
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Colheita, ResumoColheita
+
+# Diferença aceita entre o total incremental e o recalculado (soma de floats)
+TOLERANCIA_KG = 1e-6
+
+AGRUPAMENTOS = {
+    "produto": [ResumoColheita.id_produto],
+    "parcela": [ResumoColheita.id_parcela],
+    "ano": [ResumoColheita.ano],
+    "mes": [ResumoColheita.ano, ResumoColheita.mes],
+}
+
+
+def _chave(id_produto: int, id_parcela: int, data: date) -> dict:
+    return {"id_produto": id_produto, "id_parcela": id_parcela, "ano": data.year, "mes": data.month}
+
+
+def _filtro_chave(chave: dict):
+    return [getattr(ResumoColheita, k) == v for k, v in chave.items()]
+
+
+def somar_colheita(db: Session, id_produto: int, id_parcela: int, data: date | None, kg: float | None):
+    """Acrescenta uma colheita ao agregado com um único upsert."""
+    somar_lote(db, [(id_produto, id_parcela, data, kg)])
+
+
+def somar_lote(db: Session, colheitas: list[tuple]):
+    """
+    Acrescenta várias colheitas (id_produto, id_parcela, data, kg) ao
+    agregado: junta primeiro por mês e grava tudo num único upsert.
+    """
+    por_chave = {}
+    for id_produto, id_parcela, data, kg in colheitas:
+        if data is None or kg is None:
+            continue
+        chave = (id_produto, id_parcela, data.year, data.month)
+        atual = por_chave.get(chave)
+        if atual is None:
+            por_chave[chave] = [kg, 1, kg, kg]
+        else:
+            atual[0] += kg
+            atual[1] += 1
+            atual[2] = min(atual[2], kg)
+            atual[3] = max(atual[3], kg)
+    if not por_chave:
+        return
+    valores = [
+        {"id_produto": p, "id_parcela": pa, "ano": a, "mes": m,
+         "total_kg": t, "quantidade": q, "min_kg": mn, "max_kg": mx}
+        for (p, pa, a, m), (t, q, mn, mx) in por_chave.items()
+    ]
+    if db.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(ResumoColheita).values(valores)
+        stmt = stmt.on_duplicate_key_update(
+            total_kg=ResumoColheita.total_kg + stmt.inserted.total_kg,
+            quantidade=ResumoColheita.quantidade + stmt.inserted.quantidade,
+            min_kg=func.least(ResumoColheita.min_kg, stmt.inserted.min_kg),
+            max_kg=func.greatest(ResumoColheita.max_kg, stmt.inserted.max_kg),
+        )
+    else:
+        stmt = sqlite.insert(ResumoColheita).values(valores)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id_produto", "id_parcela", "ano", "mes"],
+            set_={
+                "total_kg": ResumoColheita.total_kg + stmt.excluded.total_kg,
+                "quantidade": ResumoColheita.quantidade + stmt.excluded.quantidade,
+                "min_kg": func.min(ResumoColheita.min_kg, stmt.excluded.min_kg),
+                "max_kg": func.max(ResumoColheita.max_kg, stmt.excluded.max_kg),
+            },
+        )
+    db.execute(stmt)
+
+
+def subtrair_colheita(db: Session, id_produto: int, id_parcela: int, data: date | None, kg: float | None):
+    """
+    Retira uma colheita do agregado. Deve ser chamada depois do flush da
+    remoção/alteração, pois mínimo e máximo não têm delta: quando o valor
+    retirado era um dos extremos, eles são recalculados a partir das
+    colheitas restantes daquele mês.
+    """
+    if data is None or kg is None:
+        return
+    chave = _chave(id_produto, id_parcela, data)
+    resumo = db.query(ResumoColheita).filter(*_filtro_chave(chave)).with_for_update().first()
+    if not resumo:
+        return
+    if resumo.quantidade <= 1:
+        db.delete(resumo)
+        db.flush()
+        return
+    resumo.total_kg -= kg
+    resumo.quantidade -= 1
+    if kg <= resumo.min_kg or kg >= resumo.max_kg:
+        inicio = date(data.year, data.month, 1)
+        fim = date(data.year + 1, 1, 1) if data.month == 12 else date(data.year, data.month + 1, 1)
+        resumo.min_kg, resumo.max_kg = db.execute(
+            select(func.min(Colheita.quantidade_kg), func.max(Colheita.quantidade_kg)).where(
+                Colheita.id_produto == id_produto,
+                Colheita.id_parcela == id_parcela,
+                Colheita.data_colheita >= inicio,
+                Colheita.data_colheita < fim,
+            )
+        ).one()
+    # grava já: um somar_colheita em seguida (upsert direto no banco) não pode ser sobrescrito
+    db.flush()
+
+
+async def somar_colheita_async(db: AsyncSession, *colheita):
+    await db.run_sync(somar_colheita, *colheita)
+
+
+async def somar_lote_async(db: AsyncSession, colheitas: list[tuple]):
+    await db.run_sync(somar_lote, colheitas)
+
+
+async def subtrair_colheita_async(db: AsyncSession, *colheita):
+    await db.run_sync(subtrair_colheita, *colheita)
+
+
+def _agrupado_das_colheitas():
+    """GROUP BY completo sobre colheitas, no mesmo formato do agregado."""
+    ano = func.extract("year", Colheita.data_colheita)
+    mes = func.extract("month", Colheita.data_colheita)
+    return (
+        select(
+            Colheita.id_produto, Colheita.id_parcela, ano.label("ano"), mes.label("mes"),
+            func.sum(Colheita.quantidade_kg).label("total_kg"),
+            func.count().label("quantidade"),
+            func.min(Colheita.quantidade_kg).label("min_kg"),
+            func.max(Colheita.quantidade_kg).label("max_kg"),
+        )
+        .where(Colheita.data_colheita.is_not(None), Colheita.quantidade_kg.is_not(None))
+        .group_by(Colheita.id_produto, Colheita.id_parcela, ano, mes)
+    )
+
+
+def reconstruir(db: Session):
+    """Apaga o agregado e o recalcula do zero com um INSERT ... SELECT."""
+    db.execute(delete(ResumoColheita))
+    colunas = ["id_produto", "id_parcela", "ano", "mes", "total_kg", "quantidade", "min_kg", "max_kg"]
+    db.execute(insert(ResumoColheita).from_select(colunas, _agrupado_das_colheitas()))
+    db.commit()
+
+
+def verificar(db: Session) -> list[dict]:
+    """
+    Compara o agregado com um GROUP BY completo.
+
+    Returns:
+        list[dict]: Uma entrada por chave divergente (vazia se consistente).
+    """
+    esperado = {
+        (r.id_produto, r.id_parcela, int(r.ano), int(r.mes)): r
+        for r in db.execute(_agrupado_das_colheitas())
+    }
+    atual = {
+        (r.id_produto, r.id_parcela, r.ano, r.mes): r
+        for r in db.query(ResumoColheita)
+    }
+    divergencias = []
+    for chave in esperado.keys() | atual.keys():
+        e, a = esperado.get(chave), atual.get(chave)
+        if e is not None and a is not None and (
+            e.quantidade == a.quantidade
+            and abs(e.total_kg - a.total_kg) <= TOLERANCIA_KG
+            and e.min_kg == a.min_kg
+            and e.max_kg == a.max_kg
+        ):
+            continue
+        divergencias.append({
+            "chave": chave,
+            "esperado": None if e is None else (e.total_kg, e.quantidade, e.min_kg, e.max_kg),
+            "atual": None if a is None else (a.total_kg, a.quantidade, a.min_kg, a.max_kg),
+        })
+    return divergencias
+
+
+def consultar(db: Session, agrupar_por: list[str], id_produto=None, id_parcela=None,
+              data_inicio: date | None = None, data_fim: date | None = None):
+    """
+    Soma o agregado pelas dimensões pedidas. O intervalo de datas é aplicado
+    por mês (o agregado não guarda dias).
+    """
+    colunas = []
+    for nome in agrupar_por:
+        for coluna in AGRUPAMENTOS[nome]:
+            if coluna not in colunas:
+                colunas.append(coluna)
+    stmt = select(
+        *colunas,
+        func.sum(ResumoColheita.total_kg).label("total_kg"),
+        func.sum(ResumoColheita.quantidade).label("quantidade"),
+        func.min(ResumoColheita.min_kg).label("min_kg"),
+        func.max(ResumoColheita.max_kg).label("max_kg"),
+    )
+    periodo = ResumoColheita.ano * 100 + ResumoColheita.mes
+    if id_produto is not None:
+        stmt = stmt.where(ResumoColheita.id_produto == id_produto)
+    if id_parcela is not None:
+        stmt = stmt.where(ResumoColheita.id_parcela == id_parcela)
+    if data_inicio is not None:
+        stmt = stmt.where(periodo >= data_inicio.year * 100 + data_inicio.month)
+    if data_fim is not None:
+        stmt = stmt.where(periodo <= data_fim.year * 100 + data_fim.month)
+    if colunas:
+        stmt = stmt.group_by(*colunas).order_by(*colunas)
+    return [dict(r._mapping) for r in db.execute(stmt) if r.quantidade]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_mysql import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manutenção do agregado de colheitas")
+    parser.add_argument("comando", choices=["reconstruir", "verificar"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.comando == "reconstruir":
+            reconstruir(db)
+            print("✅ Agregado de colheitas reconstruído")
+        else:
+            divergencias = verificar(db)
+            for d in divergencias:
+                print("❌", d)
+            print(f"{len(divergencias)} divergência(s)")
+            raise SystemExit(1 if divergencias else 0)
+    finally:
+        db.close()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from datetime import date
+from pydantic import BaseModel, Field
+from datetime import date, datetime
 from typing import Optional, Literal
 
 # ---------- Usuário ----------
@@ -116,6 +116,16 @@ class ParticipacaoOut(ParticipacaoCreate):
     class Config:
         from_attributes = True
 
+class ParticipanteOut(BaseModel):
+    id_usuario: str
+    nome: str
+    email: str
+    papel: Literal['Participante', 'Organizador', 'Palestrante']
+
+class EventoInscritoOut(EventoBase):
+    id_evento: int
+    papel: Literal['Participante', 'Organizador', 'Palestrante']
+
 # ---------- Cultivo ----------
 class CultivoCreate(BaseModel):
     id_produto: int
@@ -141,3 +151,65 @@ class ColheitaOut(ColheitaCreate):
     id_colheita: int
     class Config:
         from_attributes = True
+
+# ---------- Relatórios ----------
+class ResumoColheitaOut(BaseModel):
+    id_produto: Optional[int] = None
+    id_parcela: Optional[int] = None
+    ano: Optional[int] = None
+    mes: Optional[int] = None
+    total_kg: float
+    quantidade: int
+    min_kg: float
+    max_kg: float
+
+class JobRelatorioCreate(BaseModel):
+    tipo: Literal['parcelas', 'produtos']
+    ano: int = Field(ge=1900, le=2100)
+
+class JobRelatorioOut(BaseModel):
+    id: str
+    tipo: str
+    parametros: dict
+    status: Literal['pendente', 'executando', 'concluido', 'erro', 'cancelado']
+    criado_em: datetime
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    linhas: Optional[int] = None
+    tamanho: Optional[int] = None
+    erro: Optional[str] = None
+    posicao: Optional[int] = None   # na fila, quando pendente
+    arquivo: Optional[str] = None   # URL do download, quando concluído
+
+# ---------- Busca ----------
+class ResultadoBuscaOut(BaseModel):
+    tipo: Literal['produtos', 'hortas', 'eventos', 'usuarios']
+    id: str
+    titulo: str
+    relevancia: float
+
+# ---------- Análises ----------
+class RendimentoParcelaOut(BaseModel):
+    id_parcela: int
+    localizacao: str
+    tamanho: float
+    total_kg: float
+    colheitas: int
+    temporadas: int
+    kg_m2: float        # por temporada
+    percentil: float    # % das parcelas com rendimento menor ou igual
+    posicao: int
+
+class SazonalidadeOut(BaseModel):
+    id_produto: int
+    nome: str
+    anos: int
+    mes_pico: int
+    kg_por_mes: list[float]               # janeiro a dezembro, média por ano
+    indice: list[Optional[float]]         # 1 = mês médio
+
+class SerieMensalOut(BaseModel):
+    ano: int
+    mes: int
+    total_kg: float
+    media_movel: Optional[float] = None
@@ -0,0 +1,88 @@
+"""
+Testes da API sobre SQLite e auditoria em memória (sem MySQL nem MongoDB):
+
+    pip install pytest httpx
+    python -m pytest -q
+
+O banco é um arquivo SQLite temporário, gerado uma vez por sessão com
+gerar_dados.py (senha 123456: admin@horta.com no grupo 1, visitante@horta.com
+no grupo 2). Os testes que escrevem criam os próprios registros.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+PASTA = tempfile.mkdtemp(prefix="horta_testes_")
+
+# antes de importar a API: as variáveis do .env do desenvolvedor não valem aqui
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(PASTA, 'horta.db')}",
+    "MONGO_URI": "memoria://",
+    "SECRET_KEY": "testes",
+    "ALGORITHM": "HS256",
+    "HASH_WORKERS": "0",
+    "JOBS_WORKERS": "0",
+    "AUDIT_SPOOL_PATH": os.path.join(PASTA, "audit_spool.jsonl"),
+    "RELATORIOS_DIR": os.path.join(PASTA, "relatorios"),
+    "PERFIS_DIR": os.path.join(PASTA, "perfis"),
+})
+for variavel in ("ASYNC_DATABASE_URL", "REPLICA_DATABASE_URL", "ASYNC_REPLICA_DATABASE_URL", "TOKEN_INCLUIR_GRUPO"):
+    os.environ.pop(variavel, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import gerar_dados
+import metricas
+
+# Colheitas do conjunto gerado (as outras tabelas acompanham, ver gerar_dados.proporcoes)
+ESCALA = 2000
+SENHA = "123456"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def banco():
+    gerar_dados.gerar(ESCALA)
+    yield
+    shutil.rmtree(PASTA, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def cliente(banco):
+    from main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+def entrar(cliente, email: str, senha: str = SENHA) -> dict:
+    """Cabeçalho Authorization de um login."""
+    r = cliente.post("/login", data={"username": email, "password": senha})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(cliente):
+    return entrar(cliente, "admin@horta.com")
+
+
+@pytest.fixture(scope="session")
+def visitante(cliente):
+    return entrar(cliente, "visitante@horta.com")
+
+
+def comandos_sql(cliente, metodo: str, url: str, **argumentos):
+    """
+    Faz uma requisição e conta os comandos SQL que ela executou (o mesmo
+    contador do horta_http_request_sql_statements do /metrics).
+
+    Returns:
+        tuple: A resposta e o número de comandos.
+    """
+    antes, _ = metricas.http_sql.totais()
+    resposta = cliente.request(metodo, url, **argumentos)
+    depois, _ = metricas.http_sql.totais()
+    return resposta, int(depois - antes)
@@ -0,0 +1,33 @@
+"""Classe de cada rota no controle de admissão (admissao.classificar)."""
+import pytest
+
+from admissao import classificar
+
+
+@pytest.mark.parametrize("metodo, caminho, classe", [
+    ("GET", "/health/ready", None),
+    ("GET", "/metrics", None),
+    ("GET", "/cultivos/changes/stream", None),
+    ("OPTIONS", "/colheitas", None),
+    ("POST", "/login", "auth"),
+    ("POST", "/usuarios", "auth"),
+    ("PUT", "/usuarios/abc", "auth"),
+    ("DELETE", "/usuarios/abc", "escrita"),
+    ("GET", "/usuarios/me", "leitura"),
+    ("GET", "/colheitas", "leitura"),
+    ("GET", "/relatorios/colheitas", "leitura"),
+    ("GET", "/relatorios/jobs/abc", "leitura"),
+    ("GET", "/relatorios/jobs/abc/arquivo", "leitura"),
+    ("POST", "/relatorios/jobs", "escrita"),
+    ("DELETE", "/relatorios/jobs/abc", "escrita"),
+    ("PUT", "/colheitas/1", "escrita"),
+    ("GET", "/colheitas/export", "pesada"),
+    ("GET", "/cultivos/export", "pesada"),
+    ("POST", "/colheitas/batch", "pesada"),
+    ("POST", "/usuarios/import", "pesada"),
+    ("GET", "/analytics/parcelas", "pesada"),
+    ("GET", "/logs", "pesada"),
+    ("GET", "/logs/resumo", "pesada"),
+])
+def test_classificar(metodo, caminho, classe):
+    assert classificar(metodo, caminho) == classe
@@ -0,0 +1,76 @@
+"""
+Reenvio do spool da auditoria (mongo_logs._reprocessar_spool): nenhuma
+entrada se perde se o MongoDB falha ou o processo cai no meio do reenvio.
+"""
+import os
+
+import pytest
+from bson import json_util
+
+import mongo_logs
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """Spool num arquivo temporário, banco de logs vazio e o escritor sem reenvio periódico."""
+    mongo_logs.flush()
+    caminho = str(tmp_path / "spool.jsonl")
+    monkeypatch.setattr(mongo_logs, "AUDIT_SPOOL_PATH", caminho)
+    monkeypatch.setattr(mongo_logs, "AUDIT_REPLAY_INTERVAL", float("inf"))
+    monkeypatch.setattr(mongo_logs, "db_mongo", mongo_logs._BancoMemoria())
+    return caminho
+
+
+def _escrever(caminho: str, acoes: list[str]):
+    with open(caminho, "a", encoding="utf-8") as f:
+        for acao in acoes:
+            f.write(json_util.dumps({"collection": "hortas", "entry": {"action": acao}}) + "\n")
+
+
+def _gravadas() -> list[str]:
+    return [d["action"] for d in mongo_logs.db_mongo["hortas"].find()]
+
+
+def _no_arquivo(caminho: str) -> list[str]:
+    with open(caminho, encoding="utf-8") as f:
+        return [json_util.loads(linha)["entry"]["action"] for linha in f if linha.strip()]
+
+
+def test_replay_que_sobrou_vai_antes_do_spool(spool):
+    _escrever(spool + ".replay", ["antiga"])
+    _escrever(spool, ["nova"])
+
+    mongo_logs._reprocessar_spool()
+
+    assert _gravadas() == ["antiga", "nova"]
+    assert not os.path.exists(spool) and not os.path.exists(spool + ".replay")
+
+
+def test_falha_no_mongo_devolve_ao_spool(spool, monkeypatch):
+    _escrever(spool, ["a", "b"])
+    monkeypatch.setattr(mongo_logs, "_inserir_lotes", lambda lotes: lotes)
+
+    mongo_logs._reprocessar_spool()
+
+    assert _no_arquivo(spool) == ["a", "b"]
+    assert not os.path.exists(spool + ".replay")
+
+
+def test_queda_no_meio_mantem_o_replay(spool, monkeypatch):
+    _escrever(spool, ["a", "b"])
+    inserir = mongo_logs._inserir_lotes
+
+    def cair(lotes):
+        raise RuntimeError("processo morreu")
+
+    monkeypatch.setattr(mongo_logs, "_inserir_lotes", cair)
+    with pytest.raises(RuntimeError):
+        mongo_logs._reprocessar_spool()
+    assert _no_arquivo(spool + ".replay") == ["a", "b"]
+
+    # entradas novas chegam ao spool; a próxima rodada reenvia as duas partes
+    _escrever(spool, ["c"])
+    monkeypatch.setattr(mongo_logs, "_inserir_lotes", inserir)
+    mongo_logs._reprocessar_spool()
+    assert _gravadas() == ["a", "b", "c"]
+    assert not os.path.exists(spool) and not os.path.exists(spool + ".replay")
@@ -0,0 +1,119 @@
+"""
+Usuário removido ou trocado de grupo perde o acesso na requisição seguinte
+(escrita por outro worker: na primeira revalidação do cache), e um acerto no
+cache não custa nenhum comando SQL.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import delete, update
+
+import alteracoes
+import auth
+import versoes
+from cache_usuarios import cache_usuarios
+from conftest import SENHA, comandos_sql, entrar
+from database_mysql import SessionLocal
+from models import Usuarios
+
+ADMIN_SO = "/diagnostico/perfis"
+
+
+def _novo_usuario(cliente, id_grupo: int) -> tuple[str, dict]:
+    email = f"cache-{uuid.uuid4().hex[:8]}@horta.com"
+    r = cliente.post("/usuarios", json={"nome": "Cache", "email": email, "senha": SENHA, "id_grupo": id_grupo})
+    assert r.status_code == 201, r.text
+    return r.json()["id_usuario"], entrar(cliente, email)
+
+
+@pytest.fixture
+def revalidar_sempre(monkeypatch):
+    """Sem intervalo entre revalidações: a escrita de outro worker vale já na requisição seguinte."""
+    monkeypatch.setattr(cache_usuarios, "intervalo", 0)
+
+
+def _escrever_como_outro_worker(stmt, id_usuario: str):
+    """A escrita de outro processo, como nos handlers, mas sem mexer no cache deste."""
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        versoes.incrementar(db, "usuarios")
+        alteracoes.registrar(db, "usuarios", [(id_usuario,)])
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_usuario_removido_em_outro_worker_perde_acesso(cliente, revalidar_sempre):
+    id_usuario, cabecalho = _novo_usuario(cliente, 2)
+    assert cliente.get("/usuarios/me", headers=cabecalho).status_code == 200
+    assert cliente.get("/usuarios/me", headers=cabecalho).status_code == 200   # agora vem do cache
+
+    _escrever_como_outro_worker(delete(Usuarios).where(Usuarios.id_usuario == id_usuario), id_usuario)
+
+    assert cliente.get("/usuarios/me", headers=cabecalho).status_code == 404
+
+
+def test_usuario_trocado_de_grupo_em_outro_worker_perde_acesso(cliente, revalidar_sempre):
+    id_usuario, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+
+    _escrever_como_outro_worker(update(Usuarios).where(Usuarios.id_usuario == id_usuario).values(id_grupo=2), id_usuario)
+
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 403
+
+
+def test_usuario_removido_pela_api_perde_acesso(cliente):
+    id_usuario, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+
+    assert cliente.delete(f"/usuarios/{id_usuario}").status_code == 204
+
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 404
+
+
+def test_usuario_trocado_de_grupo_pela_api_perde_acesso(cliente):
+    id_usuario, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+
+    assert cliente.put(f"/usuarios/{id_usuario}", json={"id_grupo": 2}).status_code == 200
+
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 403
+
+
+def test_token_com_grupo_antigo_e_recusado(cliente, monkeypatch, revalidar_sempre):
+    monkeypatch.setattr(auth, "TOKEN_INCLUIR_GRUPO", True)
+    id_usuario, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get("/usuarios/me", headers=cabecalho).status_code == 200
+
+    _escrever_como_outro_worker(update(Usuarios).where(Usuarios.id_usuario == id_usuario).values(id_grupo=2), id_usuario)
+
+    r = cliente.get("/usuarios/me", headers=cabecalho)
+    assert r.status_code == 401
+    assert "desatualizado" in r.json()["detail"]
+
+
+def test_acerto_no_cache_nao_vai_ao_banco(cliente, monkeypatch):
+    monkeypatch.setattr(cache_usuarios, "intervalo", 3600)
+    _, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get("/usuarios/me", headers=cabecalho).status_code == 200
+
+    # /usuarios/me e /diagnostico/perfis não consultam o banco: todo comando seria da autenticação
+    for url in ("/usuarios/me", ADMIN_SO):
+        resposta, n = comandos_sql(cliente, "GET", url, headers=cabecalho)
+        assert resposta.status_code == 200
+        assert n == 0, f"GET {url}: {n} comandos SQL com o usuário no cache"
+
+
+def test_outro_worker_so_vale_depois_do_intervalo(cliente, monkeypatch):
+    monkeypatch.setattr(cache_usuarios, "intervalo", 3600)
+    id_usuario, cabecalho = _novo_usuario(cliente, 1)
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+
+    _escrever_como_outro_worker(update(Usuarios).where(Usuarios.id_usuario == id_usuario).values(id_grupo=2), id_usuario)
+
+    # dentro do intervalo o cache ainda responde; na revalidação seguinte o usuário sai dele
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 200
+    monkeypatch.setattr(cache_usuarios, "intervalo", 0)
+    assert cliente.get(ADMIN_SO, headers=cabecalho).status_code == 403
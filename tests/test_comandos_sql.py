@@ -0,0 +1,128 @@
+"""
+Comandos SQL por requisição em cada endpoint de CRUD: um comando a mais
+aqui é uma ida ao banco a mais em toda escrita. Escrita bem-sucedida =
+o comando principal + versão (ETag) + registro de alteração, e mais três
+quando o recurso entra na busca (um só, o DELETE, na remoção); 404 = só o
+UPDATE/DELETE sem linhas.
+"""
+import uuid
+
+from conftest import SENHA, comandos_sql
+
+# Cadastros da busca (busca.py): apagar o antigo, inserir o novo e o termo
+BUSCA = 3
+
+
+def conferir(cliente, metodo: str, url: str, status: int, comandos: int, **argumentos):
+    resposta, n = comandos_sql(cliente, metodo, url, **argumentos)
+    assert resposta.status_code == status, resposta.text
+    assert n == comandos, f"{metodo} {url}: {n} comandos SQL, esperados {comandos}"
+    return resposta
+
+
+def test_grupos(cliente):
+    id_grupo = conferir(cliente, "POST", "/grupos", 201, 3, json={"nome_grupo": "SQL"}).json()["id_grupo"]
+    conferir(cliente, "PUT", f"/grupos/{id_grupo}", 200, 3, json={"nome_grupo": "SQL 2"})
+    conferir(cliente, "PUT", "/grupos/999999", 404, 1, json={"nome_grupo": "SQL 2"})
+    # usuários do grupo: SELECT dos afetados + UPDATE para NULL, antes do DELETE
+    conferir(cliente, "DELETE", f"/grupos/{id_grupo}", 204, 5)
+    conferir(cliente, "DELETE", f"/grupos/{id_grupo}", 404, 3)
+
+
+def test_hortas(cliente):
+    id_horta = conferir(cliente, "POST", "/hortas", 201, 3 + BUSCA, json={"nome": "SQL", "localizacao": "A"}).json()["id_horta"]
+    conferir(cliente, "PUT", f"/hortas/{id_horta}", 200, 3 + BUSCA, json={"localizacao": "B"})
+    conferir(cliente, "PUT", "/hortas/nao-existe", 404, 1, json={"localizacao": "B"})
+    conferir(cliente, "GET", "/hortas?limit=5", 200, 2)
+    conferir(cliente, "DELETE", f"/hortas/{id_horta}", 204, 4)
+    conferir(cliente, "DELETE", f"/hortas/{id_horta}", 404, 1)
+
+
+def test_produtos(cliente):
+    produto = {"nome": "SQL", "tipo": "Legume"}
+    id_produto = conferir(cliente, "POST", "/produtos", 201, 3 + BUSCA, json=produto).json()["id_produto"]
+    conferir(cliente, "PUT", f"/produtos/{id_produto}", 200, 3 + BUSCA, json={**produto, "tipo": "Fruta"})
+    conferir(cliente, "PUT", "/produtos/999999", 404, 1, json=produto)
+    conferir(cliente, "GET", "/produtos?limit=5", 200, 2)
+    conferir(cliente, "DELETE", f"/produtos/{id_produto}", 204, 4)
+    conferir(cliente, "DELETE", f"/produtos/{id_produto}", 404, 1)
+
+
+def test_parcelas(cliente):
+    id_parcela = conferir(cliente, "POST", "/parcelas", 201, 3, json={"tamanho": 10, "localizacao": "SQL"}).json()["id_parcela"]
+    conferir(cliente, "PUT", f"/parcelas/{id_parcela}", 200, 3, json={"status": "Em Repouso"})
+    conferir(cliente, "PUT", "/parcelas/999999", 404, 1, json={"status": "Em Repouso"})
+    conferir(cliente, "GET", "/parcelas?limit=5", 200, 2)
+    conferir(cliente, "DELETE", f"/parcelas/{id_parcela}", 204, 3)
+    conferir(cliente, "DELETE", f"/parcelas/{id_parcela}", 404, 1)
+
+
+def test_eventos(cliente):
+    evento = {"nome": "SQL", "data_evento": "2030-01-01"}
+    id_evento = conferir(cliente, "POST", "/eventos", 201, 3 + BUSCA, json=evento).json()["id_evento"]
+    conferir(cliente, "PUT", f"/eventos/{id_evento}", 200, 3 + BUSCA, json={"local_evento": "Sede"})
+    conferir(cliente, "PUT", "/eventos/999999", 404, 1, json={"local_evento": "Sede"})
+    conferir(cliente, "GET", "/eventos?limit=5", 200, 2)
+    conferir(cliente, "DELETE", f"/eventos/{id_evento}", 204, 4)
+    conferir(cliente, "DELETE", f"/eventos/{id_evento}", 404, 1)
+
+
+def test_usuarios_e_participacoes(cliente):
+    email = f"sql-{uuid.uuid4().hex[:8]}@horta.com"
+    usuario = {"nome": "SQL", "email": email, "senha": SENHA, "id_grupo": 2}
+    id_usuario = conferir(cliente, "POST", "/usuarios", 201, 3 + BUSCA, json=usuario).json()["id_usuario"]
+    # email repetido: o INSERT falha na constraint, sem SELECT antes
+    conferir(cliente, "POST", "/usuarios", 400, 1, json=usuario)
+    conferir(cliente, "PUT", f"/usuarios/{id_usuario}", 200, 3 + BUSCA, json={"nome": "SQL 2"})
+    conferir(cliente, "PUT", "/usuarios/nao-existe", 404, 1, json={"nome": "SQL 2"})
+    conferir(cliente, "GET", "/usuarios?limit=5", 200, 2)
+
+    participacao = {"id_usuario": id_usuario, "id_evento": 1, "papel": "Participante"}
+    conferir(cliente, "POST", "/participacoes", 201, 3, json=participacao)
+    conferir(cliente, "POST", "/participacoes", 400, 1, json=participacao)
+    conferir(cliente, "POST", "/participacoes", 404, 1, json={**participacao, "id_evento": 999999})
+    # 3 SELECTs de validação do lote inteiro + INSERT + versão + alteração, para 1 ou 1000 itens
+    conferir(cliente, "POST", "/participacoes/batch", 201, 6, json=[
+        {**participacao, "id_evento": 2}, {**participacao, "id_evento": 3, "papel": "Organizador"}
+    ])
+    conferir(cliente, "GET", f"/usuarios/{id_usuario}/eventos", 200, 2)
+    for id_evento in (1, 2, 3):
+        conferir(cliente, "DELETE", f"/participacoes/{id_usuario}/{id_evento}", 204, 3)
+    conferir(cliente, "DELETE", f"/participacoes/{id_usuario}/1", 404, 1)
+
+    conferir(cliente, "DELETE", f"/usuarios/{id_usuario}", 204, 4)
+    conferir(cliente, "DELETE", f"/usuarios/{id_usuario}", 404, 1)
+
+
+def test_cultivos(cliente):
+    cultivo = {"id_produto": 1, "id_parcela": 1, "data_plantio": "2031-01-01", "status_cultivo": "Plantado"}
+    chave = "/cultivos/1/1/2031-01-01"
+    conferir(cliente, "POST", "/cultivos", 201, 3, json=cultivo)
+    conferir(cliente, "POST", "/cultivos", 400, 1, json=cultivo)
+    conferir(cliente, "POST", "/cultivos", 404, 1, json={**cultivo, "id_produto": 999999})
+    conferir(cliente, "POST", "/cultivos/batch", 201, 6, json=[
+        {**cultivo, "id_produto": 2}, {**cultivo, "id_produto": 3}
+    ])
+    conferir(cliente, "GET", "/cultivos?limit=5&id_parcela=1", 200, 2)
+    conferir(cliente, "PUT", chave, 200, 3, json={"status_cultivo": "Crescendo"})
+    conferir(cliente, "PUT", "/cultivos/1/1/2039-01-01", 404, 1, json={"status_cultivo": "Crescendo"})
+    conferir(cliente, "DELETE", chave, 204, 3)
+    conferir(cliente, "DELETE", chave, 404, 1)
+
+
+def test_colheitas(cliente):
+    colheita = {"id_produto": 2, "id_parcela": 1, "data_colheita": "2031-02-01", "quantidade_kg": 5}
+    # INSERT + agregado mensal + UPDATE dos cultivos + versão + alteração da colheita
+    # + SELECT e INSERT das alterações dos cultivos
+    id_colheita = conferir(cliente, "POST", "/colheitas", 201, 7, json=colheita).json()["id_colheita"]
+    conferir(cliente, "POST", "/colheitas/batch", 201, 10, json=[
+        {**colheita, "id_produto": 3, "data_colheita": "2031-02-02"}, {**colheita, "data_colheita": "2031-02-03"}
+    ])
+    conferir(cliente, "GET", "/colheitas?limit=5&id_parcela=1", 200, 2)
+    conferir(cliente, "GET", f"/colheitas/{id_colheita}", 200, 2)
+    conferir(cliente, "GET", "/colheitas/99999999", 404, 2)
+    # a alteração move a colheita no agregado: SELECT FOR UPDATE + tirar do mês antigo + somar no novo
+    conferir(cliente, "PUT", f"/colheitas/{id_colheita}", 200, 11, json={**colheita, "data_colheita": "2031-03-01"})
+    conferir(cliente, "PUT", "/colheitas/99999999", 404, 1, json=colheita)
+    conferir(cliente, "DELETE", f"/colheitas/{id_colheita}", 204, 5)
+    conferir(cliente, "DELETE", f"/colheitas/{id_colheita}", 404, 1)
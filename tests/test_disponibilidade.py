@@ -0,0 +1,100 @@
+"""
+Índice de parcelas disponíveis (disponibilidade.py) contra uma varredura dos
+cultivos: carregado do zero em consultas aleatórias, e o índice da API
+depois de cada escrita aleatória feita pelos endpoints.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import disponibilidade
+from database_mysql import SessionLocal
+
+# Janelas de 30 dias cobrindo as datas usadas nas escritas do teste
+JANELAS = [(date(2029, 12, 1) + timedelta(days=30 * i), date(2029, 12, 30) + timedelta(days=30 * i)) for i in range(27)]
+
+
+def conferir_parcelas(indice, ids: set):
+    """As parcelas `ids` livres no índice exatamente nas janelas em que a varredura não acha cultivo."""
+    db = SessionLocal()
+    try:
+        ocupados = disponibilidade.varredura(db, sorted(ids))
+    finally:
+        db.close()
+    for inicio, fim in JANELAS:
+        livres = {p["id_parcela"] for p in indice.disponiveis(inicio, fim)}
+        for id_parcela in ids:
+            ocupada = any(ini <= fim and (f is None or f >= inicio) for ini, f in ocupados.get(id_parcela, []))
+            assert (id_parcela in livres) != ocupada, f"parcela {id_parcela} em {inicio}..{fim}"
+
+
+@pytest.mark.parametrize("semente", [1, 2, 3])
+def test_indice_carregado_confere_com_varredura(semente):
+    assert disponibilidade.verificar(consultas=1000, semente=semente) == []
+
+
+def test_indice_da_api_acompanha_as_escritas(cliente):
+    rng = random.Random(7)
+    indice = disponibilidade.indice
+    # carrega o índice do processo antes das escritas
+    assert cliente.get("/parcelas/disponiveis", params={"inicio": "2030-01-01", "fim": "2030-12-31"}).status_code == 200
+
+    parcelas = [1, 2, 3]
+    cultivos, colheitas = [], []
+
+    def dia(ano: int) -> str:
+        return str(date(ano, 1, 1) + timedelta(days=rng.randrange(365)))
+
+    for _ in range(120):
+        acao = rng.choice(["parcela", "cultivo", "cultivo", "colheita", "mover", "tamanho", "remover_cultivo", "remover_colheita"])
+        tocadas = set()
+        if acao == "parcela":
+            r = cliente.post("/parcelas", json={"tamanho": round(rng.uniform(1, 80), 1), "localizacao": "Disponibilidade"})
+            parcelas.append(r.json()["id_parcela"])
+            tocadas.add(parcelas[-1])
+        elif acao == "cultivo":
+            cultivo = {"id_produto": rng.randint(1, 5), "id_parcela": rng.choice(parcelas),
+                       "data_plantio": dia(2030), "status_cultivo": "Plantado"}
+            if cliente.post("/cultivos", json=cultivo).status_code == 201:
+                cultivos.append(cultivo)
+            tocadas.add(cultivo["id_parcela"])
+        elif acao == "colheita" and cultivos:
+            c = rng.choice(cultivos)
+            # no próprio dia do plantio (encerra a ocupação), antes dele (não encerra) ou no ano seguinte
+            plantio = date.fromisoformat(c["data_plantio"])
+            data_colheita = rng.choice([plantio, plantio - timedelta(days=rng.randrange(1, 30)), date.fromisoformat(dia(2031))])
+            r = cliente.post("/colheitas", json={"id_produto": c["id_produto"], "id_parcela": c["id_parcela"],
+                                                 "data_colheita": str(data_colheita), "quantidade_kg": 3})
+            assert r.status_code == 201, r.text
+            colheitas.append(r.json())
+            tocadas.add(c["id_parcela"])
+        elif acao == "mover" and colheitas:
+            # troca a data (e às vezes a parcela) de uma colheita: as duas parcelas mudam
+            c = rng.choice(colheitas)
+            tocadas.add(c["id_parcela"])
+            c.update(data_colheita=dia(rng.choice([2030, 2031])), id_parcela=rng.choice([c["id_parcela"], *parcelas[:3]]))
+            tocadas.add(c["id_parcela"])
+            assert cliente.put(f"/colheitas/{c['id_colheita']}", json={k: v for k, v in c.items() if k != "id_colheita"}).status_code == 200
+        elif acao == "tamanho":
+            id_parcela = rng.choice(parcelas)
+            assert cliente.put(f"/parcelas/{id_parcela}", json={"tamanho": round(rng.uniform(1, 80), 1)}).status_code == 200
+            tocadas.add(id_parcela)
+        elif acao == "remover_cultivo" and cultivos:
+            c = cultivos.pop(rng.randrange(len(cultivos)))
+            assert cliente.delete("/cultivos/{id_produto}/{id_parcela}/{data_plantio}".format(**c)).status_code == 204
+            tocadas.add(c["id_parcela"])
+        elif acao == "remover_colheita" and colheitas:
+            c = colheitas.pop(rng.randrange(len(colheitas)))
+            assert cliente.delete(f"/colheitas/{c['id_colheita']}").status_code == 204
+            tocadas.add(c["id_parcela"])
+        if tocadas:
+            conferir_parcelas(indice, tocadas)
+
+    # cada escrita atualizou o índice no lugar: nada ficou para recarregar do zero
+    db = SessionLocal()
+    try:
+        assert indice._versao == disponibilidade._versoes(db)
+    finally:
+        db.close()
+    assert disponibilidade.verificar(consultas=1000, semente=7, alvo=indice) == []
@@ -0,0 +1,81 @@
+"""
+/eventos?contagens=true: as participações por papel saem num único GROUP BY
+por página, então o número de comandos SQL não cresce com os eventos.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select
+
+import versoes
+from conftest import comandos_sql
+from database_mysql import SessionLocal
+from models import Evento, ParticipacaoEvento, Usuarios
+from paginacao import CABECALHO_CURSOR, LIMITE_MAXIMO
+
+EVENTOS = 10_000
+PAPEIS = ("Participante", "Organizador", "Palestrante")
+# datas só destes eventos, para filtrar a listagem
+INICIO = date(2090, 1, 1)
+
+
+def _inserir_eventos() -> list[int]:
+    """10.000 eventos com 0 a 3 participações cada, gravados direto no banco."""
+    db = SessionLocal()
+    try:
+        usuarios = db.scalars(select(Usuarios.id_usuario).order_by(Usuarios.id_usuario).limit(3)).all()
+        ids = db.scalars(
+            insert(Evento).returning(Evento.id_evento),
+            [{"nome": f"Contagem {i}", "data_evento": INICIO + timedelta(days=i % 365)} for i in range(EVENTOS)],
+        ).all()
+        db.execute(insert(ParticipacaoEvento), [
+            {"id_usuario": usuario, "id_evento": id_evento, "papel": PAPEIS[(id_evento + j) % 3]}
+            for id_evento in ids for j, usuario in enumerate(usuarios[:id_evento % 4])
+        ])
+        versoes.incrementar(db, "evento", "ParticipacaoEvento")
+        db.commit()
+        return sorted(ids)
+    finally:
+        db.close()
+
+
+def _esperado(ids: list[int]) -> dict:
+    db = SessionLocal()
+    try:
+        P = ParticipacaoEvento
+        linhas = db.execute(
+            select(P.id_evento, P.papel, func.count()).where(P.id_evento.between(ids[0], ids[-1])).group_by(P.id_evento, P.papel)
+        )
+        contagens = {i: Counter() for i in ids}
+        for id_evento, papel, n in linhas:
+            contagens[id_evento][papel] = n
+        return contagens
+    finally:
+        db.close()
+
+
+def test_contagens_com_comandos_constantes(cliente):
+    ids = _inserir_eventos()
+    esperado = _esperado(ids)
+    filtro = f"data_inicio={INICIO}&contagens=true"
+
+    resposta, por_pagina = comandos_sql(cliente, "GET", f"/eventos?{filtro}&limit=10")
+    assert resposta.status_code == 200
+    assert [e["id_evento"] for e in resposta.json()] == ids[:10]
+
+    # os 10.000 eventos em páginas cheias: cada página custa o mesmo que a de 10
+    vistos, cursor = [], None
+    while True:
+        url = f"/eventos?{filtro}&limit={LIMITE_MAXIMO}" + (f"&cursor={cursor}" if cursor else "")
+        resposta, n = comandos_sql(cliente, "GET", url)
+        assert resposta.status_code == 200
+        assert n == por_pagina, f"{n} comandos SQL numa página de {len(resposta.json())} eventos, {por_pagina} na de 10"
+        for evento in resposta.json():
+            contagem = evento["participantes"]
+            assert {p: contagem[p] for p in PAPEIS} == {p: esperado[evento["id_evento"]][p] for p in PAPEIS}
+            assert contagem["total"] == sum(esperado[evento["id_evento"]].values())
+            vistos.append(evento["id_evento"])
+        cursor = resposta.headers.get(CABECALHO_CURSOR)
+        if not cursor:
+            break
+    assert vistos == ids
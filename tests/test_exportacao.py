@@ -0,0 +1,105 @@
+"""
+Exportação de um milhão de colheitas com a memória limitada (a resposta é
+gerada em blocos, sem a tabela inteira na memória).
+"""
+import os
+import sqlite3
+import tracemalloc
+import zlib
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+from conftest import PASTA
+from models import Colheita, Cultivo
+
+LINHAS = 1_000_000
+# Pico de memória alocada pelo Python durante a exportação inteira
+LIMITE_MB = 16
+
+
+@pytest.fixture(scope="module")
+def banco_grande():
+    """Arquivo SQLite à parte com LINHAS colheitas e LINHAS cultivos."""
+    caminho = os.path.join(PASTA, "exportacao.db")
+    engine = create_engine(f"sqlite:///{caminho}")
+    Colheita.__table__.create(engine)
+    Cultivo.__table__.create(engine)
+    inicio = date(2020, 1, 1)
+    with sqlite3.connect(caminho) as conn:
+        conn.executemany(
+            "INSERT INTO colheitas (id_colheita, id_parcela, id_produto, data_colheita, quantidade_kg) VALUES (?, ?, ?, ?, ?)",
+            ((i, i % 500 + 1, i % 32 + 1, str(inicio + timedelta(days=i % 1500)), (i % 1000) / 10) for i in range(1, LINHAS + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO cultivos (id_produto, id_parcela, data_plantio, status_cultivo) VALUES (?, ?, ?, ?)",
+            ((i % 32 + 1, i // 32 + 1, str(inicio), "Plantado") for i in range(LINHAS)),
+        )
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _baixar(cliente, caminho: str, consulta: str = "", cabecalhos: dict | None = None) -> dict:
+    """
+    Chama a API direto pelo ASGI, contando os bytes de cada bloco e
+    descartando-os (o TestClient guardaria a resposta inteira na memória).
+    """
+    recebido = {"status": None, "cabecalhos": {}, "bytes": 0, "linhas": 0}
+    descompressor = None
+    escopo = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": caminho, "raw_path": caminho.encode(),
+        "query_string": consulta.encode(), "root_path": "", "client": ("testes", 123), "server": ("testes", 80),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (cabecalhos or {}).items()],
+    }
+    enviado = False
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # sem desconexão: espera até a resposta terminar
+        import anyio
+        await anyio.sleep_forever()
+
+    async def send(mensagem):
+        nonlocal descompressor
+        if mensagem["type"] == "http.response.start":
+            recebido["status"] = mensagem["status"]
+            recebido["cabecalhos"] = {k.decode(): v.decode() for k, v in mensagem["headers"]}
+            if recebido["cabecalhos"].get("content-encoding") == "gzip":
+                descompressor = zlib.decompressobj(wbits=31)
+        elif mensagem["type"] == "http.response.body":
+            corpo = mensagem.get("body", b"")
+            if descompressor is not None:
+                corpo = descompressor.decompress(corpo)
+            recebido["bytes"] += len(corpo)
+            recebido["linhas"] += corpo.count(b"\n")
+
+    cliente.portal.call(main.app, escopo, receive, send)
+    return recebido
+
+
+@pytest.mark.parametrize("caminho, consulta, cabecalhos, cabecalho_csv", [
+    ("/colheitas/export", "formato=csv", {}, 1),
+    ("/colheitas/export", "formato=ndjson", {"Accept-Encoding": "gzip"}, 0),
+    ("/cultivos/export", "formato=csv", {}, 1),
+])
+def test_exporta_um_milhao_de_linhas_com_memoria_limitada(
+    cliente, banco_grande, monkeypatch, caminho, consulta, cabecalhos, cabecalho_csv
+):
+    monkeypatch.setattr(main, "sessao_leitura", lambda request: banco_grande())
+    tracemalloc.start()
+    try:
+        recebido = _baixar(cliente, caminho, consulta, cabecalhos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert recebido["status"] == 200
+    assert recebido["linhas"] == LINHAS + cabecalho_csv
+    assert pico < LIMITE_MB * 1024 * 1024, f"pico de {pico / 1024 / 1024:.1f} MB para {recebido['bytes']} bytes exportados"
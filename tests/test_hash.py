@@ -0,0 +1,52 @@
+"""
+hash_em_lote divide a fila limitada do pool de bcrypt com o login e o
+cadastro: sem vaga, desiste como eles, e termina devolvendo todas as vagas.
+"""
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(auth, "HASH_WORKERS", 1)
+    monkeypatch.setattr(auth, "HASH_LOTE", 1)
+    monkeypatch.setattr(auth, "HASH_QUEUE_TIMEOUT", 0.1)
+    yield
+    auth.encerrar_pool()
+
+
+def _vagas_livres() -> int:
+    livres = 0
+    while auth._vagas.acquire(blocking=False):
+        livres += 1
+    for _ in range(livres):
+        auth._vagas.release()
+    return livres
+
+
+def test_lote_sem_vaga_na_fila_desiste(pool):
+    # login e cadastro ocupando toda a fila
+    ocupadas = _vagas_livres()
+    for _ in range(ocupadas):
+        auth._vagas.acquire()
+    try:
+        with pytest.raises(auth.SenhasOcupadasError):
+            auth.hash_em_lote(["a", "b", "c"])
+    finally:
+        for _ in range(ocupadas):
+            auth._vagas.release()
+
+
+def test_lote_devolve_as_vagas(pool):
+    antes = _vagas_livres()
+    senhas = ["um", "dois", "tres"]
+    hashes = auth.hash_em_lote(senhas)
+    assert all(auth.pwd_context.verify(s, h) for s, h in zip(senhas, hashes))
+    # a vaga volta no callback do futuro, que roda logo depois do result()
+    limite = time.monotonic() + 2
+    while _vagas_livres() != antes and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert _vagas_livres() == antes
@@ -0,0 +1,21 @@
+"""
+Planos de execução das consultas quentes (esquema.consultas_quentes): todas
+usam índice no banco gerado por esquema.criar().
+"""
+from sqlalchemy import select
+
+import esquema
+from database_mysql import engine
+from models import Colheita
+
+
+def test_consultas_quentes_sem_varredura_completa():
+    assert esquema.explicar() == []
+
+
+def test_varredura_completa_e_detectada():
+    # sem índice em quantidade_kg: a conferência tem que acusar
+    with engine.connect() as conn:
+        plano = esquema._plano(conn, select(Colheita).where(Colheita.quantidade_kg > 10))
+        varreduras = [v for v in (esquema._varredura(conn.dialect.name, linha) for linha in plano) if v]
+    assert varreduras
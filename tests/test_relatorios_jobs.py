@@ -0,0 +1,111 @@
+"""
+Jobs de relatório (relatorios.py): só quem pediu, ou um admin, consulta,
+baixa ou cancela; o limite de jobs ativos vale para todo solicitante; uma
+execução que perdeu o job não grava mais nada. Com JOBS_WORKERS=0 os jobs
+ficam pendentes até o teste executá-los.
+"""
+import uuid
+
+import relatorios
+from conftest import SENHA, entrar
+from database_mysql import SessionLocal
+from models import JobRelatorio
+
+
+def _novo_usuario(cliente) -> dict:
+    email = f"jobs-{uuid.uuid4().hex[:8]}@horta.com"
+    r = cliente.post("/usuarios", json={"nome": "Jobs", "email": email, "senha": SENHA, "id_grupo": 2})
+    assert r.status_code == 201, r.text
+    return entrar(cliente, email)
+
+
+def _pedir(cliente, cabecalho: dict, ano: int):
+    return cliente.post("/relatorios/jobs", json={"tipo": "parcelas", "ano": ano}, headers=cabecalho)
+
+
+def test_sem_login_e_recusado(cliente):
+    assert cliente.post("/relatorios/jobs", json={"tipo": "parcelas", "ano": 2024}).status_code == 401
+    assert cliente.get("/relatorios/jobs/qualquer").status_code == 401
+    assert cliente.get("/relatorios/jobs/qualquer/arquivo").status_code == 401
+    assert cliente.delete("/relatorios/jobs/qualquer").status_code == 401
+
+
+def test_job_so_do_solicitante_ou_admin(cliente, admin):
+    dono, outro = _novo_usuario(cliente), _novo_usuario(cliente)
+    r = _pedir(cliente, dono, 2024)
+    assert r.status_code == 202, r.text
+    url = r.headers["Location"]
+
+    assert cliente.get(url, headers=dono).status_code == 200
+    assert cliente.get(url, headers=admin).status_code == 200
+    assert cliente.get(url, headers=outro).status_code == 403
+    assert cliente.get(f"{url}/arquivo", headers=outro).status_code == 403
+    assert cliente.get(f"{url}/arquivo", headers=dono).status_code == 409
+    assert cliente.delete(url, headers=outro).status_code == 403
+    assert cliente.get(url, headers=dono).json()["status"] == "pendente"
+    assert cliente.get("/relatorios/jobs/nao-existe", headers=outro).status_code == 404
+
+    # o mesmo pedido de outro usuário é outro job, que o primeiro não enxerga
+    r = _pedir(cliente, outro, 2024)
+    assert r.status_code == 202
+    assert r.headers["Location"] != url
+    assert cliente.get(r.headers["Location"], headers=dono).status_code == 403
+
+    assert cliente.delete(url, headers=dono).status_code == 204
+    assert cliente.delete(r.headers["Location"], headers=admin).status_code == 204
+    assert cliente.get(r.headers["Location"], headers=outro).json()["status"] == "cancelado"
+
+
+def test_limite_por_solicitante(cliente):
+    cabecalho = _novo_usuario(cliente)
+    urls = []
+    for ano in range(2001, 2001 + relatorios.JOBS_POR_SOLICITANTE):
+        r = _pedir(cliente, cabecalho, ano)
+        assert r.status_code == 202, r.text
+        urls.append(r.headers["Location"])
+    # repetir um pedido ativo devolve o mesmo job, sem contar no limite
+    assert _pedir(cliente, cabecalho, 2001).headers["Location"] == urls[0]
+    assert _pedir(cliente, cabecalho, 2030).status_code == 429
+    # cancelado libera a vaga
+    assert cliente.delete(urls[0], headers=cabecalho).status_code == 204
+    r = _pedir(cliente, cabecalho, 2030)
+    assert r.status_code == 202
+    for url in [*urls[1:], r.headers["Location"]]:
+        assert cliente.delete(url, headers=cabecalho).status_code == 204
+
+
+def test_execucao_devolvida_a_fila_nao_grava(cliente, monkeypatch):
+    cabecalho = _novo_usuario(cliente)
+    r = _pedir(cliente, cabecalho, 2024)
+    url, id_job = r.headers["Location"], r.json()["id"]
+    db = SessionLocal()
+    try:
+        antiga = relatorios.reivindicar(db, id_job)
+        # batimento atrasado: o despachante devolve o job e ele é reivindicado de novo
+        assert relatorios._devolver(db, JobRelatorio.id == id_job) == 1
+        nova = relatorios.reivindicar(db, id_job)
+        assert relatorios.reivindicar(db, id_job) is None
+    finally:
+        db.close()
+    assert None not in (antiga, nova) and antiga != nova
+
+    monkeypatch.setattr(relatorios, "JOBS_BATIMENTO", 0.01)
+    atrasado, atual = relatorios._Batimento(id_job, antiga), relatorios._Batimento(id_job, nova)
+    atrasado.start()
+    atual.start()
+    atrasado.join(5)
+    atual.encerrar()
+    atual.join(5)
+    assert (atrasado.motivo, atual.motivo) == ("perdido", None)
+
+    db = SessionLocal()
+    try:
+        assert not relatorios._finalizar(db, id_job, antiga, status="erro", erro="atrasado")
+    finally:
+        db.close()
+    relatorios.executar(id_job, antiga)
+    assert cliente.get(url, headers=cabecalho).json()["status"] == "executando"
+
+    relatorios.executar(id_job, nova)
+    assert cliente.get(url, headers=cabecalho).json()["status"] == "concluido"
+    assert cliente.get(f"{url}/arquivo", headers=cabecalho).status_code == 200
@@ -0,0 +1,111 @@
+"""
+Versão por tabela, guardada no banco, para GETs condicionais (ETag / If-None-Match).
+
+Os handlers de escrita chamam incrementar() na mesma transação do
+INSERT/UPDATE/DELETE, logo antes do commit, para segurar o lock da linha
+de versão o mínimo possível. Os GETs usam condicional() como dependência:
+a versão é lida antes dos dados, então um ETag nunca descreve dados mais
+novos do que os enviados, e com ela igual ao If-None-Match a resposta é
+304 sem consultar a tabela. Como a versão está no banco, vale para
+qualquer número de workers.
+"""
+import hashlib
+import os
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database_mysql import get_read_db, get_async_read_db
+from models import VersaoTabela
+
+load_dotenv()
+
+# Produtos, parcelas e hortas quase não mudam: o navegador pode reutilizar a
+# resposta por esses segundos sem revalidar (0 = sempre revalida)
+CACHE_MAX_AGE_CATALOGO = int(os.getenv("CACHE_MAX_AGE_CATALOGO", "0"))
+
+_CATALOGO = (
+    f"public, max-age={CACHE_MAX_AGE_CATALOGO}, must-revalidate"
+    if CACHE_MAX_AGE_CATALOGO > 0 else "public, no-cache"
+)
+CACHE_CONTROL = {
+    "produto": _CATALOGO,
+    "parcela": _CATALOGO,
+    "hortas": _CATALOGO,
+    "evento": "public, no-cache",
+    "usuarios": "private, no-cache",
+    "cultivos": "no-cache",
+    "colheitas": "no-cache",
+}
+
+
+def _valores(tabelas) -> list[dict]:
+    # ordem fixa: dois writers nas mesmas tabelas travam as linhas na mesma ordem
+    return [{"tabela": t, "versao": 1} for t in sorted(set(tabelas))]
+
+
+def incrementar(db: Session, *tabelas: str):
+    """Soma 1 à versão das tabelas com um único upsert."""
+    valores = _valores(tabelas)
+    if db.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(VersaoTabela).values(valores)
+        stmt = stmt.on_duplicate_key_update(versao=VersaoTabela.versao + 1)
+    else:
+        stmt = sqlite.insert(VersaoTabela).values(valores)
+        stmt = stmt.on_conflict_do_update(index_elements=["tabela"], set_={"versao": VersaoTabela.versao + 1})
+    db.execute(stmt)
+
+
+async def incrementar_async(db: AsyncSession, *tabelas: str):
+    await db.run_sync(incrementar, *tabelas)
+
+
+def ler(db: Session, tabelas) -> str:
+    """Versões atuais das tabelas, juntas numa string (tabela sem linha = 0)."""
+    versoes = dict(db.execute(
+        select(VersaoTabela.tabela, VersaoTabela.versao).where(VersaoTabela.tabela.in_(tabelas))
+    ).all())
+    return ".".join(str(versoes.get(t, 0)) for t in tabelas)
+
+
+def _etag(request: Request, versao: str) -> str:
+    # a mesma versão gera respostas diferentes para filtros/cursor/fields diferentes
+    consulta = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'"{versao}-{consulta}"'
+
+
+def _confere(request: Request, etag: str) -> bool:
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    for item in cabecalho.split(","):
+        item = item.strip()
+        if item == "*" or item.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _responder(request: Request, response: Response, tabelas: tuple, versao: str):
+    cabecalhos = {"ETag": _etag(request, versao), "Cache-Control": CACHE_CONTROL[tabelas[0]]}
+    if _confere(request, cabecalhos["ETag"]):
+        raise HTTPException(304, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+
+
+def condicional(*tabelas: str, assincrono: bool = False):
+    """
+    Dependência para GETs que leem as tabelas dadas (a primeira define o
+    Cache-Control). Usa a mesma sessão de leitura do handler, síncrona ou
+    assíncrona, então versão e dados vêm do mesmo banco (réplica ou primário).
+    """
+    if assincrono:
+        async def dependencia(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+            _responder(request, response, tabelas, await db.run_sync(ler, tabelas))
+    else:
+        def dependencia(request: Request, response: Response, db: Session = Depends(get_read_db)):
+            _responder(request, response, tabelas, ler(db, tabelas))
+    return Depends(dependencia)